@@ -0,0 +1,144 @@
+import json
+from typing import Iterable, List, Optional, Tuple
+
+# Optional compact encoders
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+# =============================
+# FORMATS
+# =============================
+# json    - the original {"device_uid", "sensors": [...]} document, one reading per message
+# msgpack - compact envelope (below), MessagePack encoded
+# cbor    - compact envelope (below), CBOR encoded
+#
+# Compact envelope (v1):
+#   {
+#     "v": 1,
+#     "d": "<device_uid>",
+#     "k": [["temperature", "temp-sensor-001"], ["moisture", "soil-sensor-001"], ...],
+#     "s": [[<unix ts>, {0: 18.2, 1: 65.0}], [<unix ts>, {...}], ...]
+#   }
+# "k" maps small integer keys to (type, id) once per message, and each entry
+# of "s" is one timestamped sample set keyed by those integers. A value is
+# the plain reading, or a map of the sensor's extra fields when it has any.
+
+FORMATS = ("json", "msgpack", "cbor")
+ENVELOPE_VERSION = 1
+
+Sample = Tuple[float, List[dict]]  # (unix timestamp, sensor dicts)
+
+
+def available(fmt: str) -> bool:
+    if fmt == "json":
+        return True
+    if fmt == "msgpack":
+        return msgpack is not None
+    if fmt == "cbor":
+        return cbor2 is not None
+    return False
+
+
+def topic_suffix(fmt: str) -> str:
+    """Compact formats are published on data/<fmt> so the hub knows how to decode."""
+    return "" if fmt == "json" else f"/{fmt}"
+
+# =============================
+# ENCODE
+# =============================
+
+def encode_json(device_uid: str, sensors: List[dict], timestamp: Optional[float] = None) -> bytes:
+    payload = {
+        "device_uid": device_uid,
+        "sensors": sensors
+    }
+    if timestamp is not None:
+        payload["timestamp"] = int(timestamp)
+    return json.dumps(payload).encode()
+
+
+def build_envelope(device_uid: str, samples: Iterable[Sample]) -> dict:
+    keys = {}
+    sets = []
+    for ts, sensors in samples:
+        values = {}
+        for sensor in sensors:
+            ident = (sensor["type"], sensor["id"])
+            key = keys.setdefault(ident, len(keys))
+            extra = {k: v for k, v in sensor.items() if k not in ("type", "id")}
+            values[key] = extra["value"] if list(extra) == ["value"] else extra
+        sets.append([round(ts, 3), values])
+
+    return {
+        "v": ENVELOPE_VERSION,
+        "d": device_uid,
+        "k": [list(ident) for ident in keys],
+        "s": sets,
+    }
+
+
+def encode_compact(device_uid: str, samples: Iterable[Sample], fmt: str) -> bytes:
+    envelope = build_envelope(device_uid, samples)
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("msgpack not installed")
+        return msgpack.packb(envelope, use_bin_type=True)
+    if fmt == "cbor":
+        if cbor2 is None:
+            raise RuntimeError("cbor2 not installed")
+        return cbor2.dumps(envelope)
+    raise ValueError(f"Unknown compact format '{fmt}'")
+
+# =============================
+# DECODE (hub side)
+# =============================
+
+def decode(data: bytes, fmt: str = "json") -> List[dict]:
+    """
+    Decode any supported payload into a list of readings:
+        [{"device_uid": ..., "timestamp": ... or None, "sensors": [...]}, ...]
+    A JSON message yields one entry; a compact batch yields one per sample set.
+    """
+    if fmt == "json":
+        payload = json.loads(data)
+        return [{
+            "device_uid": payload.get("device_uid"),
+            "timestamp": payload.get("timestamp"),
+            "sensors": payload.get("sensors", []),
+        }]
+
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("msgpack not installed")
+        envelope = msgpack.unpackb(data, raw=False, strict_map_key=False)
+    elif fmt == "cbor":
+        if cbor2 is None:
+            raise RuntimeError("cbor2 not installed")
+        envelope = cbor2.loads(data)
+    else:
+        raise ValueError(f"Unknown format '{fmt}'")
+
+    if envelope.get("v") != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported envelope version {envelope.get('v')}")
+
+    keys = envelope["k"]
+    readings = []
+    for ts, values in envelope["s"]:
+        sensors = []
+        for key, value in values.items():
+            sensor_type, sensor_id = keys[int(key)]
+            sensor = {"type": sensor_type, "id": sensor_id}
+            if isinstance(value, dict):
+                sensor.update(value)
+            else:
+                sensor["value"] = value
+            sensors.append(sensor)
+        readings.append({"device_uid": envelope["d"], "timestamp": ts, "sensors": sensors})
+    return readings
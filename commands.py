@@ -0,0 +1,270 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("commands")
+
+
+class CommandDispatcher:
+    """
+    Runs incoming MQTT commands off paho's network thread.
+
+    Three lanes, each with its own worker thread:
+      - pump:   pump commands, history queries and profiling requests,
+                handled in arrival order, never behind a sensor sweep
+      - read:   read-now requests; everything that arrives while a read is
+                queued or running is answered by that one acquisition, and a
+                reading younger than `cache_seconds` is served without
+                touching the hardware
+      - reload: registry reloads, which wait for every bus to go idle (up
+                to RELOAD_TIMEOUT) and so stay out of the pump lane
+    """
+
+    def __init__(self, read_callback: Optional[Callable[[], list]],
+                 publish: Callable[[list], None],
+                 pump_handler: Callable[[dict], None],
+                 cache_seconds: float = 10,
+                 history_handler: Optional[Callable[[dict], None]] = None,
+                 reload_handler: Optional[Callable[[dict], None]] = None,
+                 profile_handler: Optional[Callable[[dict], None]] = None,
+                 answered: Optional[Callable[[list], None]] = None):
+        self.read_callback = read_callback
+        self.answered = answered
+        self.publish = publish
+        self.pump_handler = pump_handler
+        self.history_handler = history_handler
+        self.reload_handler = reload_handler
+        self.profile_handler = profile_handler
+        self.cache_seconds = cache_seconds
+
+        self._pump_queue: "queue.Queue[Optional[Tuple[str, dict]]]" = queue.Queue()
+        self._reload_queue: "queue.Queue[Optional[Tuple[str, dict]]]" = queue.Queue()
+        self._read_cond = threading.Condition()
+        self._requesters: List[str] = []
+        # (type, id) -> (taken_at, sensor dict), in reading order
+        self._cache: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+        self._cache_lock = threading.Lock()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+
+        self.reads = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._lane_worker, args=(self._pump_queue,), name="cmd-pump", daemon=True),
+            threading.Thread(target=self._read_worker, name="cmd-read", daemon=True),
+            threading.Thread(target=self._lane_worker, args=(self._reload_queue,), name="cmd-reload", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+        self._pump_queue.put(None)
+        self._reload_queue.put(None)
+        with self._read_cond:
+            self._read_cond.notify_all()
+
+    # =============================
+    # PUMP AND RELOAD LANES
+    # =============================
+
+    def submit_pump(self, payload: dict):
+        self._pump_queue.put(("pump", payload))
+
+    def submit_history(self, payload: dict):
+        """History queries take milliseconds, so they share the pump lane."""
+        self._pump_queue.put(("history", payload))
+
+    def submit_reload(self, payload: dict):
+        """Reloads have their own lane: waiting for the buses must not hold up pump commands."""
+        self._reload_queue.put(("reload", payload))
+
+    def submit_profile(self, payload: dict):
+        self._pump_queue.put(("profile", payload))
+
+    def _lane_worker(self, lane: "queue.Queue[Optional[Tuple[str, dict]]]"):
+        while self._running:
+            item = lane.get()
+            if item is None:
+                break
+            self._handle(*item)
+
+    def _handle(self, kind: str, payload: dict):
+        handler = {"pump": self.pump_handler, "history": self.history_handler,
+                   "reload": self.reload_handler, "profile": self.profile_handler}[kind]
+        if handler is None:
+            logger.warning("No handler for %s commands", kind)
+            return
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.error("%s command failed: %s", kind.capitalize(), e)
+
+    # =============================
+    # READ LANE
+    # =============================
+
+    def request_read(self, requested_by: str = "unknown"):
+        with self._read_cond:
+            self._requesters.append(requested_by)
+            self._read_cond.notify()
+
+    def remember(self, sensors: list, full: bool = True):
+        """
+        Cache readings taken elsewhere (e.g. the periodic loop). A partial
+        reading (full=False, one family's tick) is merged into the cache;
+        a full one replaces it, which also drops sensors no longer read.
+        """
+        if not sensors:
+            return
+        now = time.monotonic()
+        with self._cache_lock:
+            if full:
+                self._cache = {}
+            for sensor in sensors:
+                self._cache[(sensor.get("type"), sensor.get("id"))] = (now, sensor)
+
+    def _fresh_cache(self) -> Optional[list]:
+        """The cached reading if every sensor in it is younger than cache_seconds."""
+        now = time.monotonic()
+        with self._cache_lock:
+            if not self._cache or any(now - taken_at > self.cache_seconds for taken_at, _ in self._cache.values()):
+                return None
+            return [sensor for _, sensor in self._cache.values()]
+
+    def _read_worker(self):
+        while True:
+            with self._read_cond:
+                while self._running and not self._requesters:
+                    self._read_cond.wait()
+                if not self._running:
+                    break
+                requesters = self._requesters
+                self._requesters = []
+
+            try:
+                sensors = self._fresh_cache()
+                if sensors is not None:
+                    self.cache_hits += 1
+                    source = "cache"
+                elif self.read_callback is None:
+                    logger.warning("No read_callback provided - cannot trigger manual reading")
+                    continue
+                else:
+                    sensors = self.read_callback()
+                    self.reads += 1
+                    self.remember(sensors)
+                    source = "hardware"
+
+                # Requests that arrived while we were reading are answered by it too
+                with self._read_cond:
+                    requesters += self._requesters
+                    self._requesters = []
+                self._answer(sensors, source, requesters)
+            except Exception as e:
+                logger.error("Error during manual read: %s", e)
+
+    def _answer(self, sensors: list, source: str, requesters: List[str]):
+        self.coalesced += len(requesters) - 1
+        if sensors:
+            if self.answered is not None:
+                # Cache hits too: whatever is published counts as sent
+                self.answered(sensors)
+            self.publish(sensors)
+            logger.info(
+                f"Manual read complete ({source}) - published {len(sensors)} sensors "
+                f"for {len(requesters)} request(s): {', '.join(sorted(set(requesters)))}"
+            )
+        else:
+            logger.warning("Manual read returned no sensor data")
+
+
+class AsyncCommandDispatcher(CommandDispatcher):
+    """
+    CommandDispatcher for the asyncio runtime. Pump commands only queue
+    work for the pump timer, and history queries and profiling requests
+    take milliseconds, so they are handled inline on the event loop;
+    read-now requests are coalesced by one task, and read_callback is a
+    coroutine function. A reload waits for the buses to go idle, so it
+    runs as its own task and reload_handler is a coroutine function too.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._read_event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._read_event = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._read_worker_async(), name="cmd-read")
+
+    def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+
+    def submit_pump(self, payload: dict):
+        self._handle("pump", payload)
+
+    def submit_history(self, payload: dict):
+        self._handle("history", payload)
+
+    def submit_profile(self, payload: dict):
+        self._handle("profile", payload)
+
+    def submit_reload(self, payload: dict):
+        asyncio.get_running_loop().create_task(self._reload_async(payload), name="cmd-reload")
+
+    async def _reload_async(self, payload: dict):
+        if self.reload_handler is None:
+            logger.warning("No handler for reload commands")
+            return
+        try:
+            await self.reload_handler(payload)
+        except Exception as e:
+            logger.error("Reload command failed: %s", e)
+
+    def request_read(self, requested_by: str = "unknown"):
+        self._requesters.append(requested_by)
+        if self._read_event is not None:
+            self._read_event.set()
+
+    async def _read_worker_async(self):
+        while self._running:
+            await self._read_event.wait()
+            self._read_event.clear()
+            requesters, self._requesters = self._requesters, []
+            if not requesters:
+                continue
+
+            try:
+                sensors = self._fresh_cache()
+                if sensors is not None:
+                    self.cache_hits += 1
+                    source = "cache"
+                elif self.read_callback is None:
+                    logger.warning("No read_callback provided - cannot trigger manual reading")
+                    continue
+                else:
+                    sensors = await self.read_callback()
+                    self.reads += 1
+                    self.remember(sensors)
+                    source = "hardware"
+
+                requesters += self._requesters
+                self._requesters = []
+                self._answer(sensors, source, requesters)
+            except Exception as e:
+                logger.error("Error during manual read: %s", e)
@@ -20,3 +20,122 @@ DEVICE_UID = f"SA-PI-{PI_SERIAL.strip().upper()}"
 MQTT_USER =DEVICE_UID
 MQTT_PASS = os.getenv("MQTT_PASSWORD", "")
 PUBLISH_INTERVAL = int(os.getenv("PUBLISH_INTERVAL", "30"))
+ACQUISITION_WORKERS = int(os.getenv("ACQUISITION_WORKERS", "3"))
+# A bus read still running after this many seconds is abandoned for the
+# cycle and its sensors reported without a value (0 = wait forever)
+READ_DEADLINE = float(os.getenv("READ_DEADLINE", "10"))
+
+# Store-and-forward journal (readings taken while the broker is unreachable)
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "1") == "1"
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "data/journal.db")
+JOURNAL_MAX_BYTES = int(float(os.getenv("JOURNAL_MAX_MB", "20")) * 1024 * 1024)
+JOURNAL_MAX_AGE = int(os.getenv("JOURNAL_MAX_AGE_DAYS", "7")) * 86400
+JOURNAL_FLUSH_COUNT = int(os.getenv("JOURNAL_FLUSH_COUNT", "20"))
+JOURNAL_FLUSH_SECONDS = int(os.getenv("JOURNAL_FLUSH_SECONDS", "300"))
+REPLAY_BATCH_SIZE = int(os.getenv("REPLAY_BATCH_SIZE", "20"))
+REPLAY_INTERVAL = float(os.getenv("REPLAY_INTERVAL", "2"))
+
+# Wire format: json (original), msgpack or cbor (compact, batched)
+PAYLOAD_FORMAT = os.getenv("PAYLOAD_FORMAT", "json").lower()
+PAYLOAD_BATCH_SIZE = max(1, int(os.getenv("PAYLOAD_BATCH_SIZE", "1")))
+
+# Report-by-exception: only publish sensors that moved past their deadband
+# ("0.5" absolute or "5%" relative), plus a full heartbeat per sensor
+REPORT_BY_EXCEPTION = os.getenv("REPORT_BY_EXCEPTION", "0") == "1"
+REPORT_HEARTBEAT = int(os.getenv("REPORT_HEARTBEAT", "900"))
+DEADBANDS = {
+    "temperature": os.getenv("DEADBAND_TEMPERATURE", "0.2"),
+    "moisture": os.getenv("DEADBAND_MOISTURE", "1.0"),
+    "light": os.getenv("DEADBAND_LIGHT", "5%"),
+}
+
+# High-rate sampling: read every SAMPLE_INTERVAL seconds and publish one
+# min/max/mean/median/count summary per PUBLISH_INTERVAL window
+SAMPLE_INTERVAL = float(os.getenv("SAMPLE_INTERVAL", str(PUBLISH_INTERVAL)))
+SAMPLE_WINDOW_MAX = int(os.getenv("SAMPLE_WINDOW_MAX", "256"))
+OUTLIER_MAD_K = float(os.getenv("OUTLIER_MAD_K", "0"))  # 0 = keep every sample
+
+# cmd/<uid>/read-now is answered from a reading at most this old
+READ_NOW_CACHE_SECONDS = float(os.getenv("READ_NOW_CACHE_SECONDS", "10"))
+
+# On-node history: per-sensor ring files with 1 min / 15 min / 1 h rollups,
+# queried with cmd/<uid>/history (at most HISTORY_MAX_POINTS points per
+# sensor per answer)
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+HISTORY_PATH = os.getenv("HISTORY_PATH", "data/history")
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "1000"))
+
+# Probe tables (soil probes, light sensors, pump zones) as JSON; applied at
+# startup and again on SIGHUP (systemctl reload) or cmd/<uid>/reload.
+# Without the file the tables built into the driver modules are used.
+SENSOR_REGISTRY_PATH = os.getenv("SENSOR_REGISTRY_PATH", "sensors.json")
+# A reload waits at most this long for every bus to go idle, then answers ok: false
+RELOAD_TIMEOUT = float(os.getenv("RELOAD_TIMEOUT", "30"))
+
+# Pending readings, open sample windows and schedule position are saved on
+# shutdown and picked up by the next start if it comes within this many
+# seconds (e.g. a restart after an update)
+RESTART_STATE_PATH = os.getenv("RESTART_STATE_PATH", "data/restart.json")
+RESTART_STATE_MAX_AGE = float(os.getenv("RESTART_STATE_MAX_AGE", "600"))
+
+# cmd/<uid>/profile: a profiling session never runs longer than this, and
+# its summary on diag/<uid> is cut to at most this many bytes
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", "16384"))
+
+# "hardware" (Raspberry Pi) or "sim" (simulated devices, see sim/backend.py)
+HARDWARE_BACKEND = os.getenv("HARDWARE_BACKEND", "hardware").lower()
+
+# "threads" (paho network thread plus worker threads) or "asyncio" (one
+# event loop drives MQTT, sensor waits, pump timers and commands; blocking
+# sysfs reads and sensor re-probes run in the loop's executor). asyncio is
+# experimental: it cuts wake-ups, but tools/bench_runtime shows slightly
+# more RSS and CPU than threads, so threads stays the default
+RUNTIME = os.getenv("RUNTIME", "threads").lower()
+
+# Per-family read schedule: (period, phase) in seconds on a drift-free clock.
+# Families due together are read together; readings due within
+# PUBLISH_COALESCE_WINDOW of each other are published as one message.
+FAMILY_SCHEDULE = {
+    "temperature": (float(os.getenv("TEMPERATURE_PERIOD", str(SAMPLE_INTERVAL))),
+                    float(os.getenv("TEMPERATURE_PHASE", "0"))),
+    "moisture": (float(os.getenv("SOIL_PERIOD", str(SAMPLE_INTERVAL))),
+                 float(os.getenv("SOIL_PHASE", "0"))),
+    "light": (float(os.getenv("LIGHT_PERIOD", str(SAMPLE_INTERVAL))),
+              float(os.getenv("LIGHT_PHASE", "0"))),
+}
+PUBLISH_COALESCE_WINDOW = float(os.getenv("PUBLISH_COALESCE_WINDOW", "2"))
+
+# Metrics: Prometheus text on http://METRICS_BIND:METRICS_PORT/metrics
+# (0 = off) and a compact snapshot on metrics/<uid> every METRICS_INTERVAL
+# seconds (0 = off)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_BIND = os.getenv("METRICS_BIND", "127.0.0.1")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "300"))
+
+# On-node irrigation (targets per probe live in irrigation.ZONES)
+IRRIGATION_ENABLED = os.getenv("IRRIGATION_ENABLED", "0") == "1"
+IRRIGATION_SOAK_SECONDS = float(os.getenv("IRRIGATION_SOAK_SECONDS", "1800"))
+IRRIGATION_DAILY_BUDGET = float(os.getenv("IRRIGATION_DAILY_BUDGET", "600"))   # pump seconds per zone per day
+IRRIGATION_MAX_RUN = float(os.getenv("IRRIGATION_MAX_RUN", "120"))
+IRRIGATION_FAST_INTERVAL = float(os.getenv("IRRIGATION_FAST_INTERVAL", "1"))   # soil re-read while watering
+IRRIGATION_OVERRIDE_SECONDS = float(os.getenv("IRRIGATION_OVERRIDE_SECONDS", "3600"))
+IRRIGATION_STATE_PATH = os.getenv("IRRIGATION_STATE_PATH", "data/irrigation.json")
+
+# Publish pipeline: messages awaiting PUBACK at once, messages queued behind
+# them before publishes fall back to the journal, and when to give up
+# waiting for an ack. A persistent session (clean_session=False) makes the
+# broker hold QoS 1 commands while the node is briefly offline.
+MQTT_INFLIGHT_WINDOW = int(os.getenv("MQTT_INFLIGHT_WINDOW", "10"))
+MQTT_QUEUE_LIMIT = int(os.getenv("MQTT_QUEUE_LIMIT", "100"))
+MQTT_ACK_TIMEOUT = float(os.getenv("MQTT_ACK_TIMEOUT", "30"))
+MQTT_PERSISTENT_SESSION = os.getenv("MQTT_PERSISTENT_SESSION", "0") == "1"
+
+# Logging: one background writer thread; repeated messages are rate limited
+# per message; with LOG_DEBUG_RING > 0, DEBUG records are kept in a ring
+# buffer and only written out when an error is logged. LOG_FORMAT: text (default), compact or json.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_RATE_PER_MINUTE = float(os.getenv("LOG_RATE_PER_MINUTE", "10"))   # 0 = no limit
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", "5"))
+LOG_DEBUG_RING = int(os.getenv("LOG_DEBUG_RING", "0"))                 # opt-in: lowers the root level to DEBUG
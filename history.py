@@ -0,0 +1,409 @@
+import os
+import math
+import mmap
+import time
+import struct
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("history")
+
+# =============================
+# FILE LAYOUT
+# =============================
+# One file per sensor, <type>.<id>.hist, holding a fixed-size ring per tier:
+#
+#   header   magic, version, tier count, then per tier (bucket, slots, last, count)
+#   raw      (unix ts uint32, value float32) per sample
+#   rollups  (bucket start uint32, min, max, mean float32, count uint32) per bucket
+#
+# The file is memory-mapped and updated in place: a sample writes one raw
+# record and updates (or starts) the current bucket of every rollup tier,
+# so the newest bucket is always queryable and survives a restart. Files
+# never grow; the oldest records are overwritten.
+
+MAGIC = b"SAH1"
+VERSION = 1
+
+# name, bucket seconds (0 = raw samples), slots
+TIERS = (
+    ("raw", 0, 8640),      # 3 days at 30 s
+    ("1m", 60, 20160),     # 14 days
+    ("15m", 900, 8640),    # 90 days
+    ("1h", 3600, 17544),   # 2 years
+)
+
+_HEADER = struct.Struct("<4sHH")
+_TIER_STATE = struct.Struct("<IIII")   # bucket, slots, last, count
+_RAW = struct.Struct("<If")
+_ROLLUP = struct.Struct("<IfffI")
+_DATA_START = 128
+
+RAW_FIELDS = ["ts", "value"]
+ROLLUP_FIELDS = ["ts", "min", "max", "mean", "count"]
+
+
+class _Tier:
+    """One ring inside a mapped file. last/count are mirrored in the header."""
+
+    def __init__(self, mm: mmap.mmap, index: int, name: str, bucket: int, slots: int, offset: int):
+        self.mm = mm
+        self.name = name
+        self.bucket = bucket
+        self.slots = slots
+        self.offset = offset
+        self.record = _RAW if bucket == 0 else _ROLLUP
+        self.state_at = _HEADER.size + index * _TIER_STATE.size
+        _, _, self.last, self.count = _TIER_STATE.unpack_from(mm, self.state_at)
+
+    @property
+    def size(self) -> int:
+        return self.record.size * self.slots
+
+    def _save(self):
+        _TIER_STATE.pack_into(self.mm, self.state_at, self.bucket, self.slots, self.last, self.count)
+
+    def _at(self, i: int) -> int:
+        """Byte offset of logical record i (0 = oldest)."""
+        return self.offset + ((self.last - self.count + 1 + i) % self.slots) * self.record.size
+
+    def get(self, i: int) -> tuple:
+        return self.record.unpack_from(self.mm, self._at(i))
+
+    def ts(self, i: int) -> int:
+        return struct.unpack_from("<I", self.mm, self._at(i))[0]
+
+    def append(self, *fields):
+        self.last = (self.last + 1) % self.slots
+        self.count = min(self.count + 1, self.slots)
+        self.record.pack_into(self.mm, self.offset + self.last * self.record.size, *fields)
+        self._save()
+
+    def replace_last(self, *fields):
+        self.record.pack_into(self.mm, self.offset + self.last * self.record.size, *fields)
+
+    def bisect(self, ts: float) -> int:
+        """First logical index with a timestamp >= ts."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def records(self, lo: int, hi: int) -> List[tuple]:
+        """Logical records lo..hi-1, read as at most two contiguous slices."""
+        if hi <= lo:
+            return []
+        size = self.record.size
+        first = (self.last - self.count + 1 + lo) % self.slots
+        n = hi - lo
+        head = min(n, self.slots - first)
+        view = memoryview(self.mm)
+        try:
+            chunks = [view[self.offset + first * size:self.offset + (first + head) * size]]
+            if n > head:
+                chunks.append(view[self.offset:self.offset + (n - head) * size])
+            return [r for chunk in chunks for r in self.record.iter_unpack(chunk)]
+        finally:
+            view.release()
+
+    def add(self, ts: int, value: float):
+        if self.bucket == 0:
+            if self.count and ts < self.ts(self.count - 1):
+                return False
+            self.append(ts, value)
+            return True
+
+        start = ts - ts % self.bucket
+        if self.count:
+            last_start, low, high, mean, n = self.get(self.count - 1)
+            if start == last_start:
+                n += 1
+                self.replace_last(start, min(low, value), max(high, value), mean + (value - mean) / n, n)
+                return True
+            if start < last_start:
+                return False
+        self.append(start, value, value, value, 1)
+        return True
+
+
+class Series:
+    """History of one sensor, backed by a memory-mapped ring file."""
+
+    def __init__(self, path: str, sensor_type: str, sensor_id: str):
+        self.path = path
+        self.type = sensor_type
+        self.id = sensor_id
+        self.dropped = 0
+
+        size = _DATA_START + sum((_RAW if bucket == 0 else _ROLLUP).size * slots for _, bucket, slots in TIERS)
+        fresh = not os.path.exists(path) or os.path.getsize(path) != size or not self._layout_matches(path)
+        if fresh and os.path.exists(path):
+            logger.warning(f"History file {path} has a different layout — starting it afresh")
+            os.replace(path, path + ".old")
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        if fresh:
+            _HEADER.pack_into(self.mm, 0, MAGIC, VERSION, len(TIERS))
+            for i, (_, bucket, slots) in enumerate(TIERS):
+                _TIER_STATE.pack_into(self.mm, _HEADER.size + i * _TIER_STATE.size, bucket, slots, slots - 1, 0)
+
+        self.tiers: Dict[str, _Tier] = {}
+        offset = _DATA_START
+        for i, (name, bucket, slots) in enumerate(TIERS):
+            tier = _Tier(self.mm, i, name, bucket, slots, offset)
+            self.tiers[name] = tier
+            offset += tier.size
+
+    @staticmethod
+    def _layout_matches(path: str) -> bool:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size + len(TIERS) * _TIER_STATE.size)
+        if _HEADER.unpack_from(head) != (MAGIC, VERSION, len(TIERS)):
+            return False
+        for i, (_, bucket, slots) in enumerate(TIERS):
+            if _TIER_STATE.unpack_from(head, _HEADER.size + i * _TIER_STATE.size)[:2] != (bucket, slots):
+                return False
+        return True
+
+    def add(self, ts: float, value: float):
+        ts = int(ts)
+        for tier in self.tiers.values():
+            if not tier.add(ts, value):
+                # Wall clock stepped back (e.g. NTP after boot without an RTC)
+                self.dropped += 1
+                return
+
+    def covers(self, tier: _Tier, start: float) -> bool:
+        return tier.count > 0 and tier.ts(0) <= start
+
+    def query(self, start: float, end: float, tier_name: str) -> List[tuple]:
+        tier = self.tiers[tier_name]
+        return tier.records(tier.bisect(start), tier.bisect(end + 1))
+
+    def pick_tier(self, start: float, end: float, max_points: int) -> str:
+        """
+        Finest tier that reaches back to `start` with at most max_points in
+        range (or, when no tier reaches back that far, the finest within
+        max_points).
+        """
+        fitting = [name for name, tier in self.tiers.items()
+                   if tier.bisect(end + 1) - tier.bisect(start) <= max_points]
+        for name in fitting:
+            if self.covers(self.tiers[name], start):
+                return name
+        return fitting[0] if fitting else TIERS[-1][0]
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        self.mm.flush()
+        self.mm.close()
+
+# =============================
+# DOWNSAMPLING
+# =============================
+
+def downsample(records: List[tuple], step: int, raw: bool) -> List[tuple]:
+    """Merge raw samples or finer rollups into `step`-second buckets."""
+    out: List[list] = []
+    for record in records:
+        start = record[0] - record[0] % step
+        if raw:
+            low = high = mean = record[1]
+            n = 1
+        else:
+            _, low, high, mean, n = record
+        if out and out[-1][0] == start:
+            bucket = out[-1]
+            total = bucket[4] + n
+            bucket[1] = min(bucket[1], low)
+            bucket[2] = max(bucket[2], high)
+            bucket[3] += (mean - bucket[3]) * n / total
+            bucket[4] = total
+        else:
+            out.append([start, low, high, mean, n])
+    return [tuple(b) for b in out]
+
+# =============================
+# STORE
+# =============================
+
+def _timestamp(value, default: float, what: str) -> float:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"{what} must be a unix timestamp, got {value!r}")
+    try:
+        ts = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} must be a unix timestamp, got {value!r}")
+    if not math.isfinite(ts) or ts < 0:
+        raise ValueError(f"{what} must be a unix timestamp, got {value!r}")
+    return ts
+
+
+def _parse_query(request: dict) -> Tuple[float, float, Optional[List[str]]]:
+    """start, end and the sensor ids of a history request. Raises ValueError."""
+    end = _timestamp(request.get("end"), time.time(), "end")
+    start = _timestamp(request.get("start"), end - 86400, "start")
+    if start > end:
+        raise ValueError("start is after end")
+    wanted = request.get("sensors")
+    if isinstance(wanted, str):
+        wanted = [wanted]
+    if wanted is not None and (not isinstance(wanted, list) or not all(isinstance(w, str) for w in wanted)):
+        raise ValueError("sensors must be a list of sensor ids")
+    return start, end, wanted
+
+
+class HistoryStore:
+    """
+    Per-sensor history files in one directory. Readings are recorded as
+    they are taken; queries (cmd/<uid>/history) pick a tier per sensor and
+    return at most max_points points, with "next" set for paging when a
+    range holds more.
+    """
+
+    def __init__(self, directory: str, max_points: int = 1000):
+        self.directory = directory
+        self.max_points = max_points
+        self._series: Dict[Tuple[str, str], Series] = {}   # (type, id) -> series
+        self._lock = threading.Lock()
+        self._opened = False
+
+    def _open_locked(self):
+        """Open every existing file once, so sensors not read this boot stay queryable."""
+        if self._opened:
+            return
+        self._opened = True
+        os.makedirs(self.directory, exist_ok=True)
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".hist") or name.count(".") < 2:
+                continue
+            sensor_type, sensor_id = name[:-len(".hist")].split(".", 1)
+            try:
+                self._series[(sensor_type, sensor_id)] = Series(os.path.join(self.directory, name), sensor_type, sensor_id)
+            except (OSError, ValueError) as e:
+                logger.error(f"History file {name} unusable: {e}")
+        if self._series:
+            logger.info(f"History: {len(self._series)} series in {self.directory}")
+
+    def _get_locked(self, sensor_type: str, sensor_id: str) -> Series:
+        series = self._series.get((sensor_type, sensor_id))
+        if series is None:
+            path = os.path.join(self.directory, f"{sensor_type}.{sensor_id}.hist")
+            series = self._series[(sensor_type, sensor_id)] = Series(path, sensor_type, sensor_id)
+        return series
+
+    # =============================
+    # WRITE
+    # =============================
+
+    def record(self, sensors: List[dict], ts: Optional[float] = None):
+        """Add one reading per sensor dict; failed reads (value None) are skipped."""
+        ts = ts or time.time()
+        with self._lock:
+            try:
+                self._open_locked()
+                for s in sensors:
+                    value = s.get("value")
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        self._get_locked(s["type"], s["id"]).add(ts, float(value))
+            except OSError as e:
+                logger.error("History write failed: %s", e)
+
+    # =============================
+    # QUERY
+    # =============================
+
+    def query(self, request: dict) -> dict:
+        """
+        Answer a cmd/<uid>/history request:
+            {"sensors": ["soil-sensor-001"],   # omitted = all
+             "start": 1760000000, "end": 1760600000,  # unix seconds, default last 24 h
+             "resolution": "auto",   # or "raw", "1m", "15m", "1h", or a step in seconds
+             "request_id": "..."}    # echoed back
+        A sensor id matches every sensor type that uses it. A malformed
+        request is answered with {"request_id": ..., "error": ...}.
+        """
+        try:
+            start, end, wanted = _parse_query(request)
+        except ValueError as e:
+            return {"request_id": request.get("request_id"), "error": str(e)}
+        resolution = request.get("resolution", "auto")
+
+        response = {"request_id": request.get("request_id"), "start": int(start), "end": int(end), "series": []}
+        with self._lock:
+            self._open_locked()
+            for sensor_id in (wanted or sorted({key[1] for key in self._series})):
+                matches = [s for key, s in sorted(self._series.items()) if key[1] == sensor_id]
+                if not matches:
+                    response["series"].append({"id": sensor_id, "error": "unknown sensor"})
+                for series in matches:
+                    try:
+                        response["series"].append(self._query_series(series, start, end, resolution))
+                    except ValueError as e:
+                        response["series"].append({"type": series.type, "id": sensor_id, "error": str(e)})
+        return response
+
+    def _query_series(self, series: Series, start: float, end: float, resolution) -> dict:
+        step = None
+        if resolution == "auto":
+            tier = series.pick_tier(start, end, self.max_points)
+        elif resolution in series.tiers:
+            tier = resolution
+        else:
+            try:
+                step = int(resolution)
+            except (TypeError, ValueError):
+                raise ValueError(f"unknown resolution {resolution!r}")
+            if step <= 0:
+                raise ValueError(f"unknown resolution {resolution!r}")
+            # Coarsest tier that still has the detail asked for and reaches back far enough
+            usable = [name for name, bucket, _ in TIERS if bucket <= step and step % max(bucket, 1) == 0]
+            covering = [name for name in usable if series.covers(series.tiers[name], start)]
+            tier = (covering or usable)[-1]
+
+        records = series.query(start, end, tier)
+        raw = series.tiers[tier].bucket == 0
+        if step and step != series.tiers[tier].bucket:
+            records = downsample(records, step, raw)
+            raw = False
+
+        result = {
+            "type": series.type,
+            "id": series.id,
+            "resolution": tier if step is None else step,
+            "fields": RAW_FIELDS if raw else ROLLUP_FIELDS,
+        }
+        if len(records) > self.max_points:
+            result["next"] = records[self.max_points][0]
+            records = records[:self.max_points]
+        result["points"] = [
+            [r[0], round(r[1], 3)] if raw else [r[0], round(r[1], 3), round(r[2], 3), round(r[3], 3), r[4]]
+            for r in records
+        ]
+        return result
+
+    def flush(self):
+        with self._lock:
+            for series in self._series.values():
+                series.flush()
+
+    def close(self):
+        with self._lock:
+            for series in self._series.values():
+                series.close()
+            self._series.clear()
+            self._opened = False
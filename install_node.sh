@@ -142,6 +142,7 @@ User=$USER
 Group=$USER
 WorkingDirectory=$NODE_DIR
 ExecStart=$NODE_DIR/venv/bin/python $NODE_DIR/main.py
+ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 RestartSec=5
 EnvironmentFile=$NODE_DIR/.env
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import date
+from typing import Callable, Dict, Optional
+
+from pump import pump_control
+import metrics
+
+logger = logging.getLogger("irrigation")
+
+_RUNS = metrics.counter("irrigation_runs_total", "Automatic watering runs by stop reason", ("zone", "reason"))
+_WATER_SECONDS = metrics.counter("irrigation_pump_seconds_total", "Seconds of automatic watering", ("zone",))
+
+# =============================
+# ZONES
+# =============================
+# Per-probe targets in % moisture. Watering starts when a probe drops below
+# start_below and stops once it reaches stop_above; the gap between the two
+# is the hysteresis band that keeps the pump from chattering. "pump_zone"
+# picks the relay (pump_control.PUMP_ZONES), default the main pump.
+
+ZONES = {
+    "soil-sensor-001": {"start_below": 30.0, "stop_above": 40.0},
+    "soil-sensor-002": {"start_below": 30.0, "stop_above": 40.0},
+}
+
+
+class ZoneState:
+    """Per-zone bookkeeping, persisted so a restart can't reset the budget."""
+
+    def __init__(self, day: str = "", used: float = 0.0, last_end: float = 0.0):
+        self.day = day
+        self.used = used           # pump seconds spent on `day`
+        self.last_end = last_end   # wall time the last run finished
+        self.blocked = None        # last reason this zone was held back
+
+    def as_dict(self) -> dict:
+        return {"day": self.day, "used": round(self.used, 1), "last_end": self.last_end}
+
+# =============================
+# CONTROLLER
+# =============================
+
+class IrrigationController:
+    """
+    Closed-loop watering on the node itself, so plants are watered even when
+    the broker or hub is unreachable.
+
+    observe() is fed every scheduled moisture reading. When a zone is below
+    its start threshold, is out of its soak lockout and has budget left for
+    today, a run starts on the "irrigation" thread: the pump is started with
+    a hard time limit (pump_run_for's own timer, so it stops even if this
+    thread dies) and the soil is re-read every `fast_interval` seconds until
+    the probe reaches stop_above.
+
+    Any hub pump control command suspends automatic control for
+    `override_seconds` (read-only actions such as "status" do not);
+    {"action": "auto"} hands control back straight away.
+    """
+
+    def __init__(self, zones: Dict[str, dict],
+                 read_soil: Callable[[], Dict[str, Optional[float]]],
+                 publish: Callable[[dict], None],
+                 soak_seconds: float = 1800,
+                 daily_budget: float = 600,
+                 max_run: float = 120,
+                 fast_interval: float = 1.0,
+                 override_seconds: float = 3600,
+                 state_path: Optional[str] = None):
+        self.zones = zones
+        self.read_soil = read_soil
+        self.publish = publish
+        self.soak_seconds = soak_seconds
+        self.daily_budget = daily_budget
+        self.max_run = max_run
+        self.fast_interval = fast_interval
+        self.override_seconds = override_seconds
+        self.state_path = state_path
+
+        self.override_until = 0.0
+        self._state: Dict[str, ZoneState] = {zone: ZoneState() for zone in zones}
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pump_zone: Optional[str] = None   # relay of the automatic run in progress
+        self._stopped_at: Optional[float] = None   # monotonic time _cancel_run() stopped it
+        self._load()
+
+    # =============================
+    # DECISIONS
+    # =============================
+
+    def observe(self, sensors: list):
+        """Consider one round of readings; starts a run if a zone needs water."""
+        if self.watering:
+            return
+        if time.time() < self.override_until:
+            return
+
+        readings = {s["id"]: s.get("value") for s in sensors if s.get("type") == "moisture"}
+        candidates = []
+        held = []
+        with self._lock:
+            for zone, target in self.zones.items():
+                value = readings.get(zone)
+                if value is None or value >= target["start_below"]:
+                    self._state[zone].blocked = None
+                    continue
+                reason = self._blocked_reason(zone)
+                if reason:
+                    if self._hold(zone, reason):
+                        held.append((zone, reason, value))
+                    continue
+                candidates.append((value, zone))
+
+        for zone, reason, value in held:
+            self._event("hold", zone, reason=reason, moisture=value)
+        if candidates:
+            # One pump: water the driest zone first
+            value, zone = min(candidates)
+            self._start(zone, value)
+
+    def _blocked_reason(self, zone: str) -> Optional[str]:
+        state = self._budget_day(zone)
+        if time.time() - state.last_end < self.soak_seconds:
+            return "soaking"
+        if state.used >= self.daily_budget:
+            return "budget"
+        return None
+
+    def _hold(self, zone: str, reason: str) -> bool:
+        """Record why a zone is held back; True if the reason changed (publish it)."""
+        state = self._state[zone]
+        if state.blocked == reason:
+            return False
+        state.blocked = reason
+        return True
+
+    def _budget_day(self, zone: str) -> ZoneState:
+        state = self._state[zone]
+        today = date.today().isoformat()
+        if state.day != today:
+            state.day = today
+            state.used = 0.0
+        return state
+
+    # =============================
+    # WATERING
+    # =============================
+
+    @property
+    def watering(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _start(self, zone: str, value: float):
+        with self._lock:
+            if self.watering:
+                return
+            self._cancel.clear()
+            self._thread = threading.Thread(
+                target=self._water, args=(zone, value), name="irrigation", daemon=True
+            )
+            self._thread.start()
+
+    def _water(self, zone: str, start_value: float):
+        target = self.zones[zone]["stop_above"]
+        pump_zone = self.zones[zone].get("pump_zone", pump_control.DEFAULT_ZONE)
+
+        with self._lock:
+            if self._cancel.is_set():
+                return
+            state = self._budget_day(zone)
+            limit = min(self.max_run, self.daily_budget - state.used)
+            started = False
+            held = None   # hold reason to publish
+            if pump_control.is_running(pump_zone):
+                # The hub (or a plan) already has this relay
+                if self._hold(zone, "pump-busy"):
+                    held = "pump-busy"
+            elif pump_control.pump_run_for(limit, pump_zone, source="irrigation"):
+                started = True
+                self._pump_zone = pump_zone
+                self._stopped_at = None
+            else:
+                held = "pump-unavailable"
+        if held:
+            self._event("hold", zone, reason=held, moisture=start_value)
+        if not started:
+            return
+
+        self._event("start", zone, moisture=start_value, target=target, limit=round(limit, 1))
+
+        # The run can wait in the pump queue behind other zones; it is only
+        # timed and judged once the relay is actually on
+        reason = "time-limit"
+        value = start_value
+        started = pump_control.started_at(pump_zone)
+        while started is None and pump_control.is_running(pump_zone):
+            if self._cancel.wait(self.fast_interval):
+                reason = "override"
+                break
+            started = pump_control.started_at(pump_zone)
+        if started is None and reason != "override":
+            reason = "cancelled"   # dropped from the queue before it started
+
+        while started is not None and reason != "override" and pump_control.is_running(pump_zone):
+            if self._cancel.wait(self.fast_interval):
+                reason = "override"
+                break
+            try:
+                value = self.read_soil().get(zone)
+            except Exception as e:
+                logger.error("Soil read failed while watering %s: %s", zone, e)
+                value = None
+            if value is None:
+                # Fail safe: never keep watering blind
+                reason = "read-failed"
+                break
+            if value >= target:
+                reason = "target"
+                break
+
+        with self._lock:
+            # After an override _cancel_run() has already stopped the run;
+            # stopping it here could cut off the hub's own run on this relay
+            if not self._cancel.is_set():
+                pump_control.stop_run(pump_zone)
+            self._pump_zone = None
+            ended = self._stopped_at or time.monotonic()
+            # The run stops by itself after `limit` seconds, possibly between two checks
+            ran = 0.0 if started is None else max(0.0, min(ended - started, limit))
+            state = self._budget_day(zone)
+            state.used += ran
+            state.last_end = time.time()
+            used = state.used
+            self._save()
+        _RUNS.inc(zone=zone, reason=reason)
+        _WATER_SECONDS.inc(ran, zone=zone)
+        self._event("stop", zone, reason=reason, moisture=value, seconds=round(ran, 1),
+                    used_today=round(used, 1))
+
+    # =============================
+    # HUB OVERRIDE
+    # =============================
+
+    def handle_command(self, payload: dict):
+        """
+        pump/<uid> handler: the hub always wins. Any pump control action
+        stops a running automatic cycle and pauses automatic control; "auto"
+        resumes it. Read-only actions ("status") pass straight through.
+        """
+        action = payload.get("action")
+        if action == "auto":
+            self.override_until = 0.0
+            self._event("auto", None)
+            return
+        if action not in pump_control.CONTROL_ACTIONS:
+            pump_control.handle_pump_command(payload)
+            return
+
+        with self._lock:
+            self.override_until = time.time() + self.override_seconds
+            self._cancel_run()
+        self._event("override", None, until=int(self.override_until))
+        pump_control.handle_pump_command(payload)
+
+    def _cancel_run(self):
+        # Called with _lock held. The automatic run is stopped here rather
+        # than left to the worker: it may be stuck in a soil read and would
+        # otherwise stop the relay after the hub has started it again
+        self._cancel.set()
+        if self._pump_zone is not None:
+            pump_control.stop_run(self._pump_zone)
+            self._pump_zone = None
+            self._stopped_at = time.monotonic()
+
+    def stop(self):
+        with self._lock:
+            self._cancel_run()
+        if self._thread:
+            self._thread.join(timeout=self.fast_interval + 5)
+
+    # =============================
+    # EVENTS / STATE
+    # =============================
+
+    def _event(self, action: str, zone: Optional[str], **details):
+        event = {"ts": int(time.time()), "action": action}
+        if zone:
+            event["zone"] = zone
+        event.update(details)
+        logger.info("💧 Irrigation %s: %s", action, event)
+        try:
+            self.publish(event)
+        except Exception as e:
+            logger.error("Failed to publish irrigation event: %s", e)
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                saved = json.load(f)
+            for zone, values in saved.items():
+                if zone in self._state:
+                    self._state[zone] = ZoneState(**values)
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable irrigation state {self.state_path}: {e}")
+
+    def _save(self):
+        if not self.state_path:
+            return
+        try:
+            directory = os.path.dirname(self.state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({zone: s.as_dict() for zone, s in self._state.items()}, f)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            logger.error("Failed to save irrigation state: %s", e)
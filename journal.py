@@ -0,0 +1,141 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+from typing import List, Tuple
+
+logger = logging.getLogger("journal")
+
+
+class ReadingJournal:
+    """
+    Durable store-and-forward buffer for payloads that could not be published.
+
+    Backed by SQLite. Appends are held in memory and written in a single
+    transaction once enough have accumulated (or enough time has passed), so
+    the SD card sees a few large writes instead of one per reading. The
+    journal is bounded by total payload size and by age; the oldest entries
+    are evicted first.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_age: float,
+                 flush_count: int = 20, flush_interval: float = 300):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[float, str, bytes]] = []
+        self._pending_since = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS readings ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " ts REAL NOT NULL,"
+            " topic TEXT NOT NULL,"
+            " payload BLOB NOT NULL)"
+        )
+        row = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM readings").fetchone()
+        self._stored_count, self._stored_bytes = row
+
+        if self._stored_count:
+            logger.info(f"Journal {path}: {self._stored_count} readings waiting to be replayed")
+
+    # =============================
+    # WRITE
+    # =============================
+
+    def append(self, topic: str, payload: bytes, ts: float = None):
+        """Queue one payload; it reaches disk on the next flush."""
+        with self._lock:
+            now = time.time()
+            self._pending.append((ts or now, topic, payload))
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+
+            if (len(self._pending) >= self.flush_count or
+                    time.monotonic() - self._pending_since >= self.flush_interval):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+
+        rows = self._pending
+        self._pending = []
+        self._pending_since = None
+
+        try:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT INTO readings (ts, topic, payload) VALUES (?, ?, ?)", rows)
+            self._evict_locked()
+            self._db.execute("COMMIT")
+            logger.info("Journal: wrote %d readings (%d stored)", len(rows), self._stored_count)
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            logger.error("Journal write failed, %d readings lost: %s", len(rows), e)
+
+    def _evict_locked(self):
+        """Drop expired entries, then the oldest until under the size limit."""
+        cutoff = time.time() - self.max_age
+        self._db.execute("DELETE FROM readings WHERE ts < ?", (cutoff,))
+
+        while self._recount_locked() and self._stored_bytes > self.max_bytes:
+            excess = self._stored_bytes - self.max_bytes
+            average = max(1, self._stored_bytes // self._stored_count)
+            drop = max(1, -(-excess // average))
+            self._db.execute(
+                "DELETE FROM readings WHERE id IN (SELECT id FROM readings ORDER BY id LIMIT ?)",
+                (drop,)
+            )
+            logger.warning("Journal full — evicted %d oldest readings", drop)
+
+    def _recount_locked(self) -> int:
+        row = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM readings").fetchone()
+        self._stored_count, self._stored_bytes = row
+        return self._stored_count
+
+    # =============================
+    # REPLAY
+    # =============================
+
+    def peek(self, limit: int) -> List[Tuple[int, str, bytes]]:
+        """Oldest stored entries as (id, topic, payload); pending ones are flushed first."""
+        with self._lock:
+            self._flush_locked()
+            return self._db.execute(
+                "SELECT id, topic, payload FROM readings ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+
+    def remove(self, ids: List[int]):
+        """Delete entries once they have been delivered."""
+        if not ids:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM readings WHERE id = ?", [(i,) for i in ids])
+            self._db.execute("COMMIT")
+            self._recount_locked()
+
+    def __len__(self):
+        with self._lock:
+            return self._stored_count + len(self._pending)
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._db.close()
@@ -0,0 +1,234 @@
+import sys
+import copy
+import json
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict, deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Tuple
+
+# =============================
+# RATE LIMITING
+# =============================
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per message key (logger, level, unformatted message), so a
+    warning repeated every cycle is logged `burst` times and then at most
+    `per_minute` times a minute. The next record that gets through carries
+    the number suppressed in between.
+
+    The key uses record.msg before %-args are applied, so lazily formatted
+    calls like logger.warning("%s failed", probe) share one bucket; an
+    f-string with a changing number gets a bucket per value and is never
+    limited, so repeated messages should use %-args. At most `max_keys`
+    buckets are kept, least recently used dropped first. Records below
+    `min_level` only go to the in-memory ring and are not limited.
+    """
+
+    def __init__(self, per_minute: float = 10, burst: int = 5, min_level: int = logging.NOTSET,
+                 max_keys: int = 512):
+        super().__init__()
+        self.min_level = min_level
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_keys = max(1, max_keys)
+        # key -> [tokens, last, suppressed], least recently logged first
+        self._buckets: "OrderedDict[Tuple[str, int, str], list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno < self.min_level:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = record.created
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] = tokens - 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+# =============================
+# DEBUG RING BUFFER
+# =============================
+
+class DebugRingHandler(logging.Handler):
+    """
+    Keeps the last `capacity` records that are below the console level
+    (normally DEBUG) in memory and writes them out only when a record at
+    `flush_level` or above arrives, so an error comes with its context
+    without that context ever touching the SD card otherwise.
+    """
+
+    def __init__(self, target: logging.Handler, capacity: int = 200,
+                 flush_level: int = logging.ERROR):
+        super().__init__(level=logging.NOTSET)
+        self.target = target
+        self.flush_level = flush_level
+        self._records = deque(maxlen=capacity)
+
+    def emit(self, record: logging.LogRecord):
+        if record.levelno >= self.flush_level:
+            self.flush()
+        elif record.levelno < self.target.level:
+            self._records.append(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            records = list(self._records)
+            self._records.clear()
+        finally:
+            self.release()
+        if not records:
+            return
+        # Handler.handle() skips the level check, so these reach the console
+        self.target.handle(_marker(f"--- {len(records)} recent debug records ---"))
+        for record in records:
+            self.target.handle(record)
+        self.target.handle(_marker("--- end of debug records ---"))
+
+
+def _marker(text: str) -> logging.LogRecord:
+    return logging.LogRecord("log", logging.INFO, __file__, 0, text, None, None)
+
+# =============================
+# FORMATTERS
+# =============================
+
+_LEVEL_CODES = {"DEBUG": "D", "INFO": "I", "WARNING": "W", "ERROR": "E", "CRITICAL": "C"}
+
+
+class _SuppressedMixin:
+    def _suffix(self, record) -> str:
+        count = getattr(record, "suppressed", 0)
+        return f" [+{count} suppressed]" if count else ""
+
+
+class TextFormatter(_SuppressedMixin, logging.Formatter):
+    """The original basicConfig layout: LEVEL:name:message."""
+
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+
+    def format(self, record):
+        return super().format(record) + self._suffix(record)
+
+
+class CompactFormatter(_SuppressedMixin, logging.Formatter):
+    """One short line per record: 'HH:MM:SS.mmm I name: message'."""
+
+    def format(self, record):
+        ts = time.strftime("%H:%M:%S", time.localtime(record.created))
+        line = (f"{ts}.{int(record.msecs):03d} {_LEVEL_CODES.get(record.levelname, '?')} "
+                f"{record.name}: {record.getMessage()}{self._suffix(record)}")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(_SuppressedMixin, logging.Formatter):
+    """One JSON object per line for log shippers: t, l, n, m (+ x, s)."""
+
+    def format(self, record):
+        entry = {
+            "t": round(record.created, 3),
+            "l": _LEVEL_CODES.get(record.levelname, "?"),
+            "n": record.name,
+            "m": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["x"] = self.formatException(record.exc_info)
+        if getattr(record, "suppressed", 0):
+            entry["s"] = record.suppressed
+        return json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+
+
+FORMATTERS = {"text": TextFormatter, "compact": CompactFormatter, "json": JsonFormatter}
+
+# =============================
+# QUEUE HANDLER
+# =============================
+
+class _SnapshotQueueHandler(QueueHandler):
+    """
+    Merges msg and args in the calling thread, so a mutable argument is
+    logged as it was at the call, and hands a copy to the listener thread.
+    Unlike the stock QueueHandler it leaves layout and exc_info to the
+    listener's formatter. Filters (the rate limiter) run before this and
+    still see the raw msg.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure(level: str = "INFO", fmt: str = "text", rate_per_minute: float = 10,
+              burst: int = 5, debug_ring: int = 0, stream=None) -> QueueListener:
+    """
+    Route all logging through a queue to one background writer thread.
+    Replaces logging.basicConfig for the node; call stop() before exit so
+    the queue is drained.
+    """
+    global _listener
+    console_level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+    if not isinstance(console_level, int):
+        console_level = logging.INFO
+
+    console = logging.StreamHandler(stream or sys.stderr)
+    console.setLevel(console_level)
+    console.setFormatter(FORMATTERS.get(fmt, TextFormatter)())
+
+    handlers = [console]
+    root_level = console_level
+    if debug_ring > 0 and console_level > logging.DEBUG:
+        # Ring handler goes first so the context lands before the error
+        handlers.insert(0, DebugRingHandler(console, capacity=debug_ring))
+        root_level = logging.DEBUG
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _SnapshotQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate_per_minute, burst, min_level=console_level))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(root_level)
+
+    stop()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop():
+    """Drain the queue and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
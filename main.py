@@ -1,35 +1,411 @@
 import time
+_STARTED = time.monotonic()
+
+import sys
+import signal
+import asyncio
 import logging
-from mqtt_client import MQTTNode
-from sensors import temperature, light
-from sensors.temperature import read_all_temperatures
-from sensors.light import read_all_light
-from sensors.moisture import read_all_moisture
+from concurrent.futures import ThreadPoolExecutor
+from config import HARDWARE_BACKEND
+from config import LOG_LEVEL, LOG_FORMAT, LOG_RATE_PER_MINUTE, LOG_RATE_BURST, LOG_DEBUG_RING
+import logsetup
+
+logsetup.configure(
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    rate_per_minute=LOG_RATE_PER_MINUTE,
+    burst=LOG_RATE_BURST,
+    debug_ring=LOG_DEBUG_RING
+)
+
+if HARDWARE_BACKEND == "sim":
+    # Must run before any driver module imports board / busio / RPi.GPIO
+    from sim import backend
+    backend.install()
+
+from mqtt_client import AsyncMQTTNode, MQTTNode
+from sensors import temperature, light, moisture
+from sensors.temperature import read_all_temperatures, read_all_temperatures_async
+from sensors.light import read_all_light, read_all_light_async
+from sensors.moisture import read_all_moisture, read_all_moisture_async
+from sensors.acquisition import AcquisitionEngine, Source
+from report_filter import ReportFilter
+from history import HistoryStore
+from sampling import WindowAggregator
+from scheduler import Scheduler
+from irrigation import IrrigationController, ZONES
+import metrics
+import registry
+import restart_state
+import profiling
 from pump import pump_control
-from config import PUBLISH_INTERVAL
+from config import PUBLISH_INTERVAL, ACQUISITION_WORKERS, READ_DEADLINE, RUNTIME
+from config import REPORT_BY_EXCEPTION, REPORT_HEARTBEAT, DEADBANDS
+from config import SAMPLE_WINDOW_MAX, OUTLIER_MAD_K
+from config import FAMILY_SCHEDULE, PUBLISH_COALESCE_WINDOW
+from config import METRICS_PORT, METRICS_BIND, METRICS_INTERVAL
+from config import HISTORY_ENABLED, HISTORY_PATH, HISTORY_MAX_POINTS
+from config import SENSOR_REGISTRY_PATH, RELOAD_TIMEOUT, RESTART_STATE_PATH, RESTART_STATE_MAX_AGE
+from config import (
+    IRRIGATION_ENABLED, IRRIGATION_SOAK_SECONDS, IRRIGATION_DAILY_BUDGET, IRRIGATION_MAX_RUN,
+    IRRIGATION_FAST_INTERVAL, IRRIGATION_OVERRIDE_SECONDS, IRRIGATION_STATE_PATH
+)
+
+logger = logging.getLogger("main")
+
+_IMPORTED = time.monotonic()
+
+# Each driver family runs on its own worker. ADS1115 and BH1750 share the
+# I2C bus, but individual transfers are serialised by sensors.bus, so the
+# soil settle time overlaps with the light reads.
+acquisition = AcquisitionEngine([
+    Source("temperature", "w1", read_all_temperatures, read_all_temperatures_async),
+    Source("moisture", "ads1115", read_all_moisture, read_all_moisture_async),
+    Source("light", "bh1750", read_all_light, read_all_light_async),
+], max_workers=ACQUISITION_WORKERS, deadline=READ_DEADLINE)
 
-logging.basicConfig(level=logging.INFO)
+report_filter = ReportFilter(DEADBANDS, REPORT_HEARTBEAT) if REPORT_BY_EXCEPTION else None
+
+# Every reading taken is kept on disk (files are opened on first use)
+history = HistoryStore(HISTORY_PATH, max_points=HISTORY_MAX_POINTS) if HISTORY_ENABLED else None
+
+# Sampling faster than publishing: keep each window's readings and publish
+# a summary instead of a single shot
+aggregator = None
+fastest_period = min(period for period, _ in FAMILY_SCHEDULE.values())
+if 0 < fastest_period < PUBLISH_INTERVAL:
+    aggregator = WindowAggregator(
+        capacity=min(SAMPLE_WINDOW_MAX, int(PUBLISH_INTERVAL / fastest_period) + 1),
+        outlier_k=OUTLIER_MAD_K
+    )
+
+def read_soil() -> dict:
+    """Moisture only, through the engine so it never overlaps a scheduled scan."""
+    return {s["id"]: s["value"] for s in acquisition.run_cycle(["moisture"])}
+
+def build_irrigation(publish):
+    if not IRRIGATION_ENABLED:
+        return None
+    return IrrigationController(
+        ZONES,
+        read_soil=read_soil,
+        publish=publish,
+        soak_seconds=IRRIGATION_SOAK_SECONDS,
+        daily_budget=IRRIGATION_DAILY_BUDGET,
+        max_run=IRRIGATION_MAX_RUN,
+        fast_interval=IRRIGATION_FAST_INTERVAL,
+        override_seconds=IRRIGATION_OVERRIDE_SECONDS,
+        state_path=IRRIGATION_STATE_PATH
+    )
 
 def build_sensor_payload():
-    sensors = []
-    sensors.extend(read_all_temperatures())
-    sensors.extend(read_all_moisture())
-    sensors.extend(read_all_light())
-    return sensors
+    return acquisition.run_cycle()
+
+def read_now():
+    """Manual read: always a full snapshot (the node refreshes the filter state as it answers)."""
+    return build_sensor_payload()
+
+async def read_now_async():
+    return await acquisition.run_cycle_async()
+
+def reload_sensors(request: dict) -> dict:
+    """cmd/<uid>/reload and SIGHUP: apply the sensor registry while no bus is being read."""
+    try:
+        with acquisition.hold(RELOAD_TIMEOUT):
+            return registry.reload(SENSOR_REGISTRY_PATH, request)
+    except TimeoutError as e:
+        return reload_refused(request, e)
+
+async def reload_sensors_async(request: dict) -> dict:
+    try:
+        async with acquisition.hold_async(RELOAD_TIMEOUT):
+            return registry.reload(SENSOR_REGISTRY_PATH, request)
+    except TimeoutError as e:
+        return reload_refused(request, e)
+
+def reload_refused(request: dict, error: Exception) -> dict:
+    logger.error(f"Sensor registry not applied: {error}")
+    return {"request_id": (request or {}).get("request_id"), "ts": int(time.time()),
+            "ok": False, "error": str(error)}
+
+def publish(node, sensors):
+    if report_filter:
+        sensors = report_filter.filter(sensors)
+    if sensors:
+        start = time.monotonic()
+        node.publish_sensors(sensors)
+        profiling.note("publish", time.monotonic() - start)
+
+def build_schedule() -> Scheduler:
+    """
+    One task per sensor family, plus a publish task when aggregating windows
+    and a metrics task when the MQTT metrics message is enabled.
+    """
+    schedule = Scheduler()
+    for name, (period, phase) in FAMILY_SCHEDULE.items():
+        schedule.add(name, period, phase)
+    if aggregator:
+        schedule.add("publish", PUBLISH_INTERVAL, phase=PUBLISH_INTERVAL)
+    if METRICS_INTERVAL > 0:
+        schedule.add("metrics", METRICS_INTERVAL, phase=METRICS_INTERVAL)
+    return schedule
+
+class PendingReadings:
+    """Readings held back for coalescing, newest value per (type, id)."""
+
+    def __init__(self):
+        self.readings = {}
+        self.since = None
+
+    def add(self, sensors):
+        self.readings.update(((s["type"], s["id"]), s) for s in sensors)
+
+    def snapshot(self) -> list:
+        return list(self.readings.values())
+
+    def restore(self, sensors: list):
+        self.add(sensors)
+
+    def flush(self, node, schedule: Scheduler):
+        if not self.readings or node.backpressure:
+            return
+        now = time.monotonic()
+        self.since = self.since or now
+        if (schedule.time_to_next() > PUBLISH_COALESCE_WINDOW or
+                now - self.since >= PUBLISH_COALESCE_WINDOW):
+            publish(node, list(self.readings.values()))
+            self.readings.clear()
+            self.since = None
+
+def save_state(schedule: Scheduler, pending: PendingReadings):
+    """On a clean shutdown: what the next start needs to carry on where this one stopped."""
+    if RESTART_STATE_PATH:
+        restart_state.save(RESTART_STATE_PATH, {
+            "schedule": schedule.snapshot(),
+            "pending": pending.snapshot(),
+            "windows": aggregator.snapshot() if aggregator else [],
+        })
+
+def restore_state(schedule: Scheduler, pending: PendingReadings):
+    state = restart_state.load(RESTART_STATE_PATH, RESTART_STATE_MAX_AGE)
+    if not state:
+        return
+    schedule.restore(state.get("schedule", {}))
+    pending.restore(state.get("pending", []))
+    if aggregator:
+        aggregator.restore(state.get("windows", []))
+    logger.info(f"Carried on from the last run ({time.time() - state['saved_at']:.1f}s ago): "
+                f"{len(pending.readings)} pending readings, {len(state.get('windows', []))} open windows")
+
+def handle_tick(node, schedule: Scheduler, due: set, families: list, sensors: list,
+                pending: PendingReadings, irrigation=None):
+    """Everything a tick does after the sensors were read (shared by both runtimes)."""
+    if families:
+        if history:
+            history.record(sensors)
+        # Each family's readings go into the read-now cache as they arrive
+        node.commands.remember(sensors, full=len(families) == len(FAMILY_SCHEDULE))
+        if irrigation and "moisture" in families:
+            irrigation.observe(sensors)
+        if aggregator:
+            aggregator.add(sensors)
+        else:
+            pending.add(sensors)
+
+    if "publish" in due:
+        pending.add(aggregator.flush())
+
+    if "metrics" in due:
+        node.publish_metrics()
+
+    pending.flush(node, schedule)
+
+def run(node, schedule: Scheduler, pending: PendingReadings, irrigation=None, on_first_tick=None):
+    """
+    Families due at the same tick are read together. Readings are held while
+    another task is due within PUBLISH_COALESCE_WINDOW (but never longer than
+    that window), so ticks that land close together go out as one message.
+    While the publish pipeline reports backpressure, readings stay pending
+    and newer values replace older ones, so a slow broker gets one
+    up-to-date message instead of a growing backlog.
+    """
+    while not schedule.stopped:
+        due = {task.name for task in schedule.wait_due()}
+
+        start = time.monotonic()
+        families = [name for name in FAMILY_SCHEDULE if name in due]
+        with profiling.section():
+            sensors = acquisition.run_cycle(families) if families else []
+            handle_tick(node, schedule, due, families, sensors, pending, irrigation)
+        profiling.cycle_done(time.monotonic() - start, acquisition.last_timing if families else None)
+
+        if on_first_tick:
+            on_first_tick()
+            on_first_tick = None
+
+async def run_async(node, schedule: Scheduler, pending: PendingReadings, on_first_tick=None):
+    """run() for the asyncio runtime: the tick wait and the reads are awaited."""
+    while not schedule.stopped:
+        delay = schedule.time_to_next()
+        if delay > 0:
+            await asyncio.sleep(delay)
+            continue
+        due = {task.name for task in schedule.pop_due()}
+
+        start = time.monotonic()
+        families = [name for name in FAMILY_SCHEDULE if name in due]
+        with profiling.section():
+            sensors = await acquisition.run_cycle_async(families) if families else []
+            handle_tick(node, schedule, due, families, sensors, pending)
+        profiling.cycle_done(time.monotonic() - start, acquisition.last_timing if families else None)
+
+        if on_first_tick:
+            on_first_tick()
+            on_first_tick = None
+
+def init_hardware(pump_timer_thread: bool = True) -> dict:
+    """
+    Probe the independent sensor families (and the pump relay) in parallel.
+    Returns seconds spent per family.
+    """
+    families = {
+        "temperature": temperature.init,
+        "moisture": moisture.init,
+        "light": light.init,
+        "pump": lambda: pump_control.init(timer_thread=pump_timer_thread),
+    }
+    timings = {}
+
+    def timed(name, init):
+        start = time.monotonic()
+        try:
+            init()
+        except Exception as e:
+            logger.exception(f"Failed to initialise {name}: {e}")
+        timings[name] = time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=len(families), thread_name_prefix="init") as pool:
+        for name, init in families.items():
+            pool.submit(timed, name, init)
+    return timings
+
+def log_startup(phases: dict, families: dict):
+    if acquisition.last_timing:
+        phases["first_cycle"] = acquisition.last_timing.total
+    breakdown = ", ".join(f"{name} {t:.2f}s" for name, t in phases.items())
+    per_family = ", ".join(f"{name} {t:.2f}s" for name, t in families.items())
+    logger.info(
+        f"Startup: first reading {time.monotonic() - _STARTED:.2f}s after launch "
+        f"({breakdown}; hardware: {per_family})"
+    )
 
 def main():
-    # init hardware
-    light.init()
-    temperature.init()
-    pump_control.init()
+    phases = {"imports": _IMPORTED - _STARTED}
 
-    node = MQTTNode(read_callback=build_sensor_payload)
+    runtime = RUNTIME
+    if runtime == "asyncio" and IRRIGATION_ENABLED:
+        # The controller's watering loop blocks on re-reads
+        logger.warning("Irrigation controller needs the threaded runtime — using RUNTIME=threads")
+        runtime = "threads"
+
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT, METRICS_BIND)
+
+    registry.apply_file(SENSOR_REGISTRY_PATH)
+
+    start = time.monotonic()
+    families = init_hardware(pump_timer_thread=runtime != "asyncio")
+    phases["hardware"] = time.monotonic() - start
+
+    try:
+        if runtime == "asyncio":
+            asyncio.run(main_async(phases, families))
+        else:
+            main_threads(phases, families)
+    finally:
+        pump_control.cleanup()
+        if history:
+            history.close()
+        logsetup.stop()
+
+def main_threads(phases: dict, families: dict):
+    # The controller publishes through the node, and the node routes hub
+    # pump commands through the controller so they override it
+    irrigation = build_irrigation(publish=lambda event: node.publish_irrigation(event))
+
+    start = time.monotonic()
+    node = MQTTNode(
+        read_callback=read_now,
+        # After a reconnect send everything once so the hub is back in sync
+        connect_callback=report_filter.reset if report_filter else None,
+        pump_handler=irrigation.handle_command if irrigation else None,
+        history_query=history.query if history else None,
+        reload_handler=reload_sensors,
+        profile_handler=lambda request: profiling.start(request, node.publish_diag),
+        read_answered=report_filter.snapshot if report_filter else None
+    )
     node.connect()
+    pump_control.set_listener(node.publish_pump_event)
+    phases["mqtt"] = time.monotonic() - start
 
-    while True:
-        sensors = build_sensor_payload()
-        node.publish_sensors(sensors)
-        time.sleep(PUBLISH_INTERVAL)
+    # systemctl stop/restart sends SIGTERM: exit through finally so the
+    # journal is flushed to disk
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # systemctl reload sends SIGHUP: re-read the sensor registry
+    signal.signal(signal.SIGHUP, lambda signum, frame: node.commands.submit_reload({}))
+
+    schedule = build_schedule()
+    pending = PendingReadings()
+    restore_state(schedule, pending)
+    try:
+        run(node, schedule, pending, irrigation, on_first_tick=lambda: log_startup(phases, families))
+    finally:
+        schedule.stop()
+        save_state(schedule, pending)
+        if irrigation:
+            irrigation.stop()
+        node.close()
+
+async def main_async(phases: dict, families: dict):
+    """
+    Single-threaded runtime: MQTT socket, acquisition, pump timer, commands
+    and publishing are all tasks on one event loop.
+    """
+    loop = asyncio.get_running_loop()
+
+    start = time.monotonic()
+    node = AsyncMQTTNode(
+        read_callback=read_now_async,
+        connect_callback=report_filter.reset if report_filter else None,
+        history_query=history.query if history else None,
+        reload_handler=reload_sensors_async,
+        profile_handler=lambda request: profiling.start(request, node.publish_diag),
+        read_answered=report_filter.snapshot if report_filter else None
+    )
+    node.connect()
+    pump_control.set_listener(node.publish_pump_event)
+    phases["mqtt"] = time.monotonic() - start
+
+    schedule = build_schedule()
+    pending = PendingReadings()
+    restore_state(schedule, pending)
+    timer = loop.create_task(pump_control.run_timer(), name="pump-timer")
+    runner = loop.create_task(run_async(node, schedule, pending,
+                                        on_first_tick=lambda: log_startup(phases, families)))
+    # SIGTERM (systemctl stop) and Ctrl-C end the run task, then clean up below
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, runner.cancel)
+    loop.add_signal_handler(signal.SIGHUP, lambda: node.commands.submit_reload({}))
+
+    try:
+        await runner
+    except asyncio.CancelledError:
+        pass
+    finally:
+        schedule.stop()
+        save_state(schedule, pending)
+        timer.cancel()
+        await node.close_async()
 
 if __name__ == "__main__":
     main()
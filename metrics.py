@@ -0,0 +1,304 @@
+import time
+import json
+import logging
+import resource
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("metrics")
+
+# Latency buckets (seconds): 1 ms .. 10 s covers an uncontended I2C transfer
+# up to a stuck 1-Wire conversion
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# =============================
+# METRIC TYPES
+# =============================
+# Every update is a dict lookup plus an add under one lock, cheap enough to
+# leave on in production. Label values are passed as keyword arguments in
+# the order of `labels`.
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _series_name(self, key: tuple, suffix: str = "", extra: str = "", compact: bool = False) -> str:
+        """
+        name{a="x",b="y"} with the values escaped for the text exposition,
+        or name{a=x,b=y} as-is when compact (a JSON snapshot key, which
+        json escapes itself).
+        """
+        if compact:
+            pairs = [f"{name}={value}" for name, value in zip(self.labels, key)]
+        else:
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return self.name + suffix
+        return f"{self.name}{suffix}{{{','.join(pairs)}}}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, compact: bool = False) -> List[Tuple[str, float]]:
+        with self._lock:
+            return [(self._series_name(k, compact=compact), v) for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Either set() explicitly, or give `fn` returning a value (or a dict of
+    label-tuple -> value) that is evaluated at scrape time.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), fn: Optional[Callable] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self, compact: bool = False) -> List[Tuple[str, float]]:
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception as e:
+                logger.debug("Gauge %s callback failed: %s", self.name, e)
+                return []
+            if not isinstance(value, dict):
+                value = {(): value}
+            return [(self._series_name(tuple(map(str, k)), compact=compact), v) for k, v in value.items()]
+        with self._lock:
+            return [(self._series_name(k, compact=compact), v) for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}   # key -> [bucket counts..., +Inf, sum, max]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0.0]
+            series[slot] += 1
+            series[-2] += value
+            if value > series[-1]:
+                series[-1] = value
+
+    def time(self, **labels):
+        """Context manager observing the block's duration."""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Tuple[str, float]]:
+        out = []
+        with self._lock:
+            items = [(k, list(s)) for k, s in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                out.append((self._series_name(key, "_bucket", f'le="{le}"'), cumulative))
+            out.append((self._series_name(key, "_sum"), series[-2]))
+            out.append((self._series_name(key, "_count"), cumulative))
+        return out
+
+    def summary(self) -> Dict[tuple, list]:
+        """label key -> [count, sum, max, approx. p95] for the compact snapshot."""
+        with self._lock:
+            items = [(k, list(s)) for k, s in self._series.items()]
+        result = {}
+        for key, series in items:
+            counts = series[:-2]
+            total = sum(counts)
+            p95 = None
+            if total:
+                target = 0.95 * total
+                cumulative = 0
+                for bound, count in zip(self.buckets + (series[-1],), counts):
+                    cumulative += count
+                    if cumulative >= target:
+                        p95 = min(bound, series[-1])
+                        break
+            result[key] = [total, round(series[-2], 4), round(series[-1], 4),
+                           round(p95, 4) if p95 is not None else None]
+        return result
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.monotonic() - self.start, **self.labels)
+        return False
+
+# =============================
+# REGISTRY
+# =============================
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=(), fn=None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, help, labels)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for series, value in metric.samples():
+                lines.append(f"{series} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """
+        Compact form for the MQTT metrics message: counters and gauges as
+        {series: value}, histograms as {series: [count, sum, max, p95]}.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        values = {}
+        histograms = {}
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                for key, summary in metric.summary().items():
+                    histograms[metric._series_name(key, compact=True)] = summary
+            else:
+                for series, value in metric.samples(compact=True):
+                    values[series] = round(value, 4) if isinstance(value, float) else value
+        return {"ts": int(time.time()), "m": values, "h": histograms}
+
+
+def _escape(value: str) -> str:
+    """Label value escaping of the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(round(value, 6))
+    return str(value)
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+# =============================
+# PROCESS METRICS
+# =============================
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize()
+
+
+_STARTED = time.time()
+gauge("process_resident_memory_bytes", "Resident set size", fn=_rss_bytes)
+gauge("process_start_time_seconds", "Unix time the node started", fn=lambda: _STARTED)
+gauge("process_threads", "Live Python threads", fn=threading.active_count)
+
+def encode_snapshot(device_uid: str) -> bytes:
+    snapshot = REGISTRY.snapshot()
+    snapshot["d"] = device_uid
+    return json.dumps(snapshot, separators=(",", ":")).encode()
+
+# =============================
+# HTTP EXPORTER
+# =============================
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+
+def serve(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Expose /metrics on host:port from a daemon thread. Returns None on failure."""
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        logger.error(f"Metrics endpoint unavailable on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Metrics exposed on http://{host}:{port}/metrics")
+    return server
@@ -1,18 +1,75 @@
 import json
 import logging
 import time
+import asyncio
+import threading
+from typing import Optional
 import paho.mqtt.client as mqtt
 from config import DEVICE_UID, MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_PASS
+from config import (
+    JOURNAL_ENABLED, JOURNAL_PATH, JOURNAL_MAX_BYTES, JOURNAL_MAX_AGE,
+    JOURNAL_FLUSH_COUNT, JOURNAL_FLUSH_SECONDS, REPLAY_BATCH_SIZE, REPLAY_INTERVAL
+)
+from config import PAYLOAD_FORMAT, PAYLOAD_BATCH_SIZE, READ_NOW_CACHE_SECONDS
+from config import MQTT_INFLIGHT_WINDOW, MQTT_QUEUE_LIMIT, MQTT_ACK_TIMEOUT, MQTT_PERSISTENT_SESSION
+from commands import AsyncCommandDispatcher, CommandDispatcher
+from journal import ReadingJournal
+from publisher import AsyncPublishPipeline, PublishPipeline
+import codec
+import metrics
+import profiling
 from pump import pump_control    
 
 logger = logging.getLogger(__name__)
 
+_PUBLISH_SECONDS = metrics.histogram("publish_seconds", "Time spent in publish_sensors")
+_PUBLISHES = metrics.counter("publish_total", "Sensor publishes by outcome (sent, journaled, skipped, batched)", ("result",))
+
+# The connection and pipeline gauges are process-wide, so they report on
+# one node: the most recently connected, until it closes (tools.fleet runs
+# many nodes in one process).
+_active_node: Optional["MQTTNode"] = None
+
+
+def _node_connected():
+    node = _active_node
+    return int(node is not None and node._connected)
+
+
+def _journal_backlog():
+    node = _active_node
+    if node is None or node.journal is None:
+        return {}   # no series without a journal
+    return len(node.journal)
+
+
+def _pipeline_gauge(key):
+    def read():
+        node = _active_node
+        if node is None:
+            return {}
+        return node.pipeline.stats()[key]
+    return read
+
+
+metrics.gauge("mqtt_connected", "1 while connected to the broker", fn=_node_connected)
+metrics.gauge("journal_backlog", "Readings waiting in the offline journal", fn=_journal_backlog)
+metrics.gauge("publish_inflight", "Messages sent and waiting for an ack", fn=_pipeline_gauge("inflight"))
+metrics.gauge("publish_queued", "Messages waiting for an in-flight slot", fn=_pipeline_gauge("queued"))
+
 # Reconnect backoff settings
 _RECONNECT_DELAY_MIN = 2   # seconds
 _RECONNECT_DELAY_MAX = 60  # seconds
 
+# asyncio runtime: keepalive / reconnect check interval (well inside the 60 s keepalive)
+_NETWORK_TICK = 5  # seconds
+
 class MQTTNode:
-    def __init__(self, read_callback=None):
+    pipeline_class = PublishPipeline
+    dispatcher_class = CommandDispatcher
+
+    def __init__(self, read_callback=None, connect_callback=None, pump_handler=None, history_query=None,
+                 reload_handler=None, profile_handler=None, device_uid=None, read_answered=None):
         """
         read_callback: callable that returns a list of sensor dicts, e.g:
             [
@@ -20,20 +77,87 @@ class MQTTNode:
                 {"type": "temperature", "id": "temp-sensor-001", "value": 18.2},
                 {"type": "light", "id": "light-sensor-001", "value": 450}
             ]
+        connect_callback: optional callable run after every successful (re)connect
+        pump_handler: handler for pump/<uid> commands (default: pump_control)
+        history_query: callable answering a cmd/<uid>/history request dict
+            with the response dict published on history/<uid> (None = no
+            history command)
+        reload_handler: callable applying a cmd/<uid>/reload request and
+            returning the response dict published on registry/<uid> (a
+            coroutine function on AsyncMQTTNode; None = no reload command)
+        profile_handler: callable starting a cmd/<uid>/profile session (None =
+            no profile command); results go out through publish_diag()
+        device_uid: topic namespace and client id (default DEVICE_UID); lets
+            tools.fleet run many nodes in one process
+        read_answered: optional callable run with every read-now answer just
+            before it is published, whether freshly read or from the cache
         """
 
+        self.device_uid = device_uid or DEVICE_UID
+        # The broker account is the device uid (config.MQTT_USER)
+        self.username = MQTT_USER if device_uid is None else device_uid
+
         self.read_callback = read_callback
-        self.connected = False
+        self.connect_callback = connect_callback
+        self.history_query = history_query
+        self.reload_handler = reload_handler
+        self.profile_handler = profile_handler
+
+        # Commands run on their own workers, never on paho's network thread
+        self.commands = self.dispatcher_class(
+            read_callback=read_callback,
+            publish=lambda sensors: self.publish_sensors(sensors, flush=True),
+            pump_handler=pump_handler or pump_control.handle_pump_command,
+            cache_seconds=READ_NOW_CACHE_SECONDS,
+            history_handler=self._answer_history if history_query else None,
+            reload_handler=self._answer_reload if reload_handler else None,
+            profile_handler=profile_handler,
+            answered=read_answered
+        )
+        self._connected = False
         self._reconnect_delay = _RECONNECT_DELAY_MIN
 
-        self.client = mqtt.Client(client_id=DEVICE_UID, clean_session=True)
+        self.payload_format = PAYLOAD_FORMAT
+        if not codec.available(self.payload_format):
+            logger.error(f"Payload format '{self.payload_format}' unavailable — falling back to json")
+            self.payload_format = "json"
+        self._batch = []   # (timestamp, sensors) waiting for a compact batch message
+        self._batch_lock = threading.Lock()
+
+        self.journal = None
+        self._replay_thread = None
+        if JOURNAL_ENABLED:
+            try:
+                self.journal = ReadingJournal(
+                    JOURNAL_PATH,
+                    max_bytes=JOURNAL_MAX_BYTES,
+                    max_age=JOURNAL_MAX_AGE,
+                    flush_count=JOURNAL_FLUSH_COUNT,
+                    flush_interval=JOURNAL_FLUSH_SECONDS
+                )
+            except Exception as e:
+                logger.error(f"Journal unavailable ({JOURNAL_PATH}): {e} — offline readings will be dropped")
+
+        # A persistent session keeps our subscriptions and queued QoS 1
+        # commands on the broker across short disconnects
+        self.client = mqtt.Client(client_id=self.device_uid, clean_session=not MQTT_PERSISTENT_SESSION)
+        # Room for the pipeline window plus one replay batch
+        self.client.max_inflight_messages_set(MQTT_INFLIGHT_WINDOW + REPLAY_BATCH_SIZE)
+
+        self.pipeline = self.pipeline_class(
+            self.client,
+            window=MQTT_INFLIGHT_WINDOW,
+            queue_limit=MQTT_QUEUE_LIMIT,
+            ack_timeout=MQTT_ACK_TIMEOUT
+        )
 
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self.on_message
+        self.client.on_publish = self.pipeline.on_publish
 
-        if MQTT_USER:
-            self.client.username_pw_set(MQTT_USER, MQTT_PASS)
+        if self.username:
+            self.client.username_pw_set(self.username, MQTT_PASS)
         else:
             logger.warning("No MQTT credentials configured — anonymous access")
 
@@ -48,10 +172,16 @@ class MQTTNode:
     # =============================
 
     def connect(self):
-        logger.info(f"Connecting to MQTT {MQTT_HOST}:{MQTT_PORT}")
-        logger.info(f"Using credentials: {MQTT_USER}:{'***' if MQTT_PASS else 'none'}")
+        global _active_node
+        logger.info("Connecting to MQTT %s:%s", MQTT_HOST, MQTT_PORT)
+        logger.info(f"Using credentials: {self.username}:{'***' if MQTT_PASS else 'none'}")
+        _active_node = self
 
-        self.client.connect(MQTT_HOST, MQTT_PORT, keepalive=60)
+        # Async connect: if the broker is unreachable at boot, paho keeps
+        # retrying in the background and readings go to the journal meanwhile
+        self.commands.start()
+        self.pipeline.start()
+        self.client.connect_async(MQTT_HOST, MQTT_PORT, keepalive=60)
         self.client.loop_start()
 
     # =============================
@@ -71,19 +201,35 @@ class MQTTNode:
 
         if rc == 0:
             self._connected = True
+            self.pipeline.set_connected(True)
             self._reconnect_delay = _RECONNECT_DELAY_MIN  # reset backoff on success
-            logger.info(f"MQTT connected to {MQTT_HOST}:{MQTT_PORT}")
+            session = "resumed session" if flags.get("session present") else "new session"
+            logger.info("MQTT connected to %s:%s (%s)", MQTT_HOST, MQTT_PORT, session)
  
-            pump_topic = f"pump/{DEVICE_UID}"
-            read_topic = f"cmd/{DEVICE_UID}/read-now"
-            client.subscribe([(pump_topic, 1), (read_topic, 1)])
-            logger.info(f"Subscribed to: {pump_topic}, {read_topic}")
+            topics = [f"pump/{self.device_uid}", f"cmd/{self.device_uid}/read-now"]
+            if self.history_query:
+                topics.append(f"cmd/{self.device_uid}/history")
+            if self.reload_handler:
+                topics.append(f"cmd/{self.device_uid}/reload")
+            if self.profile_handler:
+                topics.append(f"cmd/{self.device_uid}/profile")
+            client.subscribe([(topic, 1) for topic in topics])
+            logger.info("Subscribed to: %s", ", ".join(topics))
+
+            if self.connect_callback:
+                self.connect_callback()
+            self._start_replay()
         else:
             self._connected = False
-            logger.error(f"MQTT connection failed: {status}")
+            logger.error("MQTT connection failed: %s", status)
 
     def _on_disconnect(self, client, userdata, rc):
         self._connected = False
+        self.pipeline.set_connected(False)
+        # Anything still waiting for an in-flight slot goes to the journal
+        for topic, data, qos in self.pipeline.spill():
+            if qos:
+                self._store_offline(topic, data)
         if rc == 0:
             logger.info("MQTT disconnected cleanly")
         else:
@@ -96,51 +242,362 @@ class MQTTNode:
         try:
             payload = json.loads(msg.payload.decode())
         except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON on {msg.topic}: {e}")
+            logger.error("Invalid JSON on %s: %s", msg.topic, e)
             return
 
-        logger.info(f"MQTT message on {msg.topic}: {payload}")
+        logger.info("MQTT message on %s: %s", msg.topic, payload)
 
-        if msg.topic == f"pump/{DEVICE_UID}":
-            pump_control.handle_pump_command(payload)
-        elif msg.topic == f"cmd/{DEVICE_UID}/read-now":
+        if msg.topic == f"pump/{self.device_uid}":
+            self.commands.submit_pump(payload)
+        elif msg.topic == f"cmd/{self.device_uid}/read-now":
             requested_by = payload.get("requested_by", "unknown")
-            logger.info(f"Manual read requested by: {requested_by}")
-            self._trigger_reading()
+            logger.info("Manual read requested by: %s", requested_by)
+            self.commands.request_read(requested_by)
+        elif msg.topic == f"cmd/{self.device_uid}/history":
+            self.commands.submit_history(payload)
+        elif msg.topic == f"cmd/{self.device_uid}/reload":
+            self.commands.submit_reload(payload)
+        elif msg.topic == f"cmd/{self.device_uid}/profile":
+            self.commands.submit_profile(payload)
 
     # =============================
     # PUBLISH
     # =============================
 
-    def publish_sensors(self, sensors: list):
-        if not self._connected:
-            logger.warning("MQTT not connected — skipping publish")
+    def publish_sensors(self, sensors: list, flush: bool = False):
+        """
+        Publish one reading. With a compact PAYLOAD_FORMAT, readings are
+        collected into a batch of PAYLOAD_BATCH_SIZE sample sets per message;
+        flush=True sends whatever is batched straight away.
+        """
+        with _PUBLISH_SECONDS.time():
+            self._publish_sensors(sensors, flush)
+
+    def _publish_sensors(self, sensors: list, flush: bool):
+        now = time.time()
+        topic = f"sensors/{self.device_uid}/data"
+
+        if self.payload_format == "json":
+            data = codec.encode_json(self.device_uid, sensors)
+            if self._publish(topic, data):
+                _PUBLISHES.inc(result="sent")
+                logger.info("Published %d readings to %s", len(sensors), topic)
+                logger.debug("Payload: %s", data)
+                self._start_replay()
+            else:
+                # Stamp the reading so the hub can place it correctly when replayed
+                self._store_offline(topic, codec.encode_json(self.device_uid, sensors, timestamp=now))
             return
-        
-        topic = f"sensors/{DEVICE_UID}/data"
-        payload = {
-            "device_uid": DEVICE_UID,
-            "sensors": sensors
-        }
 
-        self.client.publish(topic, json.dumps(payload), qos=1)
-        logger.info(f"Publishing to {topic}: {payload}")
-    
+        with self._batch_lock:
+            self._batch.append((now, sensors))
+            if len(self._batch) < PAYLOAD_BATCH_SIZE and not flush:
+                _PUBLISHES.inc(result="batched")
+                return
+        self._flush_batch()
+
+    def _flush_batch(self):
+        with self._batch_lock:
+            samples, self._batch = self._batch, []
+        if not samples:
+            return
+
+        topic = f"sensors/{self.device_uid}/data" + codec.topic_suffix(self.payload_format)
+        data = codec.encode_compact(self.device_uid, samples, self.payload_format)
+        if self._publish(topic, data):
+            _PUBLISHES.inc(result="sent")
+            logger.info("Published %d samples to %s (%d bytes)", len(samples), topic, len(data))
+            self._start_replay()
+        else:
+            self._store_offline(topic, data)
+
+    def _publish(self, topic: str, data: bytes, qos: int = 1) -> bool:
+        """Hand a message to the pipeline; False means offline or queue full."""
+        return self.pipeline.submit(topic, data, qos)
+
+    @property
+    def backpressure(self) -> bool:
+        """True while the publish queue is filling faster than acks come back."""
+        return self.pipeline.backpressure
+
+    def publish_irrigation(self, event: dict):
+        """Controller decision on irrigation/<uid>; journaled while offline."""
+        topic = f"irrigation/{self.device_uid}"
+        data = json.dumps(event).encode()
+        if not self._publish(topic, data):
+            self._store_offline(topic, data)
+
+    def publish_pump_event(self, event: dict):
+        """Pump queue state and run events on pump/<uid>/status."""
+        topic = f"pump/{self.device_uid}/status"
+        data = json.dumps(event).encode()
+        if not self._publish(topic, data):
+            logger.debug("Pump event not sent (offline): %s", data)
+
+    def _answer_history(self, request: dict):
+        response = self.history_query(request)
+        response["device_uid"] = self.device_uid
+        self.publish_history(response)
+
+    def publish_history(self, response: dict):
+        """Answer to a history query on history/<uid>. Not journaled: the requester has moved on."""
+        topic = f"history/{self.device_uid}"
+        data = json.dumps(response, separators=(",", ":")).encode()
+        if self._publish(topic, data):
+            points = sum(len(s.get("points", ())) for s in response.get("series", ()))
+            logger.info("History query answered: %d series, %d points, %d bytes",
+                        len(response.get("series", ())), points, len(data))
+        else:
+            logger.warning("History query not answered (offline or publish queue full)")
+
+    def _answer_reload(self, request: dict):
+        self.publish_registry(self.reload_handler(request))
+
+    def publish_registry(self, response: dict):
+        """Outcome of a sensor registry reload on registry/<uid>."""
+        response["device_uid"] = self.device_uid
+        topic = f"registry/{self.device_uid}"
+        data = json.dumps(response, separators=(",", ":")).encode()
+        if not self._publish(topic, data):
+            logger.warning("Registry reload result not sent (offline or publish queue full)")
+
+    def publish_diag(self, report: dict):
+        """Profiling summary (or error) on diag/<uid>. Not journaled: it answers a live request."""
+        topic = f"diag/{self.device_uid}"
+        data = profiling.fit(dict(report, device_uid=self.device_uid)).encode()
+        if self._publish(topic, data):
+            logger.info("Diagnostics published to %s (%d bytes)", topic, len(data))
+        else:
+            logger.warning("Diagnostics not sent (offline or publish queue full)")
+
+    def publish_metrics(self):
+        """Compact metrics snapshot on metrics/<uid>. Not journaled: stale metrics are useless."""
+        topic = f"metrics/{self.device_uid}"
+        data = metrics.encode_snapshot(self.device_uid)
+        if self._publish(topic, data, qos=0):
+            logger.debug("Published %d bytes of metrics to %s", len(data), topic)
+
+    def close(self):
+        """Flush anything still buffered and disconnect."""
+        global _active_node
+        if _active_node is self:
+            _active_node = None
+        self.commands.stop()
+        if self.payload_format != "json":
+            self._flush_batch()
+        self.pipeline.stop()
+        for topic, data, qos in self.pipeline.spill():
+            if qos:
+                self._store_offline(topic, data)
+        if self.journal is not None:
+            self.journal.close()
+        if self._connected:
+            self.client.disconnect()
+            self.client.loop_stop()
+        # Otherwise paho's (daemon) thread may be sleeping in reconnect
+        # backoff; don't hold up shutdown joining it
+
+    # =============================
+    # STORE AND FORWARD
     # =============================
-    # MANUAL READ TRIGGER
-    # =============================    
 
-    def _trigger_reading(self):
-        """Take an immediate sensor reading and publish it."""
-        if not self.read_callback:
-            logger.warning("No read_callback provided - cannot trigger manual reading")
+    def _store_offline(self, topic: str, data: bytes):
+        reason = "publish queue full" if self._connected else "MQTT not connected"
+        if self.journal is None:
+            _PUBLISHES.inc(result="skipped")
+            logger.warning("%s — skipping publish", reason)
             return
-        try:
-            sensors = self.read_callback()
-            if sensors:
-                self.publish_sensors(sensors)
-                logger.info(f"Manual read complete - published {len(sensors)} sensors")
-            else:
-                logger.warning("Manual read returned no sensor data")
-        except Exception as e:
-            logger.error(f"Error during manual read: {e}")
\ No newline at end of file
+
+        _PUBLISHES.inc(result="journaled")
+        self.journal.append(topic, data)
+        logger.warning("%s — reading journaled (%d waiting)", reason, len(self.journal))
+
+    def _start_replay(self):
+        if self.journal is None or not len(self.journal):
+            return
+        if self._replay_thread and self._replay_thread.is_alive():
+            return
+
+        self._replay_thread = threading.Thread(
+            target=self._replay_worker,
+            name="journal-replay",
+            daemon=True
+        )
+        self._replay_thread.start()
+
+    def _replay_worker(self):
+        """
+        Send the journal backlog in small batches, one batch per
+        REPLAY_INTERVAL, so live publishes keep flowing alongside it.
+        Entries are only removed once the broker has acknowledged them.
+        """
+        logger.info("Replaying %d journaled readings", len(self.journal))
+        replayed = 0
+
+        while self._connected:
+            if self.pipeline.backpressure:
+                # Live readings first
+                time.sleep(REPLAY_INTERVAL)
+                continue
+            batch = self.journal.peek(REPLAY_BATCH_SIZE)
+            if not batch:
+                break
+
+            delivered = []
+            for entry_id, info in self._replay_send(batch):
+                try:
+                    info.wait_for_publish(timeout=30)
+                except (RuntimeError, ValueError):
+                    break
+                if not info.is_published():
+                    break
+                delivered.append(entry_id)
+
+            self.journal.remove(delivered)
+            replayed += len(delivered)
+            if len(delivered) < len(batch):
+                break
+
+            time.sleep(REPLAY_INTERVAL)
+
+        logger.info("Journal replay stopped: %d sent, %d remaining", replayed, len(self.journal))
+
+    def _replay_send(self, batch: list) -> list:
+        """Publish journal entries until one is refused; returns [(entry_id, info)]."""
+        sent = []
+        for entry_id, topic, payload in batch:
+            info = self.client.publish(topic, payload, qos=1)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                break
+            sent.append((entry_id, info))
+        return sent
+
+# =============================
+# ASYNCIO RUNTIME
+# =============================
+
+class AsyncMQTTNode(MQTTNode):
+    """
+    MQTTNode for the asyncio runtime (RUNTIME=asyncio). Instead of
+    loop_start()'s network thread, paho's socket is registered with the
+    event loop: readable -> loop_read(), writable while paho has data
+    queued -> loop_write(), plus a task every _NETWORK_TICK seconds for
+    keepalive (loop_misc) and reconnects with the same backoff. Publishing, journal
+    replay and command handling are tasks on the same loop.
+
+    A reconnect attempt runs paho's blocking TCP connect on the loop, so an
+    unreachable broker can stall it for up to paho's connect timeout (5 s).
+    """
+    pipeline_class = AsyncPublishPipeline
+    dispatcher_class = AsyncCommandDispatcher
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._network: Optional[asyncio.Task] = None
+        self._replay_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def connect(self):
+        """Start the network task; must be called from the running loop."""
+        global _active_node
+        logger.info("Connecting to MQTT %s:%s (asyncio)", MQTT_HOST, MQTT_PORT)
+        logger.info(f"Using credentials: {self.username}:{'***' if MQTT_PASS else 'none'}")
+        _active_node = self
+
+        self._loop = asyncio.get_running_loop()
+        self.commands.start()
+        self.pipeline.start()
+        # Only records host/port; the network task makes the connection
+        self.client.connect_async(MQTT_HOST, MQTT_PORT, keepalive=60)
+        self._network = self._loop.create_task(self._network_task(), name="mqtt-network")
+
+    async def _network_task(self):
+        first = True
+        while not self._closing:
+            if self.client.socket() is None:
+                if not first:
+                    await asyncio.sleep(self._reconnect_delay)
+                    # on_connect resets this once the broker accepts us
+                    self._reconnect_delay = min(self._reconnect_delay * 2, _RECONNECT_DELAY_MAX)
+                first = False
+                try:
+                    self.client.reconnect()
+                except OSError as e:
+                    logger.warning("MQTT connect to %s:%s failed: %s — retrying in %ss",
+                                   MQTT_HOST, MQTT_PORT, e, self._reconnect_delay)
+                    continue
+            self.client.loop_misc()
+            await asyncio.sleep(_NETWORK_TICK)
+
+    # Socket callbacks (paho calls these on the loop thread)
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._loop.add_reader(sock, client.loop_read)
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+        self._loop.remove_writer(sock)
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+
+    async def _answer_reload(self, request: dict):
+        self.publish_registry(await self.reload_handler(request))
+
+    async def close_async(self):
+        """Flush what is queued (up to 5 s), then close() as usual."""
+        self._closing = True
+        if self.payload_format != "json":
+            self._flush_batch()
+        await self.pipeline.drain(5.0)
+        self.close()
+        for task in (self._network, self._replay_task):
+            if task is not None:
+                task.cancel()
+
+    def _start_replay(self):
+        if self.journal is None or not len(self.journal):
+            return
+        if self._replay_task and not self._replay_task.done():
+            return
+        self._replay_task = self._loop.create_task(self._replay_async(), name="journal-replay")
+
+    async def _replay_async(self):
+        """_replay_worker() as a task; acks are polled instead of waited on."""
+        logger.info("Replaying %d journaled readings", len(self.journal))
+        replayed = 0
+
+        while self._connected:
+            if self.pipeline.backpressure:
+                await asyncio.sleep(REPLAY_INTERVAL)
+                continue
+            batch = self.journal.peek(REPLAY_BATCH_SIZE)
+            if not batch:
+                break
+
+            delivered = []
+            for entry_id, info in self._replay_send(batch):
+                deadline = time.monotonic() + 30
+                while not info.is_published() and self._connected and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                if not info.is_published():
+                    break
+                delivered.append(entry_id)
+
+            self.journal.remove(delivered)
+            replayed += len(delivered)
+            if len(delivered) < len(batch):
+                break
+
+            await asyncio.sleep(REPLAY_INTERVAL)
+
+        logger.info("Journal replay stopped: %d sent, %d remaining", replayed, len(self.journal))
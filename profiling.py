@@ -0,0 +1,318 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+import pstats
+import sysconfig
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional
+from config import PROFILE_MAX_SECONDS, PROFILE_MAX_BYTES
+
+logger = logging.getLogger("profiling")
+
+# =============================
+# CONFIG
+# =============================
+# A session profiles the next `cycles` ticks of the main loop (reads,
+# history, aggregation, publish) or every tick for `seconds`, whichever
+# ends first, and never longer than PROFILE_MAX_SECONDS. While no session
+# runs, section() hands out one shared nullcontext and note() returns at
+# once: nothing is traced or timed.
+DEFAULT_CYCLES = 5
+DEFAULT_TOP = 15
+MAX_TOP = 50
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_STDLIB = sysconfig.get_paths()["stdlib"]
+_PROFILER_FILES = (cProfile.__file__, pstats.__file__, tracemalloc.__file__, __file__)
+_IDLE = nullcontext()
+# From 3.12 cProfile sits on sys.monitoring: one profiler per interpreter,
+# and it sees every thread. Before that, one profiler per thread.
+_SHARED_PROFILER = sys.version_info >= (3, 12)
+
+# =============================
+# SESSION
+# =============================
+
+class Session:
+    """
+    One profiling run. Before Python 3.12 cProfile only sees the thread it
+    is enabled on, so every thread entering a section gets its own profiler
+    (the main loop, and the acquisition workers on the threaded runtime)
+    and their stats are merged at the end. From 3.12 a single profiler
+    covers all threads, on while any thread is inside a section (so it
+    also catches whatever else runs meanwhile). tracemalloc, when asked
+    for, traces all threads.
+    """
+
+    def __init__(self, request_id, cycles: Optional[int], seconds: float,
+                 cpu: bool, memory: bool, top: int, publish: Callable[[dict], None]):
+        self.request_id = request_id
+        self.cycles = cycles
+        self.seconds = seconds
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.publish = publish
+
+        self.started_at = time.monotonic()
+        self.done = 0
+        self.timings: Dict[str, List[float]] = {}
+        self.errors: List[str] = []
+        self._profilers: Dict[int, cProfile.Profile] = {}
+        self._enabled: Dict[int, cProfile.Profile] = {}
+        self._depth: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._own_tracemalloc = False
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+
+    @contextmanager
+    def section(self):
+        """Profile until the outermost section exits. Profiler errors are recorded, never raised."""
+        key = 0 if _SHARED_PROFILER else threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(key, 0)
+            self._depth[key] = depth + 1
+            if self.cpu and depth == 0:
+                self._enable(key)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._depth[key] -= 1
+                if self._depth[key] == 0:
+                    self._disable(key)
+
+    def _enable(self, key: int):
+        profiler = self._profilers.get(key) or cProfile.Profile()
+        try:
+            profiler.enable()
+        except Exception as e:
+            # e.g. "Another profiling tool is already active"
+            self._error(f"cProfile: {e}")
+            return
+        self._profilers[key] = self._enabled[key] = profiler
+
+    def _disable(self, key: int):
+        profiler = self._enabled.pop(key, None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+        except Exception as e:
+            self._error(f"cProfile: {e}")
+
+    def _error(self, message: str):
+        if message not in self.errors:
+            logger.warning("Profiling: %s", message)
+            self.errors.append(message)
+
+    def note(self, name: str, seconds: float):
+        self.timings.setdefault(name, []).append(seconds)
+
+    def due(self) -> bool:
+        elapsed = time.monotonic() - self.started_at
+        return (self.cycles is not None and self.done >= self.cycles) or elapsed >= self.seconds
+
+    def summary(self) -> dict:
+        result = {
+            "request_id": self.request_id,
+            "ts": int(time.time()),
+            "ok": True,
+            "cycles": self.done,
+            "seconds": round(time.monotonic() - self.started_at, 1),
+            "timing": {name: _stats(values) for name, values in self.timings.items()},
+        }
+        # Memory first: building the CPU stats allocates too
+        if self.memory:
+            result["memory"] = self._memory()
+        if self.cpu:
+            result["cpu"] = self._cpu()
+        if self.errors:
+            result["errors"] = self.errors
+        return result
+
+    def _cpu(self) -> dict:
+        with self._lock:
+            if _SHARED_PROFILER:
+                # Another thread may still be inside a section: stop the
+                # one profiler now (its exit then finds nothing to disable)
+                self._disable(0)
+            # Before 3.12 a thread still inside a section (e.g. a read-now on
+            # a worker) is left out: only that thread can disable its profiler
+            profilers = [p for key, p in self._profilers.items() if key not in self._enabled]
+        if not profilers:
+            return {"functions": []}
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return {
+            "threads": len(profilers),
+            "calls": stats.total_calls,
+            "functions": [
+                {"fn": _where(key), "calls": nc, "tottime_ms": round(tt * 1000, 2), "cumtime_ms": round(ct * 1000, 2)}
+                for key, (cc, nc, tt, ct, _) in rows[:self.top]
+            ],
+        }
+
+    def _memory(self) -> dict:
+        if not tracemalloc.is_tracing():
+            return {"sites": []}
+        # Leave out the profiler's own bookkeeping
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, path) for path in _PROFILER_FILES
+        ] + [tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")])
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "current_kib": round(current / 1024, 1),
+            "peak_kib": round(peak / 1024, 1),
+            "sites": [
+                {"site": f"{_short(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                 "kib": round(s.size / 1024, 1), "count": s.count}
+                for s in snapshot.statistics("lineno")[:self.top]
+            ],
+        }
+
+    def close(self):
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+
+
+def _stats(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def _short(filename: str) -> str:
+    """Repo, site-packages and stdlib files relative to where they live (e.g. "logging/__init__.py")."""
+    if "site-packages" + os.sep in filename:
+        return filename.split("site-packages" + os.sep, 1)[1]
+    for root in (_ROOT, _STDLIB):
+        if filename.startswith(root + os.sep):
+            return os.path.relpath(filename, root)
+    return os.path.basename(filename)
+
+
+def _where(key) -> str:
+    filename, line, name = key
+    if filename == "~":
+        return name   # built-in, e.g. "<built-in method time.sleep>"
+    return f"{_short(filename)}:{line}({name})"
+
+
+def fit(report: dict) -> str:
+    """
+    JSON for a diag/<uid> message, cut down to PROFILE_MAX_BYTES by dropping
+    the least significant rows. Works on a copy; pass the final envelope.
+    """
+    report = dict(report)
+    lists = []
+    for key, rows in (("cpu", "functions"), ("memory", "sites")):
+        if key in report:
+            report[key] = dict(report[key], **{rows: list(report[key][rows])})
+            lists.append(report[key][rows])
+    data = json.dumps(report, separators=(",", ":"))
+    while len(data) > PROFILE_MAX_BYTES and any(lists):
+        max(lists, key=len).pop()
+        report["truncated"] = True
+        data = json.dumps(report, separators=(",", ":"))
+    return data
+
+# =============================
+# API
+# =============================
+
+_session: Optional[Session] = None
+_session_lock = threading.Lock()
+
+
+def start(request: dict, publish: Callable[[dict], None]):
+    """
+    cmd/<uid>/profile, e.g. {"request_id": "p1", "cycles": 10, "memory": true}
+    or {"seconds": 120, "cpu": true, "top": 20}. The summary (or an error)
+    goes to `publish` as a dict.
+    """
+    global _session
+    request_id = request.get("request_id")
+    try:
+        cycles = request.get("cycles")
+        seconds = float(request.get("seconds", PROFILE_MAX_SECONDS))
+        if cycles is None and "seconds" not in request:
+            cycles = DEFAULT_CYCLES
+        if cycles is not None:
+            cycles = int(cycles)
+            if cycles < 1:
+                raise ValueError("cycles must be at least 1")
+        if seconds <= 0:
+            raise ValueError("seconds must be positive")
+        top = max(1, min(int(request.get("top", DEFAULT_TOP)), MAX_TOP))
+    except (TypeError, ValueError) as e:
+        publish({"request_id": request_id, "ok": False, "error": f"bad profile request: {e}"})
+        return
+
+    cpu = bool(request.get("cpu", True))
+    memory = bool(request.get("memory", False))
+    with _session_lock:
+        if _session is not None:
+            publish({"request_id": request_id, "ok": False, "error": "a profiling session is already running"})
+            return
+        _session = Session(request_id, cycles, min(seconds, PROFILE_MAX_SECONDS), cpu, memory, top, publish)
+
+    what = " + ".join(name for name, on in (("cProfile", cpu), ("tracemalloc", memory)) if on) or "timing only"
+    limit = f"{cycles} cycles" if cycles is not None else f"{_session.seconds:g}s"
+    logger.info(f"Profiling started ({what}, {limit}, capped at {PROFILE_MAX_SECONDS:g}s)")
+
+
+def section():
+    """Context manager around work to profile; free while no session runs."""
+    session = _session
+    return _IDLE if session is None else session.section()
+
+
+def note(name: str, seconds: float):
+    """Record a timing for the breakdown (ignored while no session runs)."""
+    session = _session
+    if session is not None:
+        session.note(name, seconds)
+
+
+def cycle_done(seconds: float, timing=None):
+    """
+    End of one main-loop tick: record its timing (and the acquisition
+    breakdown, a sensors.acquisition.CycleTiming) and publish the summary
+    once the session is over.
+    """
+    global _session
+    session = _session
+    if session is None:
+        return
+    session.done += 1
+    session.note("cycle", seconds)
+    if timing is not None:
+        session.note("acquisition", timing.total)
+        for name, source_seconds in timing.sources.items():
+            session.note(name, source_seconds)
+    if not session.due():
+        return
+
+    with _session_lock:
+        _session = None
+    try:
+        result = session.summary()
+        logger.info("Profiling finished: %d cycles", session.done)
+        session.publish(result)
+    except Exception as e:
+        logger.error(f"Profiling summary failed: {e}")
+    finally:
+        session.close()
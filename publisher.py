@@ -0,0 +1,260 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+import metrics
+
+logger = logging.getLogger("publisher")
+
+_ACK_SECONDS = metrics.histogram("publish_ack_seconds", "Publish-to-ack latency (QoS 1)")
+_REJECTED = metrics.counter("publish_rejected_total", "Messages refused because the send queue was full")
+_ACK_LATE = metrics.counter("publish_ack_late_total", "Messages still unacked after the ack timeout")
+
+# (topic, payload, qos)
+Message = Tuple[str, bytes, int]
+
+
+class PublishPipeline:
+    """
+    Asynchronous, windowed publisher on top of paho.
+
+    submit() only enqueues; the "mqtt-publish" thread sends while fewer than
+    `window` messages are waiting for their PUBACK. Each message id is tracked
+    from publish until paho reports it acked (on_publish), which gives
+    publish-to-ack latency and a true in-flight count. When the queue holds
+    `queue_limit` messages submit() refuses new ones, and `backpressure` goes
+    up at half that, so the acquisition side can hold readings back instead
+    of piling them up here.
+
+    Queued (not yet sent) messages are handed back by spill() when the
+    connection drops, so the caller can journal them. Messages already sent
+    stay in paho's session and are retransmitted after reconnect.
+    """
+
+    def __init__(self, client: mqtt.Client, window: int = 10, queue_limit: int = 100,
+                 ack_timeout: float = 30):
+        self.client = client
+        self.window = max(1, window)
+        self.queue_limit = max(1, queue_limit)
+        self.ack_timeout = ack_timeout
+
+        self._queue: Deque[Message] = deque()
+        self._inflight: Dict[int, Tuple[float, str]] = {}   # mid -> (sent_at, topic)
+        self._early_acks: Dict[int, float] = {}   # acks that beat the mid bookkeeping (or aren't ours)
+        self._cond = threading.Condition()
+        self._connected = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.sent = 0
+        self.acked = 0
+        self.rejected = 0
+
+    # =============================
+    # LIFECYCLE
+    # =============================
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._sender, name="mqtt-publish", daemon=True)
+        self._thread.start()
+
+    def stop(self, drain_timeout: float = 5.0):
+        """Give queued and in-flight messages up to drain_timeout to go out, then stop."""
+        deadline = time.monotonic() + drain_timeout
+        with self._cond:
+            while (self._queue or self._inflight) and self._connected:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._running = False
+            self._wake()
+
+    def set_connected(self, connected: bool):
+        with self._cond:
+            self._connected = connected
+            self._wake()
+
+    def _wake(self):
+        """Tell the sender something changed (call with _cond held)."""
+        self._cond.notify_all()
+
+    # =============================
+    # SUBMIT / ACK
+    # =============================
+
+    def submit(self, topic: str, data: bytes, qos: int = 1) -> bool:
+        """Queue a message. False if offline or the queue is full."""
+        with self._cond:
+            if not self._connected:
+                return False
+            if len(self._queue) >= self.queue_limit:
+                self.rejected += 1
+                _REJECTED.inc()
+                logger.warning("Publish queue full (%d) — refusing %s", self.queue_limit, topic)
+                return False
+            self._queue.append((topic, data, qos))
+            self._wake()
+        return True
+
+    def on_publish(self, client, userdata, mid):
+        """paho callback (network thread)."""
+        now = time.monotonic()
+        with self._cond:
+            entry = self._inflight.pop(mid, None)
+            if entry is None:
+                self._early_acks[mid] = now
+                return
+            self._ack(now, entry)
+
+    def _ack(self, now: float, entry: Tuple[float, str]):
+        sent_at, _ = entry
+        self.acked += 1
+        _ACK_SECONDS.observe(now - sent_at)
+        self._wake()
+
+    def spill(self) -> List[Message]:
+        """Take every queued, unsent message (e.g. to journal it after a disconnect)."""
+        with self._cond:
+            messages = list(self._queue)
+            self._queue.clear()
+        return messages
+
+    @property
+    def backpressure(self) -> bool:
+        return len(self._queue) >= max(1, self.queue_limit // 2)
+
+    def stats(self) -> dict:
+        return {"queued": len(self._queue), "inflight": len(self._inflight), "sent": self.sent,
+                "acked": self.acked, "rejected": self.rejected}
+
+    # =============================
+    # SENDER
+    # =============================
+
+    def _ready(self) -> bool:
+        return self._connected and bool(self._queue) and len(self._inflight) < self.window
+
+    def _sender(self):
+        while True:
+            with self._cond:
+                while self._running and not self._ready():
+                    self._cond.wait(timeout=self.ack_timeout)
+                    self._expire(time.monotonic())
+                if not self._running:
+                    return
+                topic, data, qos = self._queue.popleft()
+
+            # Outside our lock: paho takes its own locks and may call
+            # on_publish from the network thread meanwhile
+            sent_at = time.monotonic()
+            info = self.client.publish(topic, data, qos=qos)
+
+            with self._cond:
+                if not self._track(topic, data, qos, sent_at, info):
+                    self._cond.wait(timeout=1)
+
+    def _track(self, topic: str, data: bytes, qos: int, sent_at: float, info) -> bool:
+        """Book a publish result (call with _cond held). False if it was requeued to retry."""
+        if info.rc == mqtt.MQTT_ERR_NO_CONN and qos == 0:
+            # Connection went away under us; QoS 0 has nothing to retry
+            return True
+        if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+            self._queue.appendleft((topic, data, qos))
+            return False
+        # MQTT_ERR_NO_CONN with QoS 1: paho keeps the message and sends
+        # it after reconnect, so it is in flight either way
+        self.sent += 1
+        if self._early_acks.pop(info.mid, None) is not None:
+            self._ack(time.monotonic(), (sent_at, topic))
+        else:
+            self._inflight[info.mid] = (sent_at, topic)
+        return True
+
+    def _expire(self, now: float):
+        """
+        Stop counting messages that never got an ack against the window.
+        paho still owns them and retransmits on reconnect. Also forgets acks
+        for messages published outside the pipeline (journal replay).
+        """
+        for mid, acked_at in list(self._early_acks.items()):
+            if now - acked_at > self.ack_timeout:
+                del self._early_acks[mid]
+        for mid, (sent_at, topic) in list(self._inflight.items()):
+            if now - sent_at > self.ack_timeout:
+                del self._inflight[mid]
+                _ACK_LATE.inc()
+                logger.warning("No ack for message %d on %s after %.0fs", mid, topic, self.ack_timeout)
+
+
+class AsyncPublishPipeline(PublishPipeline):
+    """
+    PublishPipeline for the asyncio runtime: the sender is a task on the
+    event loop instead of a thread. paho's callbacks (on_publish) run on the
+    same loop, so the condition is never contended; it only keeps the shared
+    bookkeeping code identical.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._event = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._sender_async(), name="mqtt-publish")
+
+    def _wake(self):
+        super()._wake()
+        if self._event is not None:
+            self._event.set()
+
+    async def drain(self, timeout: float = 5.0):
+        """Give queued and in-flight messages up to `timeout` to go out."""
+        deadline = time.monotonic() + timeout
+        while (self._queue or self._inflight) and self._connected and time.monotonic() < deadline:
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+
+    def stop(self, drain_timeout: float = 0.0):
+        """Stop without blocking the loop; await drain() first to flush."""
+        super().stop(0)
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _sender_async(self):
+        while self._running:
+            if not self._ready():
+                self._event.clear()
+                try:
+                    await asyncio.wait_for(self._event.wait(), self.ack_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                with self._cond:
+                    self._expire(time.monotonic())
+                continue
+
+            with self._cond:
+                topic, data, qos = self._queue.popleft()
+            sent_at = time.monotonic()
+            info = self.client.publish(topic, data, qos=qos)
+            with self._cond:
+                requeued = not self._track(topic, data, qos, sent_at, info)
+            if requeued:
+                await asyncio.sleep(1)
+            else:
+                # Let paho's socket callbacks run between messages
+                await asyncio.sleep(0)
@@ -1,6 +1,11 @@
 import logging
 import time
+import queue
+import asyncio
 import threading
+from typing import Callable, List, Optional
+
+from pump.sequencer import Sequencer
 
 try:
     import RPi.GPIO as GPIO
@@ -11,105 +16,343 @@ logger = logging.getLogger("pump")
 
 PUMP_GPIO = 17
 
+# Zones: one relay each. "current" (amps) is used by the sequencer's
+# current limit, so zones sharing a supply aren't all switched on at once.
+PUMP_ZONES = {
+    "main": {"gpio": PUMP_GPIO, "current": 1.0},
+    # "bed-2": {"gpio": 22, "current": 1.0},
+}
+DEFAULT_ZONE = "main"
+
+# Zones allowed on together, and the total current they may draw (0 = no limit)
+MAX_CONCURRENT_ZONES = 1
+MAX_TOTAL_CURRENT = 0.0
+
+# Manual "on" outranks queued plan runs
+PRIORITY_MANUAL = 100
+
+# Actions that change what the relays do; anything else (e.g. "status")
+# only reports, so it must not count as a hub override of automatic watering
+CONTROL_ACTIONS = ("on", "off", "run", "plan")
+
 # Relay logic — change if needed
 RELAY_ACTIVE = GPIO.HIGH if GPIO else None
 RELAY_INACTIVE = GPIO.LOW if GPIO else None
 
 _initialized = False
 _pump_lock = threading.Lock()
-_pump_thread = None
 
 # Safety limits
 MAX_RUN_SECONDS = 300   # 5 minutes max
 
+# All run timing is driven by one timer thread; the sequencer holds the queue
+_sequencer = Sequencer(PUMP_ZONES, MAX_CONCURRENT_ZONES, MAX_TOTAL_CURRENT, MAX_RUN_SECONDS)
+_cond = threading.Condition()
+_timer_thread = None
+_running = False
+_listener: Optional[Callable[[dict], None]] = None
+# With the timer thread, events reach the listener on their own thread, in order
+_event_queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+_event_thread = None
+_wake_async: Optional[Callable[[], None]] = None   # set while run_timer() drives the relays
 
-def init():
-    global _initialized
+
+def init(timer_thread: bool = True):
+    """
+    Set up the relays. timer_thread=False leaves run timing to the
+    run_timer() coroutine (asyncio runtime).
+    """
+    global _initialized, _timer_thread, _event_thread, _running
 
     if GPIO is None:
         logger.warning("RPi.GPIO not available — pump disabled (dev mode)")
         return
 
     GPIO.setmode(GPIO.BCM)
-    GPIO.setup(PUMP_GPIO, GPIO.OUT)
+    for zone in PUMP_ZONES:
+        _setup_zone(zone)
 
+    _initialized = True
+    _running = True
+    if timer_thread:
+        # Events thread first: the timer's _emit() calls queue for it
+        _event_thread = threading.Thread(target=_event_worker, name="pump-events", daemon=True)
+        _event_thread.start()
+        _timer_thread = threading.Thread(target=_timer_worker, name="pump-timer", daemon=True)
+        _timer_thread.start()
+
+
+def _setup_zone(zone: str):
+    gpio = PUMP_ZONES[zone]["gpio"]
+    GPIO.setup(gpio, GPIO.OUT)
     # Ensure pump is OFF on startup
-    GPIO.output(PUMP_GPIO, RELAY_INACTIVE)
+    GPIO.output(gpio, RELAY_INACTIVE)
+    logger.info(f"🚰 Pump zone '{zone}' initialized on GPIO{gpio}")
+
+
+def configure_zones(zones: dict):
+    """
+    Replace PUMP_ZONES (registry reload). Removed zones and zones moved to
+    another GPIO are stopped (runs cancelled) and their old relay switched
+    off and released; new and moved zones are set up OFF. Other zones keep
+    running; a changed current limit applies to the next run started.
+    Returns (added, removed, changed) zone names.
+    """
+    added = [z for z in zones if z not in PUMP_ZONES]
+    removed = [z for z in PUMP_ZONES if z not in zones]
+    changed = [z for z in zones if z in PUMP_ZONES and zones[z] != PUMP_ZONES[z]]
+    moved = [z for z in changed if zones[z]["gpio"] != PUMP_ZONES[z]["gpio"]]
+
+    events = []
+    with _cond:
+        for zone in removed + moved:
+            for request in _sequencer.cancel(zone):
+                _emit(events, "completed", reason="reconfigured", **request.as_dict())
+            if _initialized:
+                pump_off(zone)
+        released = {PUMP_ZONES[z]["gpio"] for z in removed + moved} - {cfg["gpio"] for cfg in zones.values()}
+
+        PUMP_ZONES.clear()
+        PUMP_ZONES.update(zones)
+
+        if _initialized:
+            for gpio in released:
+                GPIO.cleanup(gpio)
+            for zone in added + moved:
+                _setup_zone(zone)
+        if removed or moved:
+            _emit(events, "queue", **_sequencer.state(time.monotonic()))
+        _notify()
+    _deliver(events)
+    return added, removed, changed
+
+
+def set_listener(listener: Optional[Callable[[dict], None]]):
+    """Receive queue/run events (queued, merged, started, completed, queue)."""
+    global _listener
+    _listener = listener
+
+
+def _emit(events: List[dict], event: str, **details):
+    """
+    Record an event while _cond is held. With the pump-events thread it is
+    queued straight away, so the listener sees events in the order they
+    happened; otherwise it is added to `events` and _deliver() sends it once
+    _cond is released, so a slow publish or journal write in the listener
+    never holds up the relays or other pump calls.
+    """
+    if _listener is None:
+        return
+    payload = {"ts": int(time.time()), "event": event}
+    payload.update(details)
+    if _event_thread is not None:
+        _event_queue.put(payload)
+    else:
+        events.append(payload)
+
+
+def _deliver(events: List[dict]):
+    """
+    Send the events _emit() collected without the pump-events thread
+    (asyncio runtime, where the listener only queues a publish); call it
+    without _cond held.
+    """
+    for payload in events:
+        _send(payload)
+
+
+def _send(payload: dict):
+    listener = _listener
+    if listener is None:
+        return
+    try:
+        listener(payload)
+    except Exception as e:
+        logger.error("Pump event listener failed: %s", e)
 
-    _initialized = True
-    logger.info(f"🚰 Pump initialized on GPIO{PUMP_GPIO}")
 
+def _event_worker():
+    while True:
+        payload = _event_queue.get()
+        if payload is None:
+            return
+        _send(payload)
 
-def pump_on():
+
+def pump_on(zone: str = DEFAULT_ZONE):
     if not _initialized:
         logger.error("Pump not initialized")
         return
 
     with _pump_lock:
-        logger.info("🚰 Pump ON")
-        GPIO.output(PUMP_GPIO, RELAY_ACTIVE)
+        logger.info("🚰 Pump ON (%s)", zone)
+        GPIO.output(PUMP_ZONES[zone]["gpio"], RELAY_ACTIVE)
 
 
-def pump_off():
+def pump_off(zone: str = DEFAULT_ZONE):
     if not _initialized:
         logger.error("Pump not initialized")
         return
 
     with _pump_lock:
-        logger.info("🚰 Pump OFF")
-        GPIO.output(PUMP_GPIO, RELAY_INACTIVE)
+        logger.info("🚰 Pump OFF (%s)", zone)
+        GPIO.output(PUMP_ZONES[zone]["gpio"], RELAY_INACTIVE)
 
+# =============================
+# TIMER THREAD
+# =============================
 
-def _run_worker(seconds: float):
+def _timer_worker():
+    """
+    Single thread that switches relays for every zone: apply what the
+    sequencer says is due, then sleep until the next run ends or a new
+    request arrives.
     """
-    Background worker to run pump without blocking MQTT.
+    with _cond:
+        while _running:
+            now = time.monotonic()
+            events = []
+            # With the timer thread, _emit() queues events for the pump-events thread
+            wakeup = _step(now, events)
+            _cond.wait(None if wakeup is None else max(0.0, wakeup - now))
+
+
+async def run_timer():
     """
+    The timer loop as a coroutine, for the asyncio runtime: same sequencer
+    steps, but the wait is an event the submitting calls set.
+    """
+    global _wake_async
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    _wake_async = lambda: loop.call_soon_threadsafe(wake.set)
     try:
-        pump_on()
-        time.sleep(seconds)
+        while _running:
+            wake.clear()
+            now = time.monotonic()
+            events = []
+            with _cond:
+                wakeup = _step(now, events)
+            _deliver(events)
+            try:
+                await asyncio.wait_for(wake.wait(), None if wakeup is None else max(0.0, wakeup - now))
+            except asyncio.TimeoutError:
+                pass
     finally:
-        pump_off()
-        logger.info("🚰 Pump run complete")
+        _wake_async = None
+
+
+def _step(now: float, events: List[dict]) -> Optional[float]:
+    """Switch relays for runs that started or finished; returns the next wakeup."""
+    started, finished = _sequencer.step(now)
 
+    for request in finished:
+        pump_off(request.zone)
+        logger.info("🚰 Zone '%s' run complete (%.1fs)", request.zone, request.seconds)
+        _emit(events, "completed", reason="done", **request.as_dict())
+    for request in started:
+        pump_on(request.zone)
+        logger.info("🚰 Zone '%s' running for %.1fs", request.zone, request.seconds)
+        _emit(events, "started", **request.as_dict(now))
+    if started or finished:
+        _emit(events, "queue", **_sequencer.state(now))
 
-def pump_run_for(seconds: float):
-    global _pump_thread
+    return _sequencer.next_wakeup()
 
+
+def _notify():
+    """Wake whichever timer is running (call with _cond held)."""
+    _cond.notify()
+    if _wake_async is not None:
+        _wake_async()
+
+
+def pump_run_for(seconds: float, zone: str = DEFAULT_ZONE,
+                 priority: int = 0, source: str = "hub") -> bool:
+    """
+    Queue a timed run. Overlapping requests are queued (or merged with a
+    run already queued for the same zone) instead of being dropped.
+    Returns True if the run was accepted.
+    """
     if not _initialized:
         logger.error("Pump not initialized")
-        return
+        return False
 
     # Safety clamp
     try:
         seconds = float(seconds)
     except Exception:
-        logger.error(f"Invalid pump seconds: {seconds}")
-        return
+        logger.error("Invalid pump seconds: %s", seconds)
+        return False
 
     seconds = max(0, min(seconds, MAX_RUN_SECONDS))
 
     if seconds <= 0:
         logger.warning("Pump run requested with 0 seconds — ignoring")
-        return
+        return False
 
-    # Prevent overlapping runs
-    if _pump_thread and _pump_thread.is_alive():
-        logger.warning("Pump already running — ignoring new run command")
-        return
+    if zone not in PUMP_ZONES:
+        logger.error("Unknown pump zone '%s'", zone)
+        return False
+
+    events = []
+    with _cond:
+        try:
+            request, outcome = _sequencer.submit(zone, seconds, time.monotonic(), priority, source)
+        except ValueError as e:
+            logger.error(str(e))
+            return False
+        logger.info("🚰 Run %s: zone '%s' %.1fs (priority %d)", outcome, zone, request.seconds, request.priority)
+        _emit(events, outcome, **request.as_dict())
+        _notify()
+    _deliver(events)
+    return True
+
+
+def is_running(zone: Optional[str] = None) -> bool:
+    """True while the zone (or any zone) is running or queued."""
+    with _cond:
+        return _sequencer.busy(zone)
 
-    logger.info(f"🚰 Pump running for {seconds} seconds (async)")
 
-    _pump_thread = threading.Thread(
-        target=_run_worker,
-        args=(seconds,),
-        daemon=True
-    )
-    _pump_thread.start()
+def started_at(zone: str) -> Optional[float]:
+    """time.monotonic() at which the zone's current run started; None while queued or idle."""
+    with _cond:
+        request = _sequencer.active.get(zone)
+        return None if request is None else request.started_at
+
+
+def stop_run(zone: Optional[str] = None):
+    """Cancel queued runs and switch off running zones (all zones, or one)."""
+    events = []
+    with _cond:
+        for request in _sequencer.cancel(zone):
+            pump_off(request.zone)
+            _emit(events, "completed", reason="cancelled", **request.as_dict())
+        _emit(events, "queue", **_sequencer.state(time.monotonic()))
+        _notify()
+    _deliver(events)
+
+
+def queue_state() -> dict:
+    with _cond:
+        return _sequencer.state(time.monotonic())
 
 
 def cleanup():
+    global _running, _event_thread
     try:
-        pump_off()
+        stop_run()
+        with _cond:
+            _running = False
+            _notify()
+        for zone in PUMP_ZONES:
+            pump_off(zone)
+        if _event_thread is not None:
+            # Let the last events (the cancelled runs) go out
+            _event_queue.put(None)
+            _event_thread.join(timeout=2)
+            _event_thread = None
     except Exception:
         pass
 
@@ -120,19 +363,36 @@ def cleanup():
 
 def handle_pump_command(payload):
     """
-    Entry point from MQTT.
+    Entry point from MQTT. "zone" defaults to the main pump and "priority"
+    to 0; a "plan" carries a list of runs, e.g.
+        {"action": "plan", "runs": [{"zone": "main", "seconds": 60},
+                                    {"zone": "bed-2", "seconds": 90, "priority": 1}]}
     """
     action = payload.get("action")
+    zone = payload.get("zone", DEFAULT_ZONE)
 
     if action == "on":
-        pump_on()
+        # Bounded by MAX_RUN_SECONDS like any other run
+        pump_run_for(MAX_RUN_SECONDS, zone, priority=PRIORITY_MANUAL, source="manual")
 
     elif action == "off":
-        pump_off()
+        stop_run(payload.get("zone"))
 
     elif action == "run":
         seconds = payload.get("seconds", 0)
-        pump_run_for(seconds)
+        pump_run_for(seconds, zone, priority=int(payload.get("priority", 0)))
+
+    elif action == "plan":
+        runs = payload.get("runs") or []
+        for run in runs:
+            pump_run_for(run.get("seconds", 0), run.get("zone", DEFAULT_ZONE),
+                         priority=int(run.get("priority", 0)), source="plan")
+        logger.info("🚰 Watering plan queued: %d runs", len(runs))
+
+    elif action == "status":
+        events = []
+        _emit(events, "queue", **queue_state())
+        _deliver(events)
 
     else:
-        logger.warning(f"Unknown pump action: {action}")
\ No newline at end of file
+        logger.warning("Unknown pump action: %s", action)
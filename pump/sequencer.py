@@ -0,0 +1,141 @@
+from typing import Dict, List, Optional, Tuple
+
+# =============================
+# RUN REQUESTS
+# =============================
+
+class RunRequest:
+    """One zone run: queued until the sequencer starts it, then active until ends_at."""
+
+    __slots__ = ("zone", "seconds", "priority", "source", "seq", "started_at", "ends_at")
+
+    def __init__(self, zone: str, seconds: float, priority: int, source: str, seq: int):
+        self.zone = zone
+        self.seconds = seconds
+        self.priority = priority
+        self.source = source
+        self.seq = seq
+        self.started_at: Optional[float] = None
+        self.ends_at: Optional[float] = None
+
+    def as_dict(self, now: Optional[float] = None) -> dict:
+        info = {"zone": self.zone, "seconds": round(self.seconds, 1),
+                "priority": self.priority, "source": self.source}
+        if self.ends_at is not None and now is not None:
+            info["remaining"] = round(max(0.0, self.ends_at - now), 1)
+        return info
+
+# =============================
+# SEQUENCER
+# =============================
+
+class Sequencer:
+    """
+    Pure scheduling logic for pump zones; no threads, no GPIO, no clock of
+    its own. The caller passes `now` in, applies the returned start/stop
+    lists to the relays and sleeps until next_wakeup().
+
+    - A request for a zone that is already queued is merged into it (longest
+      duration and highest priority win), so a repeated command doesn't
+      water twice. A request for a running zone extends that run.
+    - Queued runs start in priority order (FIFO within a priority) while
+      fewer than `max_concurrent` zones are on and the summed "current" of
+      the active zones stays within `max_current` (0 = no current limit).
+      The head of the queue is never skipped, so a big zone can't starve;
+      a zone drawing more than `max_current` on its own could then block
+      the queue for good, so submit() refuses it.
+    """
+
+    def __init__(self, zones: Dict[str, dict], max_concurrent: int = 1,
+                 max_current: float = 0.0, max_run: float = 300):
+        self.zones = zones
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_current = max_current
+        self.max_run = max_run
+        self.queue: List[RunRequest] = []
+        self.active: Dict[str, RunRequest] = {}
+        self._seq = 0
+
+    def submit(self, zone: str, seconds: float, now: float,
+               priority: int = 0, source: str = "hub") -> Tuple[RunRequest, str]:
+        """
+        Queue a run. Returns (request, outcome) where outcome is "queued",
+        "merged" or "extended". Raises KeyError for an unknown zone and
+        ValueError for one that can never fit the current limit.
+        """
+        if zone not in self.zones:
+            raise KeyError(f"Unknown pump zone '{zone}'")
+        current = self.zones[zone].get("current", 0.0)
+        if self.max_current > 0 and current > self.max_current:
+            raise ValueError(f"Pump zone '{zone}' draws {current:g} A, above the {self.max_current:g} A limit")
+        seconds = max(0.0, min(float(seconds), self.max_run))
+
+        running = self.active.get(zone)
+        if running is not None:
+            # Never past max_run from when this run started
+            limit = running.started_at + self.max_run
+            running.ends_at = min(max(running.ends_at, now + seconds), limit)
+            running.seconds = running.ends_at - running.started_at
+            return running, "extended"
+
+        for queued in self.queue:
+            if queued.zone == zone:
+                queued.seconds = max(queued.seconds, seconds)
+                queued.priority = max(queued.priority, priority)
+                return queued, "merged"
+
+        self._seq += 1
+        request = RunRequest(zone, seconds, priority, source, self._seq)
+        self.queue.append(request)
+        return request, "queued"
+
+    def cancel(self, zone: Optional[str] = None) -> List[RunRequest]:
+        """Drop queued runs and stop active ones (all zones, or one). Returns stopped active runs."""
+        self.queue = [r for r in self.queue if zone is not None and r.zone != zone]
+        stopped = [r for z, r in self.active.items() if zone is None or z == zone]
+        for request in stopped:
+            del self.active[request.zone]
+        return stopped
+
+    def step(self, now: float) -> Tuple[List[RunRequest], List[RunRequest]]:
+        """Advance to `now`. Returns (started, finished) runs."""
+        finished = [r for r in self.active.values() if r.ends_at <= now]
+        for request in finished:
+            del self.active[request.zone]
+
+        started = []
+        self.queue.sort(key=lambda r: (-r.priority, r.seq))
+        while self.queue and self._fits(self.queue[0]):
+            request = self.queue.pop(0)
+            request.started_at = now
+            request.ends_at = now + request.seconds
+            self.active[request.zone] = request
+            started.append(request)
+        return started, finished
+
+    def _fits(self, request: RunRequest) -> bool:
+        if len(self.active) >= self.max_concurrent:
+            return False
+        if self.max_current > 0:
+            drawn = sum(self.zones[z].get("current", 0.0) for z in self.active)
+            if drawn + self.zones[request.zone].get("current", 0.0) > self.max_current:
+                return False
+        return True
+
+    def next_wakeup(self) -> Optional[float]:
+        """Earliest end of an active run, or None when idle."""
+        if not self.active:
+            return None
+        return min(r.ends_at for r in self.active.values())
+
+    def busy(self, zone: Optional[str] = None) -> bool:
+        """True if the zone (or any zone) is running or waiting to run."""
+        if zone is None:
+            return bool(self.active or self.queue)
+        return zone in self.active or any(r.zone == zone for r in self.queue)
+
+    def state(self, now: float) -> dict:
+        return {
+            "active": [r.as_dict(now) for r in self.active.values()],
+            "queued": [r.as_dict() for r in sorted(self.queue, key=lambda r: (-r.priority, r.seq))],
+        }
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import logging
+from typing import Optional
+from sensors import light, moisture, temperature
+from pump import pump_control
+
+logger = logging.getLogger("registry")
+
+# =============================
+# FORMAT
+# =============================
+# sensors.json replaces the built-in probe tables (moisture.SOIL_PROBES,
+# light.LIGHT_SENSORS, pump_control.PUMP_ZONES), one section each:
+#
+#   {
+#     "soil": {"soil-sensor-001": {"channel": 0, "power_pin": "D27", "dry": 2.48, "wet": 1.00},
+#              "soil-sensor-009": {"channel": 0, "power_pin": "D5", "adc": "0x48",
+#                                  "mux": "0x70", "mux_channel": 1, "dry": 2.48, "wet": 1.00}},
+#     "light": {"light-sensor-001": "0x23",
+#               "light-sensor-003": {"address": "0x23", "mux": "0x70", "mux_channel": 2}},
+#     "pump_zones": {"main": {"gpio": 17, "current": 1.0}}
+#   }
+#
+# I2C addresses may be numbers or hex strings. A section left out keeps its
+# built-in table. DS18B20 probes are not listed: they are found on the
+# 1-Wire bus, which every reload rescans.
+
+SECTIONS = ("soil", "light", "pump_zones")
+
+_SOIL_KEYS = {"channel", "power_pin", "dry", "wet", "adc", "mux", "mux_channel"}
+_LIGHT_KEYS = {"address", "mux", "mux_channel"}
+_ZONE_KEYS = {"gpio", "current"}
+
+# =============================
+# VALIDATION
+# =============================
+
+def _address(value, what: str) -> int:
+    try:
+        address = int(value, 0) if isinstance(value, str) else value
+    except ValueError:
+        address = None
+    if not isinstance(address, int) or isinstance(address, bool) or not 0x03 <= address <= 0x77:
+        raise ValueError(f"{what}: invalid I2C address {value!r}")
+    return address
+
+
+def _integer(value, low: int, high: int, what: str) -> int:
+    if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+        raise ValueError(f"{what}: expected an integer {low}-{high}, got {value!r}")
+    return value
+
+
+def _number(value, what: str) -> float:
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError(f"{what}: expected a number, got {value!r}")
+    return float(value)
+
+
+def _entry(cfg, allowed: set, required: set, what: str) -> dict:
+    if not isinstance(cfg, dict):
+        raise ValueError(f"{what}: expected an object, got {cfg!r}")
+    unknown = set(cfg) - allowed
+    missing = required - set(cfg)
+    if unknown:
+        raise ValueError(f"{what}: unknown keys {', '.join(sorted(unknown))}")
+    if missing:
+        raise ValueError(f"{what}: missing {', '.join(sorted(missing))}")
+    return cfg
+
+
+def _mux(cfg: dict, entry: dict, what: str):
+    if ("mux" in cfg) != ("mux_channel" in cfg):
+        raise ValueError(f"{what}: mux and mux_channel go together")
+    if "mux" in cfg:
+        entry["mux"] = _address(cfg["mux"], what)
+        entry["mux_channel"] = _integer(cfg["mux_channel"], 0, 7, what)
+
+
+def _soil(probe_id: str, cfg) -> dict:
+    what = f"soil '{probe_id}'"
+    _entry(cfg, _SOIL_KEYS, {"channel", "power_pin", "dry", "wet"}, what)
+    if not isinstance(cfg["power_pin"], str) or not cfg["power_pin"]:
+        raise ValueError(f"{what}: power_pin must be a board pin name such as \"D27\"")
+    entry = {
+        "channel": _integer(cfg["channel"], 0, 3, what),
+        "power_pin": cfg["power_pin"],
+        "dry": _number(cfg["dry"], what),
+        "wet": _number(cfg["wet"], what),
+    }
+    if entry["dry"] <= entry["wet"]:
+        raise ValueError(f"{what}: dry voltage must be above wet")
+    if "adc" in cfg:
+        entry["adc"] = _address(cfg["adc"], what)
+    _mux(cfg, entry, what)
+    return entry
+
+
+def _light(sensor_id: str, cfg):
+    what = f"light '{sensor_id}'"
+    if not isinstance(cfg, dict):
+        return _address(cfg, what)
+    _entry(cfg, _LIGHT_KEYS, {"address"}, what)
+    entry = {"address": _address(cfg["address"], what)}
+    _mux(cfg, entry, what)
+    # A bare address compares equal to the built-in form, so it isn't re-probed
+    return entry if "mux" in entry else entry["address"]
+
+
+def _zone(zone: str, cfg) -> dict:
+    what = f"pump zone '{zone}'"
+    _entry(cfg, _ZONE_KEYS, {"gpio"}, what)
+    entry = {"gpio": _integer(cfg["gpio"], 0, 27, what)}
+    if "current" in cfg:
+        entry["current"] = _number(cfg["current"], what)
+        limit = pump_control.MAX_TOTAL_CURRENT
+        if limit > 0 and entry["current"] > limit:
+            # The sequencer could never start it, and it would hold up the queue
+            raise ValueError(f"{what}: current {entry['current']:g} A is above the {limit:g} A total limit")
+    return entry
+
+
+_PARSERS = {"soil": _soil, "light": _light, "pump_zones": _zone}
+
+
+def validate(raw) -> dict:
+    """Check a registry and normalise it (addresses as ints). Raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError("registry must be a JSON object")
+    unknown = set(raw) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"unknown sections {', '.join(sorted(unknown))} (expected {', '.join(SECTIONS)})")
+
+    config = {}
+    for section, entries in raw.items():
+        if not isinstance(entries, dict):
+            raise ValueError(f"{section}: expected an object of id -> settings")
+        config[section] = {name: _PARSERS[section](name, cfg) for name, cfg in entries.items()}
+
+    gpios = [cfg["gpio"] for cfg in config.get("pump_zones", {}).values()]
+    if len(gpios) != len(set(gpios)):
+        raise ValueError("pump_zones: two zones on the same GPIO")
+    return config
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        try:
+            raw = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"{path} is not valid JSON: {e}")
+    return validate(raw)
+
+
+def save(path: str, raw: dict):
+    """Write a registry received over MQTT, atomically."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(raw, f, indent=2)
+    os.replace(tmp, path)
+
+# =============================
+# APPLY
+# =============================
+
+def apply(config: dict) -> dict:
+    """
+    Hand each section to its driver, which applies only the difference.
+    Returns {section: {"added": [...], "removed": [...], "changed": [...]}}.
+    Before the drivers are initialised this just swaps the tables.
+    """
+    drivers = {"soil": moisture.configure, "light": light.configure, "pump_zones": pump_control.configure_zones}
+    changes = {}
+    for section in SECTIONS:
+        if section in config:
+            added, removed, changed = drivers[section](config[section])
+            changes[section] = {"added": added, "removed": removed, "changed": changed}
+    return changes
+
+
+def apply_file(path: str):
+    """At startup: use the registry file if there is one, else the built-in tables."""
+    if not os.path.exists(path):
+        logger.info(f"No sensor registry at {path} — using the built-in probe tables")
+        return
+    try:
+        apply(load(path))
+        logger.info(f"Sensor registry loaded from {path}")
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring sensor registry {path}: {e} — using the built-in probe tables")
+
+
+def reload(path: str, request: Optional[dict] = None) -> dict:
+    """
+    Apply the registry file, or a registry sent in the request (validated,
+    then written to `path` so it survives a restart), and rescan the 1-Wire
+    bus. The caller keeps the buses idle meanwhile. Returns the answer
+    published on registry/<uid>.
+    """
+    request = request or {}
+    response = {"request_id": request.get("request_id"), "ts": int(time.time())}
+    try:
+        if "registry" in request:
+            config = validate(request["registry"])
+            save(path, request["registry"])
+        elif os.path.exists(path):
+            config = load(path)
+        else:
+            config = {}
+        changes = apply(config)
+        added, removed = temperature.rescan()
+        changes["temperature"] = {"added": added, "removed": removed, "changed": []}
+    except (OSError, ValueError) as e:
+        logger.error(f"Sensor registry not applied: {e}")
+        response.update(ok=False, error=str(e))
+        return response
+
+    summary = ", ".join(
+        f"{section} +{len(c['added'])} -{len(c['removed'])} ~{len(c['changed'])}"
+        for section, c in changes.items() if c["added"] or c["removed"] or c["changed"]
+    )
+    logger.info(f"Sensor registry reloaded: {summary or 'no changes'}")
+    response.update(ok=True, changes=changes)
+    return response
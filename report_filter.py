@@ -0,0 +1,103 @@
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger("report_filter")
+
+# =============================
+# DEADBANDS
+# =============================
+
+class Deadband:
+    """
+    Minimum change worth reporting. Parsed from strings such as "0.5"
+    (absolute, in the sensor's own unit) or "5%" (relative to the last
+    value sent).
+    """
+
+    def __init__(self, spec: str):
+        spec = str(spec).strip()
+        self.percent = spec.endswith("%")
+        self.amount = abs(float(spec.rstrip("%") or 0))
+
+    def exceeded(self, last: float, value: float) -> bool:
+        delta = abs(value - last)
+        if self.percent:
+            return delta > abs(last) * self.amount / 100
+        return delta > self.amount
+
+    def __repr__(self):
+        return f"{self.amount}{'%' if self.percent else ''}"
+
+# =============================
+# FILTER
+# =============================
+
+class ReportFilter:
+    """
+    Report-by-exception between build_sensor_payload and publish_sensors.
+
+    A sensor is passed through when its value has moved past its type's
+    deadband since the last value *sent*, when it changes between a reading
+    and None, or when it has been silent for `heartbeat` seconds. Comparing
+    against the last sent value (not the last read) means the hub's copy is
+    never further than one deadband from the truth.
+    """
+
+    def __init__(self, deadbands: Dict[str, str], heartbeat: float):
+        self.deadbands = {sensor_type: Deadband(spec) for sensor_type, spec in deadbands.items()}
+        self.heartbeat = heartbeat
+        self._last: Dict[Tuple[str, str], Tuple[Optional[float], float]] = {}
+        self._lock = threading.Lock()
+
+        self.passed = 0
+        self.suppressed = 0
+
+    def _should_send(self, sensor: dict, now: float) -> bool:
+        key = (sensor["type"], sensor["id"])
+        previous = self._last.get(key)
+        if previous is None:
+            return True
+
+        last_value, last_sent = previous
+        value = sensor.get("value")
+
+        if now - last_sent >= self.heartbeat:
+            return True
+        if (value is None) != (last_value is None):
+            return True
+        if value is None:
+            return False
+
+        deadband = self.deadbands.get(sensor["type"])
+        if deadband is None:
+            return value != last_value
+        return deadband.exceeded(last_value, value)
+
+    def filter(self, sensors: list, now: float = None) -> list:
+        """Return only the sensors worth publishing and remember them as sent."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            selected = [s for s in sensors if self._should_send(s, now)]
+            for sensor in selected:
+                self._last[(sensor["type"], sensor["id"])] = (sensor.get("value"), now)
+
+        self.passed += len(selected)
+        self.suppressed += len(sensors) - len(selected)
+        if len(selected) < len(sensors):
+            logger.debug("Report filter: %d/%d sensors changed", len(selected), len(sensors))
+        return selected
+
+    def snapshot(self, sensors: list, now: float = None) -> list:
+        """Record a full reading as sent (e.g. manual read-now) and return it unchanged."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for sensor in sensors:
+                self._last[(sensor["type"], sensor["id"])] = (sensor.get("value"), now)
+        return sensors
+
+    def reset(self):
+        """Forget what was sent, so the next reading goes out in full (e.g. after reconnect)."""
+        with self._lock:
+            self._last.clear()
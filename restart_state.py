@@ -0,0 +1,55 @@
+import os
+import json
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger("restart_state")
+
+# =============================
+# CONFIG
+# =============================
+# Written once on a clean shutdown (systemctl stop/restart), read back and
+# deleted at the next start: pending readings, open aggregation windows and
+# where each task was on the schedule. State older than the caller's
+# max_age describes windows long closed and is ignored.
+VERSION = 1
+
+
+def save(path: str, state: dict):
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": VERSION, "saved_at": time.time(), **state}, f)
+        os.replace(tmp, path)
+        logger.info(f"Restart state saved to {path}")
+    except (OSError, TypeError, ValueError) as e:
+        logger.error("Failed to save restart state: %s", e)
+
+
+def load(path: str, max_age: float) -> Optional[dict]:
+    """The state saved by the last shutdown, or None. Used once: the file is removed."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable restart state {path}: {e}")
+        state = None
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    if not isinstance(state, dict) or state.get("version") != VERSION:
+        return None
+    age = time.time() - state.get("saved_at", 0)
+    if not 0 <= age <= max_age:
+        logger.info(f"Restart state from {age:.0f}s ago is too old — starting fresh")
+        return None
+    return state
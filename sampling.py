@@ -0,0 +1,172 @@
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("sampling")
+
+# =============================
+# RING BUFFER
+# =============================
+
+class RingBuffer:
+    """
+    Fixed-capacity float buffer backed by array('d'): 8 bytes per slot,
+    allocated once, no per-sample objects kept. When full, the oldest
+    sample is overwritten.
+    """
+
+    __slots__ = ("_data", "_capacity", "_next", "_count")
+
+    def __init__(self, capacity: int):
+        self._capacity = max(1, capacity)
+        self._data = array("d", bytes(8 * self._capacity))
+        self._next = 0
+        self._count = 0
+
+    def append(self, value: float):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def values(self) -> array:
+        """Stored samples, oldest first."""
+        if self._count < self._capacity:
+            return self._data[:self._count]
+        return self._data[self._next:] + self._data[:self._next]
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.itemsize * self._capacity
+
+# =============================
+# AGGREGATION
+# =============================
+
+def summarise(values, outlier_k: float = 0.0) -> Optional[dict]:
+    """
+    min / max / mean / median / count of one window. With outlier_k > 0,
+    samples further than outlier_k scaled MADs from the median are dropped
+    first (robust against one-off spikes).
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rejected = 0
+
+    if outlier_k > 0 and len(ordered) >= 3:
+        median = _median(ordered)
+        mad = _median(sorted(abs(v - median) for v in ordered)) * 1.4826
+        if mad > 0:
+            limit = outlier_k * mad
+            kept = [v for v in ordered if abs(v - median) <= limit]
+            rejected = len(ordered) - len(kept)
+            ordered = kept
+
+    count = len(ordered)
+    stats = {
+        "min": round(ordered[0], 2),
+        "max": round(ordered[-1], 2),
+        "mean": round(sum(ordered) / count, 2),
+        "median": round(_median(ordered), 2),
+        "count": count,
+    }
+    if rejected:
+        stats["rejected"] = rejected
+    return stats
+
+
+def _median(ordered) -> float:
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+
+class WindowAggregator:
+    """
+    Collects high-rate readings between publishes and turns each window into
+    one sensor dict per sensor: "value" is the window median, "stats" carries
+    min / max / mean / median / count. Memory per sensor is one RingBuffer of
+    `capacity` samples.
+    """
+
+    def __init__(self, capacity: int, outlier_k: float = 0.0):
+        self.capacity = capacity
+        self.outlier_k = outlier_k
+        self._windows: Dict[Tuple[str, str], RingBuffer] = {}
+        self._failures: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, sensors: List[dict]):
+        with self._lock:
+            for sensor in sensors:
+                key = (sensor["type"], sensor["id"])
+                window = self._windows.get(key)
+                if window is None:
+                    window = self._windows[key] = RingBuffer(self.capacity)
+                    self._failures[key] = 0
+
+                value = sensor.get("value")
+                if value is None:
+                    self._failures[key] += 1
+                else:
+                    window.append(value)
+
+    def flush(self) -> List[dict]:
+        """Summarise every window and start new ones."""
+        sensors = []
+        with self._lock:
+            for (sensor_type, sensor_id), window in self._windows.items():
+                # Sensors on a slower schedule may not have been read this window
+                if not window and not self._failures[(sensor_type, sensor_id)]:
+                    continue
+                stats = summarise(window.values(), self.outlier_k)
+                sensor = {
+                    "type": sensor_type,
+                    "id": sensor_id,
+                    "value": stats["median"] if stats else None,
+                }
+                if stats:
+                    if self._failures[(sensor_type, sensor_id)]:
+                        stats["failed"] = self._failures[(sensor_type, sensor_id)]
+                    sensor["stats"] = stats
+                sensors.append(sensor)
+
+                window.clear()
+                self._failures[(sensor_type, sensor_id)] = 0
+        return sensors
+
+    def snapshot(self) -> List[dict]:
+        """Open windows as plain data, to carry over a restart."""
+        with self._lock:
+            return [
+                {"type": key[0], "id": key[1], "values": list(window.values()), "failed": self._failures[key]}
+                for key, window in self._windows.items() if window or self._failures[key]
+            ]
+
+    def restore(self, windows: List[dict]):
+        """Put back windows saved by snapshot(); they are summarised at the next flush."""
+        with self._lock:
+            for saved in windows:
+                key = (saved["type"], saved["id"])
+                window = self._windows.get(key)
+                if window is None:
+                    window = self._windows[key] = RingBuffer(self.capacity)
+                    self._failures[key] = 0
+                for value in saved["values"]:
+                    window.append(value)
+                self._failures[key] += saved.get("failed", 0)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(w.nbytes for w in self._windows.values())
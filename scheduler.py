@@ -0,0 +1,133 @@
+import heapq
+import time
+import logging
+import threading
+from typing import Callable, List, Optional
+import metrics
+
+logger = logging.getLogger("scheduler")
+
+_MISSED = metrics.counter("scheduler_missed_ticks_total", "Ticks skipped because a task overran", ("task",))
+_LATENESS = metrics.histogram("scheduler_lateness_seconds", "How late a task started after its deadline", ("task",))
+
+
+class Task:
+    """A periodic job. Deadlines are phase + k * period on the monotonic clock."""
+
+    def __init__(self, name: str, period: float, phase: float = 0.0):
+        if period <= 0:
+            raise ValueError(f"Task '{name}' needs a positive period")
+        self.name = name
+        self.period = period
+        self.phase = phase
+        self.deadline = 0.0
+        self.runs = 0
+        self.missed = 0
+        self.late_total = 0.0
+
+    def __repr__(self):
+        return f"Task({self.name!r}, period={self.period}, phase={self.phase})"
+
+
+class Scheduler:
+    """
+    Drift-free multi-rate scheduler: a heap of tasks ordered by deadline.
+
+    Each task's next deadline is computed from its previous *deadline*, not
+    from when it actually ran, so acquisition time never accumulates into the
+    period. If a task falls behind by whole periods (e.g. a slow cycle), the
+    missed ticks are counted and skipped rather than run back-to-back, and
+    the task stays aligned to its original grid.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap = []
+        self._seq = 0
+        self._stop = threading.Event()
+        self.tasks: List[Task] = []
+
+    def add(self, name: str, period: float, phase: float = 0.0) -> Task:
+        task = Task(name, period, phase)
+        task.deadline = self.clock() + phase
+        self.tasks.append(task)
+        self._push(task)
+        return task
+
+    def _push(self, task: Task):
+        self._seq += 1
+        heapq.heappush(self._heap, (task.deadline, self._seq, task))
+
+    def next_deadline(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def time_to_next(self) -> float:
+        deadline = self.next_deadline()
+        if deadline is None:
+            return float("inf")
+        return max(0.0, deadline - self.clock())
+
+    def pop_due(self, now: Optional[float] = None) -> List[Task]:
+        """Remove and reschedule every task whose deadline has passed."""
+        now = self.clock() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, task = heapq.heappop(self._heap)
+            task.runs += 1
+            task.late_total += now - task.deadline
+            _LATENESS.observe(now - task.deadline, task=task.name)
+
+            next_deadline = task.deadline + task.period
+            if next_deadline <= now:
+                skipped = int((now - next_deadline) // task.period) + 1
+                task.missed += skipped
+                _MISSED.inc(skipped, task=task.name)
+                next_deadline += skipped * task.period
+                logger.warning("Task '%s' missed %d tick(s) — realigning", task.name, skipped)
+
+            task.deadline = next_deadline
+            self._push(task)
+            due.append(task)
+        return due
+
+    def wait_due(self) -> List[Task]:
+        """Sleep until the next deadline (or stop()) and return the due tasks."""
+        while not self._stop.is_set():
+            delay = self.time_to_next()
+            if delay > 0:
+                self._stop.wait(delay)
+                continue
+            return self.pop_due()
+        return []
+
+    def snapshot(self) -> dict:
+        """Each task's next deadline as wall-clock time, to carry over a restart."""
+        offset = time.time() - self.clock()
+        return {task.name: task.deadline + offset for task in self.tasks}
+
+    def restore(self, deadlines: dict):
+        """
+        Continue on the grid saved by snapshot(), so a restart doesn't move
+        every task to "now". Deadlines missed while stopped run on the first
+        tick (the skipped ticks are counted as usual); none is pushed further
+        out than one period.
+        """
+        now = self.clock()
+        offset = time.time() - now
+        for task in self.tasks:
+            if task.name in deadlines:
+                task.deadline = min(float(deadlines[task.name]) - offset, now + task.period)
+        self._heap = []
+        for task in self.tasks:
+            self._push(task)
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    @property
+    def missed(self) -> int:
+        return sum(task.missed for task in self.tasks)
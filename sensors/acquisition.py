@@ -0,0 +1,270 @@
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sensors import breaker
+import metrics
+import profiling
+
+logger = logging.getLogger("acquisition")
+
+_DRIVER_SECONDS = metrics.histogram("driver_read_seconds", "Time to read every sensor of one driver", ("driver",))
+_DRIVER_ERRORS = metrics.counter("driver_errors_total", "Driver reads that raised", ("driver",))
+_READ_FAILURES = metrics.counter("sensor_read_failures_total", "Readings that came back empty", ("type", "sensor"))
+_DEADLINES = metrics.counter("bus_deadline_exceeded_total", "Bus reads abandoned at the read deadline", ("bus",))
+
+# =============================
+# SOURCES
+# =============================
+
+@dataclass
+class Source:
+    """
+    One driver family, e.g. all DS18B20 probes.
+    bus:  name of the physical bus the driver talks on. Sources that share a
+          bus are never read at the same time.
+    read: callable returning a list of sensor dicts.
+    read_async: coroutine function doing the same for the asyncio runtime
+          (optional; without it `read` is called on the event loop).
+    """
+    name: str
+    bus: str
+    read: Callable[[], list]
+    read_async: Optional[Callable[[], Awaitable[list]]] = None
+
+
+@dataclass
+class CycleTiming:
+    """Wall-clock breakdown of a single acquisition cycle (seconds)."""
+    started_at: float
+    total: float = 0.0
+    sources: Dict[str, float] = field(default_factory=dict)
+    buses: Dict[str, float] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "started_at": round(self.started_at, 3),
+            "total": round(self.total, 3),
+            "sources": {k: round(v, 3) for k, v in self.sources.items()},
+            "buses": {k: round(v, 3) for k, v in self.buses.items()},
+        }
+
+# =============================
+# ENGINE
+# =============================
+
+class AcquisitionEngine:
+    """
+    Runs sensor sources concurrently on a bounded worker pool.
+
+    Sources are grouped by bus: each bus is handled by one worker that reads
+    its sources in registration order, while different buses run in parallel.
+    A cycle therefore takes roughly as long as the slowest bus instead of the
+    sum of every probe.
+
+    With a `deadline` (seconds), a bus that has not returned by then is
+    abandoned for this cycle: its sensors are reported as failed reads (see
+    sensors.breaker) and the bus is skipped outright until the overdue read
+    finishes, so a hung driver costs later cycles nothing. A thread blocked
+    in the kernel cannot be interrupted; it is only no longer waited for.
+    """
+
+    def __init__(self, sources: List[Source], max_workers: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        self.sources = list(sources)
+        self.deadline = deadline or None
+        bus_count = len({s.bus for s in self.sources}) or 1
+        self.max_workers = max(1, min(max_workers or bus_count, bus_count))
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="acq"
+        )
+        # One lock per bus, shared across cycles, so a manual read and the
+        # periodic loop can never drive the same bus at once.
+        self._bus_locks = {s.bus: threading.Lock() for s in self.sources}
+        self._async_bus_locks = {s.bus: asyncio.Lock() for s in self.sources}
+        self._overrun: Dict[str, bool] = {}   # bus -> a read past its deadline is still running
+        self._known: Dict[str, List[Tuple[str, str]]] = {}   # source -> (type, id) it last returned
+        self.last_timing: Optional[CycleTiming] = None
+
+    def _selected(self, names=None) -> List[Source]:
+        if names is None:
+            return self.sources
+        return [s for s in self.sources if s.name in names]
+
+    def _groups(self, sources: List[Source]) -> Dict[str, List[Source]]:
+        groups: Dict[str, List[Source]] = {}
+        for source in sources:
+            groups.setdefault(source.bus, []).append(source)
+        return groups
+
+    def _run_bus(self, bus: str, sources: List[Source]):
+        results = {}
+        timings = {}
+        with self._bus_locks[bus], profiling.section():
+            for source in sources:
+                start = time.monotonic()
+                try:
+                    results[source.name] = source.read() or []
+                except Exception as e:
+                    results[source.name] = self._failed(source, bus, e)
+                timings[source.name] = self._record(source, start, results[source.name])
+        return results, timings
+
+    async def _run_bus_async(self, bus: str, sources: List[Source]):
+        results = {}
+        timings = {}
+        async with self._async_bus_locks[bus]:
+            for source in sources:
+                start = time.monotonic()
+                try:
+                    if source.read_async is not None:
+                        results[source.name] = await source.read_async() or []
+                    else:
+                        results[source.name] = source.read() or []
+                except Exception as e:
+                    results[source.name] = self._failed(source, bus, e)
+                timings[source.name] = self._record(source, start, results[source.name])
+        return results, timings
+
+    def _failed(self, source: Source, bus: str, error: Exception) -> list:
+        logger.error("Source '%s' failed on %s: %s", source.name, bus, error)
+        _DRIVER_ERRORS.inc(driver=source.name)
+        return self._lost(source)
+
+    def _lost(self, source: Source) -> list:
+        """Sensors of a source that raised or overran: each counts as a failed read."""
+        sensors = []
+        for sensor_type, sensor_id in self._known.get(source.name, []):
+            guard = breaker.get(sensor_type, sensor_id)
+            guard.record(None)
+            sensors.append(guard.payload(None))
+        return sensors
+
+    def _overdue(self, bus: str, sources: List[Source], reason: str):
+        names = ", ".join(s.name for s in sources)
+        logger.warning("Bus %s %s — %s reported without a fresh reading", bus, reason, names)
+        results = {source.name: self._lost(source) for source in sources}
+        return results, {source.name: 0.0 for source in sources}
+
+    def _record(self, source: Source, start: float, sensors: list) -> float:
+        elapsed = time.monotonic() - start
+        _DRIVER_SECONDS.observe(elapsed, driver=source.name)
+        if sensors:
+            self._known[source.name] = [(s.get("type"), s.get("id")) for s in sensors]
+        for sensor in sensors:
+            if sensor.get("value") is None:
+                _READ_FAILURES.inc(type=sensor.get("type"), sensor=sensor.get("id"))
+        return elapsed
+
+    @contextmanager
+    def hold(self, timeout: Optional[float] = None):
+        """
+        Keep every bus idle for the duration (e.g. while probe tables change).
+        Raises TimeoutError if the buses aren't all free within `timeout`
+        seconds, e.g. while a read left behind at the deadline still hangs.
+        """
+        give_up = None if timeout is None else time.monotonic() + timeout
+        with ExitStack() as stack:
+            for bus in sorted(self._bus_locks):
+                lock = self._bus_locks[bus]
+                wait = -1 if give_up is None else max(0.0, give_up - time.monotonic())
+                if not lock.acquire(timeout=wait):
+                    raise TimeoutError(f"bus {bus} still busy after {timeout:g}s")
+                stack.callback(lock.release)
+            yield
+
+    @asynccontextmanager
+    async def hold_async(self, timeout: Optional[float] = None):
+        give_up = None if timeout is None else time.monotonic() + timeout
+        async with AsyncExitStack() as stack:
+            for bus in sorted(self._async_bus_locks):
+                lock = self._async_bus_locks[bus]
+                wait = None if give_up is None else max(0.0, give_up - time.monotonic())
+                try:
+                    await asyncio.wait_for(lock.acquire(), wait)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"bus {bus} still busy after {timeout:g}s")
+                stack.callback(lock.release)
+            yield
+
+    def run_cycle(self, names=None) -> list:
+        """
+        Read every source once (or only the sources named in `names`) and
+        return the combined list of sensor dicts, in the same order the
+        sources were registered.
+        """
+        timing = CycleTiming(started_at=time.time())
+        start = time.monotonic()
+        selected = self._selected(names)
+
+        groups = self._groups(selected)
+        outcomes = {}
+        futures = {}
+        for bus, sources in groups.items():
+            if self._overrun.get(bus):
+                outcomes[bus] = self._overdue(bus, sources, "still busy with an overdue read")
+            else:
+                futures[bus] = self._executor.submit(self._run_bus, bus, sources)
+
+        for bus, future in futures.items():
+            timeout = None if self.deadline is None else max(0.0, start + self.deadline - time.monotonic())
+            try:
+                outcomes[bus] = future.result(timeout=timeout)
+            except FutureTimeout:
+                _DEADLINES.inc(bus=bus)
+                self._overrun[bus] = True
+                future.add_done_callback(lambda _, bus=bus: self._overrun.pop(bus, None))
+                outcomes[bus] = self._overdue(bus, groups[bus], f"missed the {self.deadline:g}s read deadline")
+        return self._combine(selected, outcomes, timing, start)
+
+    async def run_cycle_async(self, names=None) -> list:
+        """
+        run_cycle() on the running event loop: buses are read as concurrent
+        tasks instead of on the worker pool, so driver waits overlap without
+        any threads.
+        """
+        timing = CycleTiming(started_at=time.time())
+        start = time.monotonic()
+        selected = self._selected(names)
+
+        groups = self._groups(selected)
+        outcomes = await asyncio.gather(*(self._run_bus_deadline(bus, sources) for bus, sources in groups.items()))
+        return self._combine(selected, dict(zip(groups, outcomes)), timing, start)
+
+    async def _run_bus_deadline(self, bus: str, sources: List[Source]):
+        """_run_bus_async() cancelled at the deadline (only where the driver awaits)."""
+        if self.deadline is None:
+            return await self._run_bus_async(bus, sources)
+        try:
+            return await asyncio.wait_for(self._run_bus_async(bus, sources), self.deadline)
+        except asyncio.TimeoutError:
+            _DEADLINES.inc(bus=bus)
+            return self._overdue(bus, sources, f"missed the {self.deadline:g}s read deadline")
+
+    def _combine(self, selected: List[Source], outcomes: dict, timing: CycleTiming, start: float) -> list:
+        results = {}
+        for bus, (bus_results, bus_timings) in outcomes.items():
+            results.update(bus_results)
+            timing.sources.update(bus_timings)
+            timing.buses[bus] = sum(bus_timings.values())
+
+        sensors = []
+        for source in selected:
+            sensors.extend(results.get(source.name, []))
+
+        timing.total = time.monotonic() - start
+        self.last_timing = timing
+
+        if logger.isEnabledFor(logging.DEBUG):
+            breakdown = ", ".join(f"{bus}={t:.2f}s" for bus, t in timing.buses.items())
+            logger.debug("Acquisition cycle: %d sensors in %.2fs (%s)", len(sensors), timing.total, breakdown)
+        return sensors
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
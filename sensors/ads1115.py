@@ -0,0 +1,77 @@
+import time
+from typing import Callable, ContextManager
+
+from sensors.bus import write_bytes, write_then_read
+
+# =============================
+# REGISTERS
+# =============================
+# Register-level access (rather than adafruit_ads1x15) splits a single-shot
+# read into start / wait / fetch, so conversions on several ADCs can run at
+# the same time and the bus is free while they do.
+
+REG_CONVERSION = 0x00
+REG_CONFIG = 0x01
+
+_OS_START = 0x8000
+_MODE_SINGLE = 0x0100
+_COMP_DISABLE = 0x0003
+
+# gain -> (PGA bits, full-scale volts)
+GAINS = {
+    2 / 3: (0x0000, 6.144),
+    1: (0x0200, 4.096),
+    2: (0x0400, 2.048),
+    4: (0x0600, 1.024),
+    8: (0x0800, 0.512),
+    16: (0x0A00, 0.256),
+}
+
+DATA_RATES = {8: 0x0000, 16: 0x0020, 32: 0x0040, 64: 0x0060, 128: 0x0080, 250: 0x00A0, 475: 0x00C0, 860: 0x00E0}
+
+# The internal oscillator may run up to 10% slow
+_CONVERSION_MARGIN = 1.1
+
+
+class ADS1115:
+    """
+    Minimal single-shot ADS1115 driver. `transaction` returns a context
+    manager yielding the I2C bus with this ADC reachable (for a device
+    behind a multiplexer, sensors.topology selects its branch).
+    """
+
+    def __init__(self, transaction: Callable[[], ContextManager], address: int = 0x48,
+                 gain: float = 1, data_rate: int = 860):
+        if gain not in GAINS:
+            raise ValueError(f"Unsupported ADS1115 gain {gain}")
+        if data_rate not in DATA_RATES:
+            raise ValueError(f"Unsupported ADS1115 data rate {data_rate}")
+        self.transaction = transaction
+        self.address = address
+        self.gain = gain
+        self.data_rate = data_rate
+
+    @property
+    def conversion_time(self) -> float:
+        return _CONVERSION_MARGIN / self.data_rate + 0.0001
+
+    def start(self, channel: int):
+        """Start a single-ended conversion on AIN<channel>."""
+        if not 0 <= channel <= 3:
+            raise ValueError(f"ADS1115 channel {channel} out of range")
+        config = (_OS_START | ((0x4 + channel) << 12) | GAINS[self.gain][0] | _MODE_SINGLE |
+                  DATA_RATES[self.data_rate] | _COMP_DISABLE)
+        with self.transaction() as i2c:
+            write_bytes(i2c, self.address, bytes([REG_CONFIG, config >> 8, config & 0xFF]))
+
+    def fetch(self) -> float:
+        """Result of the last conversion, in volts."""
+        with self.transaction() as i2c:
+            buf = write_then_read(i2c, self.address, bytes([REG_CONVERSION]), 2)
+        raw = int.from_bytes(buf, "big", signed=True)
+        return raw * GAINS[self.gain][1] / 32768
+
+    def read_voltage(self, channel: int) -> float:
+        self.start(channel)
+        time.sleep(self.conversion_time)
+        return self.fetch()
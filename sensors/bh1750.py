@@ -0,0 +1,204 @@
+import time
+import logging
+from typing import Callable, ContextManager, Optional
+from sensors import steps
+from sensors.bus import read_bytes, write_bytes
+
+logger = logging.getLogger("bh1750")
+
+# =============================
+# OPCODES / TIMING
+# =============================
+# Talking to the chip at opcode level (rather than through adafruit_bh1750)
+# gives access to the continuous modes and the measurement-time register
+# (MTreg), and lets the bus be released while a conversion runs.
+
+POWER_ON = 0x01
+RESET = 0x07
+
+MODES = {
+    # name: (opcode, one-shot, max conversion s at MTreg 69, counts per lux)
+    "continuous_high": (0x10, False, 0.180, 1.2),
+    "continuous_high2": (0x11, False, 0.180, 2.4),
+    "continuous_low": (0x13, False, 0.024, 1.2),
+    "one_time_high": (0x20, True, 0.180, 1.2),
+    "one_time_high2": (0x21, True, 0.180, 2.4),
+    "one_time_low": (0x23, True, 0.024, 1.2),
+}
+
+MTREG_DEFAULT = 69
+MTREG_MIN = 31
+MTREG_MAX = 254
+
+# Auto-ranging uses the shortest measurement time that still yields a few
+# hundred counts (well under 1% quantisation). Outside RANGE_LOW..RANGE_HIGH
+# the next reading uses an MTreg that would put the same light at RANGE_TARGET.
+RANGE_LOW = 250
+RANGE_HIGH = 1500
+RANGE_TARGET = 500
+SATURATED = 0xFFFF
+
+
+class BH1750:
+    """
+    Minimal BH1750 driver over a busio-style I2C object.
+
+    `transaction` is a callable returning a context manager that yields the
+    I2C bus (sensors.bus.SharedBus.transaction); it is entered only around
+    the actual transfers, so other devices on the bus run while a one-time
+    conversion is in progress.
+
+    auto_range adjusts MTreg after a reading that falls outside the count
+    band: shorter integration in bright light (so direct sun doesn't
+    saturate at ~54k lux, and reads finish sooner), longer in shade (finer
+    resolution). A saturated reading is retried straight away at the
+    shortest time.
+    """
+
+    def __init__(self, transaction: Callable[[], ContextManager], address: int = 0x23,
+                 mode: str = "one_time_high", mtreg: int = MTREG_DEFAULT, auto_range: bool = True):
+        if mode not in MODES:
+            raise ValueError(f"Unknown BH1750 mode '{mode}'")
+        self.transaction = transaction
+        self.address = address
+        self.mode = mode
+        self.mtreg = _clamp(mtreg)
+        self.auto_range = auto_range
+        self._started_at = 0.0   # when the running continuous conversion was (re)configured
+        self.configure()
+
+    # =============================
+    # LOW LEVEL
+    # =============================
+
+    def _write(self, i2c, *opcodes: int):
+        write_bytes(i2c, self.address, bytes(opcodes))
+
+    def _read_raw(self, i2c) -> int:
+        buf = read_bytes(i2c, self.address, 2)
+        return (buf[0] << 8) | buf[1]
+
+    def _mtreg_opcodes(self):
+        return 0x40 | (self.mtreg >> 5), 0x60 | (self.mtreg & 0x1F)
+
+    # =============================
+    # CONFIGURATION
+    # =============================
+
+    def configure(self, mode: Optional[str] = None, mtreg: Optional[int] = None):
+        """Power on, set MTreg and (for continuous modes) start measuring."""
+        if mode is not None:
+            if mode not in MODES:
+                raise ValueError(f"Unknown BH1750 mode '{mode}'")
+            self.mode = mode
+        if mtreg is not None:
+            self.mtreg = _clamp(mtreg)
+
+        opcode, one_shot, _, _ = MODES[self.mode]
+        with self.transaction() as i2c:
+            self._write(i2c, POWER_ON)
+            self._write(i2c, *self._mtreg_opcodes())
+            if not one_shot:
+                self._write(i2c, opcode)
+        self._started_at = time.monotonic()
+
+    @property
+    def conversion_time(self) -> float:
+        """Worst-case conversion time for the current mode and MTreg (seconds)."""
+        return MODES[self.mode][2] * self.mtreg / MTREG_DEFAULT
+
+    @property
+    def one_shot(self) -> bool:
+        return MODES[self.mode][1]
+
+    # =============================
+    # READ
+    # =============================
+
+    def _start(self) -> float:
+        """Trigger a conversion if needed; returns seconds until the result is ready."""
+        opcode, one_shot, _, _ = MODES[self.mode]
+        if one_shot:
+            with self.transaction() as i2c:
+                self._write(i2c, opcode)
+            return self.conversion_time
+        # Continuous: the register always holds the latest result; only
+        # wait if the first conversion after a (re)configure isn't done
+        return max(0.0, self._started_at + self.conversion_time - time.monotonic())
+
+    def _fetch(self) -> int:
+        with self.transaction() as i2c:
+            return self._read_raw(i2c)
+
+    def _counts(self):
+        wait = self._start()
+        if wait > 0:
+            yield wait
+        return self._fetch()
+
+    def read_counts(self) -> int:
+        return steps.run(self._counts())
+
+    def to_lux(self, counts: int) -> float:
+        return counts / MODES[self.mode][3] * MTREG_DEFAULT / self.mtreg
+
+    def _saturated(self, counts: int) -> bool:
+        if self.auto_range and counts >= SATURATED and self.mtreg > MTREG_MIN:
+            # Clipped: the value is meaningless, retry at the shortest time
+            self._set_mtreg(MTREG_MIN)
+            return True
+        return False
+
+    def _finish(self, counts: int) -> float:
+        value = self.to_lux(counts)
+        if self.auto_range:
+            self._range(counts)
+        return value
+
+    def lux_steps(self):
+        """
+        One reading as a generator that yields the conversion waits (see
+        sensors.steps) and returns the lux value.
+        """
+        counts = yield from self._counts()
+        if self._saturated(counts):
+            counts = yield from self._counts()
+        return self._finish(counts)
+
+    @property
+    def lux(self) -> float:
+        return steps.run(self.lux_steps())
+
+    async def read_lux_async(self) -> float:
+        """lux for the asyncio runtime: the conversion waits are awaited."""
+        return await steps.run_async(self.lux_steps())
+
+    def _range(self, counts: int):
+        if RANGE_LOW <= counts <= RANGE_HIGH:
+            return
+        if counts == 0:
+            wanted = MTREG_MAX
+        else:
+            wanted = int(self.mtreg * RANGE_TARGET / counts)
+        wanted = _clamp(wanted)
+        if wanted != self.mtreg:
+            logger.debug("BH1750 0x%02X: counts=%d, MTreg %d -> %d", self.address, counts, self.mtreg, wanted)
+            self._set_mtreg(wanted)
+
+    def _set_mtreg(self, mtreg: int):
+        self.mtreg = _clamp(mtreg)
+        with self.transaction() as i2c:
+            self._write(i2c, *self._mtreg_opcodes())
+            if not self.one_shot:
+                # Restart so the next result is integrated at the new time
+                self._write(i2c, MODES[self.mode][0])
+        self._started_at = time.monotonic()
+
+    def power_down(self):
+        with self.transaction() as i2c:
+            self._write(i2c, 0x00)
+
+
+def _clamp(mtreg: int) -> int:
+    return max(MTREG_MIN, min(MTREG_MAX, int(mtreg)))
+
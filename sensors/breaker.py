@@ -0,0 +1,137 @@
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+import metrics
+
+logger = logging.getLogger("breaker")
+
+_TRIPS = metrics.counter("sensor_breaker_trips_total", "Sensors taken out of the read cycle after failures", ("type", "sensor"))
+
+# =============================
+# CONFIG
+# =============================
+# A sensor that fails FAILURE_THRESHOLD reads in a row is skipped (no bus
+# traffic, no re-probe) until its backoff expires; then a single trial
+# read decides whether it is back (closed) or skipped again for twice as
+# long, up to BACKOFF_MAX.
+FAILURE_THRESHOLD = 3
+BACKOFF_MIN = 10        # seconds
+BACKOFF_MAX = 900       # seconds
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# =============================
+# BREAKER
+# =============================
+
+class CircuitBreaker:
+    """Per-sensor closed / open / half-open state with exponential re-probe backoff."""
+
+    def __init__(self, sensor_type: str, sensor_id: str):
+        self.type = sensor_type
+        self.id = sensor_id
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = BACKOFF_MIN
+        self.retry_at = 0.0
+        self.last_value = None
+        self.last_ok_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if the sensor should be read now (closed, or due a half-open trial)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self.retry_at:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, value) -> None:
+        """Outcome of a read that allow() let through; None is a failure."""
+        with self._lock:
+            if value is not None:
+                if self.state != CLOSED:
+                    logger.info("%s is back after %d failed reads", self.id, self.failures)
+                self.state = CLOSED
+                self.failures = 0
+                self.backoff = BACKOFF_MIN
+                self.last_value = value
+                self.last_ok_at = time.monotonic()
+                self._trial = False
+                return
+
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+                self._open()
+            elif self.state == CLOSED and self.failures >= FAILURE_THRESHOLD:
+                _TRIPS.inc(type=self.type, sensor=self.id)
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._trial = False
+        self.retry_at = time.monotonic() + self.backoff
+        logger.warning("%s unavailable after %d failed reads — skipping it, next try in %.0fs",
+                       self.id, self.failures, self.backoff)
+
+    def payload(self, value) -> dict:
+        """
+        Sensor dict for this cycle. A fresh value is reported as before;
+        otherwise value is None and status says why: "stale" (this read
+        failed) or "unavailable" (not read while the breaker is open),
+        with the last good value and its age when there is one.
+        """
+        sensor = {"type": self.type, "id": self.id, "value": value}
+        if value is not None:
+            return sensor
+        with self._lock:
+            sensor["status"] = "unavailable" if self.state == OPEN else "stale"
+            if self.state == OPEN:
+                sensor["retry_in"] = max(0, round(self.retry_at - time.monotonic()))
+            if self.last_ok_at is not None:
+                sensor["last"] = self.last_value
+                sensor["age"] = round(time.monotonic() - self.last_ok_at)
+        return sensor
+
+# =============================
+# REGISTRY
+# =============================
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get(sensor_type: str, sensor_id: str) -> CircuitBreaker:
+    key = (sensor_type, sensor_id)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker(sensor_type, sensor_id))
+    return breaker
+
+
+def forget(sensor_type: str, sensor_id: str):
+    """Drop a removed sensor's breaker (it no longer counts as open)."""
+    with _registry_lock:
+        _breakers.pop((sensor_type, sensor_id), None)
+
+
+def payload(sensor_type: str, sensor_id: str, value) -> dict:
+    return get(sensor_type, sensor_id).payload(value)
+
+
+def _open_count() -> int:
+    return sum(1 for b in list(_breakers.values()) if b.state != CLOSED)
+
+
+metrics.gauge("sensor_breakers_open", "Sensors currently skipped by their circuit breaker", fn=_open_count)
@@ -0,0 +1,163 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict
+import metrics
+
+logger = logging.getLogger("bus")
+
+_LOCK_WAIT = metrics.histogram(
+    "bus_lock_wait_seconds", "Time spent waiting for a shared bus", ("bus",),
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+)
+
+# =============================
+# SHARED BUS
+# =============================
+
+class SharedBus:
+    """
+    Owns one physical bus and hands it out one transaction at a time.
+
+    The underlying bus object is created lazily on the first transaction.
+    The lock is re-entrant so a driver can nest transactions (e.g. a re-init
+    inside a failed read) without deadlocking itself.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], object]):
+        self.name = name
+        self._factory = factory
+        self._bus = None
+        self._lock = threading.RLock()
+
+        # Contention stats
+        self.transactions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _get(self):
+        if self._bus is None:
+            logger.info("Initializing bus %s", self.name)
+            self._bus = self._factory()
+        return self._bus
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the bus for the duration of the block:
+
+            with i2c_bus().transaction() as i2c:
+                sensor.lux
+        """
+        start = time.monotonic()
+        contended = not self._lock.acquire(blocking=False)
+        if contended:
+            self._lock.acquire()
+        waited = time.monotonic() - start
+
+        try:
+            self.transactions += 1
+            self.contended += contended
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            _LOCK_WAIT.observe(waited, bus=self.name)
+            yield self._get()
+        finally:
+            self._lock.release()
+
+    def reset(self):
+        """Release the bus so the next transaction re-creates it."""
+        with self._lock:
+            if self._bus is not None:
+                try:
+                    self._bus.deinit()
+                except Exception:
+                    pass
+                self._bus = None
+                logger.info("Bus %s released", self.name)
+
+    def stats(self) -> dict:
+        return {
+            "transactions": self.transactions,
+            "contended": self.contended,
+            "wait_total": round(self.wait_total, 4),
+            "wait_max": round(self.wait_max, 4),
+        }
+
+# =============================
+# RAW TRANSFERS
+# =============================
+# For drivers that talk to a chip at register level. busio requires its own
+# lock around every transfer, on top of the SharedBus transaction.
+
+def _locked(i2c, transfer):
+    while not i2c.try_lock():
+        time.sleep(0)
+    try:
+        return transfer()
+    finally:
+        i2c.unlock()
+
+
+def write_bytes(i2c, address: int, data: bytes):
+    _locked(i2c, lambda: i2c.writeto(address, bytes(data)))
+
+
+def read_bytes(i2c, address: int, length: int) -> bytearray:
+    buf = bytearray(length)
+    _locked(i2c, lambda: i2c.readfrom_into(address, buf))
+    return buf
+
+
+def write_then_read(i2c, address: int, data: bytes, length: int) -> bytearray:
+    buf = bytearray(length)
+    _locked(i2c, lambda: i2c.writeto_then_readfrom(address, bytes(data), buf))
+    return buf
+
+# =============================
+# REGISTRY
+# =============================
+
+_buses: Dict[str, SharedBus] = {}
+_registry_lock = threading.Lock()
+
+
+def _default_i2c():
+    import board
+    import busio
+    return busio.I2C(board.SCL, board.SDA)
+
+
+_FACTORIES: Dict[str, Callable[[], object]] = {
+    "i2c-1": _default_i2c,
+}
+
+
+def register(name: str, factory: Callable[[], object]):
+    """Register (or replace) the factory used to create a named bus."""
+    with _registry_lock:
+        _FACTORIES[name] = factory
+        _buses.pop(name, None)
+
+
+def get_bus(name: str) -> SharedBus:
+    with _registry_lock:
+        bus = _buses.get(name)
+        if bus is None:
+            if name not in _FACTORIES:
+                raise KeyError(f"Unknown bus '{name}'")
+            bus = SharedBus(name, _FACTORIES[name])
+            _buses[name] = bus
+        return bus
+
+
+def i2c_bus() -> SharedBus:
+    """The Pi's main I2C bus (SCL/SDA, /dev/i2c-1)."""
+    return get_bus("i2c-1")
+
+
+def all_stats() -> dict:
+    with _registry_lock:
+        return {name: bus.stats() for name, bus in _buses.items()}
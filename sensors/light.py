@@ -1,11 +1,15 @@
-import time
 import logging
-import board
-import busio
-import adafruit_bh1750
+from functools import partial
+from sensors import breaker, steps, topology
+from sensors.bh1750 import BH1750, MODES, MTREG_DEFAULT
+from sensors.topology import Route
+import metrics
 
 logger = logging.getLogger("light")
 
+_READ_SECONDS = metrics.histogram("sensor_read_seconds", "Time to read one sensor", ("type", "sensor"))
+_REINITS = metrics.counter("sensor_reinit_total", "Driver re-initialisations after a failure", ("driver",))
+
 # =============================
 # CONFIG
 # =============================
@@ -14,38 +18,80 @@ BH1750_POSSIBLE_ADDRESSES = [0x23, 0x5C]
 
 # Map sensor IDs to *preferred* address (used as a hint, not a hard requirement).
 # If the preferred address isn't found at boot, the other address is tried automatically.
+# More than two sensors need a TCA9548A multiplexer: give the branch as a dict,
+# or just the address if it is unambiguous (topology discovery finds the branch).
 
 LIGHT_SENSORS = {
     "light-sensor-001": 0x23,
     # "light-sensor-002": 0x5C # second sensor at alternate address
+    # "light-sensor-003": {"address": 0x23, "mux": 0x70, "mux_channel": 2},
+}
+
+# Measurement mode (see sensors.bh1750.MODES):
+#   "one_time_high"   - ~1 lx resolution, 120-180 ms per read, sensor idles between reads
+#   "continuous_low"  - 4 lx resolution, reads return the latest result immediately
+#   "continuous_high" - 1 lx resolution, result refreshed every ~120 ms, no wait per read
+BH1750_MODE = "one_time_high"
+
+# Per-sensor mode overrides, e.g. a sensor sampled fast for cloud detection
+BH1750_MODE_OVERRIDES = {
+    # "light-sensor-002": "continuous_low",
 }
 
+# Adjust the measurement time (MTreg) to the light level: short in direct sun
+# (no saturation, faster reads), long in deep shade (finer resolution)
+BH1750_AUTO_RANGE = True
+
 # =============================
 # GLOBAL STATE
 # =============================
 
-_i2c = None
-_sensors = {} # sensor_id -> adafruit_bh1750.BH1750 instance
-_addresses = {} # sensor_id -> int address actually used
+_sensors = {} # sensor_id -> sensors.bh1750.BH1750 instance
+_addresses = {} # sensor_id -> sensors.topology.Route actually used
+_settings = {} # sensor_id -> {"mode": str, "mtreg": int}, survives re-init
+_initialized = False
 
 # =============================
 # HELPERS
 # =============================
 
-def _probe_address(i2c, preferred: int) -> int | None:
+def _settings_for(sensor_id: str) -> dict:
+    """Mode and last MTreg for a sensor; defaults on first use."""
+    settings = _settings.get(sensor_id)
+    if settings is None:
+        mode = BH1750_MODE_OVERRIDES.get(sensor_id, BH1750_MODE)
+        settings = _settings[sensor_id] = {"mode": mode, "mtreg": MTREG_DEFAULT}
+    return settings
+
+
+def _preferred(config) -> Route:
+    """LIGHT_SENSORS entry (address or {"address", "mux", "mux_channel"}) as a Route."""
+    if isinstance(config, dict):
+        return Route(config["address"], config.get("mux"), config.get("mux_channel"))
+    return Route(config)
+
+
+def _probe_address(preferred: Route, settings: dict):
     """
-    Try the preferred address first, then the alternate.
-    Returns the first address that responds with a valid lux reading, or None.
+    Try the preferred address first, then the alternate (on the same mux
+    branch, if one was given).
+    Returns (route, sensor, lux) for the first address that responds with a
+    valid lux reading, or None. The probed driver instance is kept by the
+    caller, so a sensor is only constructed and read once.
     """
-    candidates = [preferred] + [a for a in BH1750_POSSIBLE_ADDRESSES if a != preferred]
+    bus = topology.get()
+    candidates = [preferred.address] + [a for a in BH1750_POSSIBLE_ADDRESSES if a != preferred.address]
     for addr in candidates:
+        route = bus.find(addr, preferred.mux, preferred.channel) or Route(addr, preferred.mux, preferred.channel)
         try:
-            sensor = adafruit_bh1750.BH1750(i2c, address=addr)
-            _ = sensor.lux  # will raise if nothing is at this address
-            logger.info(f"BH1750 responded at 0x{addr:02X} (preferred was 0x{preferred:02X})")
-            return addr
+            # The driver takes the bus per transfer, not across a conversion
+            sensor = BH1750(partial(bus.transaction, route), address=addr, mode=settings["mode"],
+                            mtreg=settings["mtreg"], auto_range=BH1750_AUTO_RANGE)
+            lux = sensor.lux  # will raise if nothing is at this address
+            logger.info("BH1750 responded at %s (preferred was %s)", route, preferred)
+            return route, sensor, lux
         except Exception:
-            logger.debug(f"No BH1750 at 0x{addr:02X}")
+            logger.debug("No BH1750 at %s", route)
     return None
 
 # =============================
@@ -57,38 +103,67 @@ def init():
     Initialize all configured BH1750 light sensors.
     Each sensor is probed at its preferred address first; if that fails the
     alternate address (0x23 <-> 0x5C) is tried automatically.
-    Call once at startup.
+    Called at startup, or lazily by the first read. The I2C bus itself is
+    created on first use by sensors.bus.
     """
-    global _i2c
+    global _initialized
+    _initialized = True
+
+    for sensor_id in LIGHT_SENSORS:
+        _init_sensor(sensor_id)
+
 
+def _init_sensor(sensor_id: str):
     try:
-        logger.info("Initializing I2C bus")
-        _i2c = busio.I2C(board.SCL, board.SDA)
-        time.sleep(0.2)
+        preferred = _preferred(LIGHT_SENSORS[sensor_id])
+        found = _probe_address(preferred, _settings_for(sensor_id))
+        if found is None:
+            logger.error("BH1750 %s not found at %s or alternate address", sensor_id, preferred)
+            return
+
+        route, sensor, lux = found
+        _sensors[sensor_id] = sensor
+        _addresses[sensor_id] = route
+        _remember(sensor_id, sensor)
+
+        if route.address != preferred.address:
+            logger.warning("BH1750 '%s' initialised at %s (preferred %s was unavailable)", sensor_id, route, preferred)
+        else:
+            logger.info("BH1750 '%s' initialised at %s, mode=%s, lux=%.1f",
+                        sensor_id, route, sensor.mode, lux)
+
     except Exception as e:
-        logger.exception(f"Failed to initialize I2C: {e}")
-        return
-    
-    for sensor_id, preferred_address in LIGHT_SENSORS.items():
-        try:
-            actual_address = _probe_address(_i2c, preferred_address)
-            if actual_address is None:
-                logger.error(f"BH1750 {sensor_id} not found at 0x{preferred_address:02X} or alternate address")
-                continue
+        logger.exception("Failed to initialize BH1750 '%s': %s", sensor_id, e)
 
+# =============================
+# RECONFIGURE (registry reload)
+# =============================
 
-            sensor = adafruit_bh1750.BH1750(_i2c, address=actual_address)
-            lux = sensor.lux  # test read
-            _sensors[sensor_id] = sensor
-            _addresses[sensor_id] = actual_address
+def configure(sensors: dict):
+    """
+    Replace LIGHT_SENSORS with `sensors`: removed sensors are dropped, new
+    or re-addressed ones are probed now; the rest are left untouched.
+    Re-addressed sensors keep their mode and MTreg.
+    Returns (added, removed, changed) sensor ids.
+    """
+    added = [s for s in sensors if s not in LIGHT_SENSORS]
+    removed = [s for s in LIGHT_SENSORS if s not in sensors]
+    changed = [s for s in sensors if s in LIGHT_SENSORS and sensors[s] != LIGHT_SENSORS[s]]
 
-            if actual_address != preferred_address:
-                logger.warning(f"BH1750 '{sensor_id}' initialised at 0x{actual_address:02X} " f"(preferred 0x{preferred_address:02X} was unavailable)")
-            else:
-                logger.info(f"BH1750 '{sensor_id}' initialised at 0x{actual_address:02X}, "f"lux={lux:.1f}")
- 
-        except Exception as e:
-            logger.exception(f"Failed to initialize BH1750 '{sensor_id}': {e}")
+    for sensor_id in removed + changed:
+        _sensors.pop(sensor_id, None)
+        _addresses.pop(sensor_id, None)
+    for sensor_id in removed:
+        _settings.pop(sensor_id, None)
+        breaker.forget("light", sensor_id)
+
+    LIGHT_SENSORS.clear()
+    LIGHT_SENSORS.update(sensors)
+
+    if _initialized:
+        for sensor_id in added + changed:
+            _init_sensor(sensor_id)
+    return added, removed, changed
 
 # =============================
 # RE-INIT (call after a read failure)
@@ -96,45 +171,83 @@ def init():
 def reinit_sensor(sensor_id: str) -> bool:
     """
     Attempt to re-initialise a single sensor after a failure.
+    The sensor keeps its mode and the MTreg auto-ranging last settled on.
     Returns True if successful.
     """
-    if _i2c is None:
-        logger.error("I2C bus not initialised — call init() first")
+    config = LIGHT_SENSORS.get(sensor_id)
+    if config is None:
+        logger.error("Unknown sensor_id '%s'", sensor_id)
         return False
  
-    preferred = LIGHT_SENSORS.get(sensor_id)
-    if preferred is None:
-        logger.error(f"Unknown sensor_id '{sensor_id}'")
-        return False
- 
-    logger.info(f"Re-probing BH1750 '{sensor_id}'...")
+    logger.info("Re-probing BH1750 '%s'...", sensor_id)
+    _REINITS.inc(driver="bh1750")
     try:
-        actual_address = _probe_address(_i2c, preferred)
-        if actual_address is None:
-            logger.error(f"BH1750 '{sensor_id}' not found during re-init")
+        found = _probe_address(_preferred(config), _settings_for(sensor_id))
+        if found is None:
+            logger.error("BH1750 '%s' not found during re-init", sensor_id)
             return False
  
-        sensor = adafruit_bh1750.BH1750(_i2c, address=actual_address)
-        _ = sensor.lux  # verify
+        route, sensor, _ = found
         _sensors[sensor_id] = sensor
-        _addresses[sensor_id] = actual_address
-        logger.info(f"BH1750 '{sensor_id}' re-initialised at 0x{actual_address:02X}")
+        _addresses[sensor_id] = route
+        _remember(sensor_id, sensor)
+        logger.info("BH1750 '%s' re-initialised at %s (mode=%s, MTreg=%d)",
+                    sensor_id, route, sensor.mode, sensor.mtreg)
         return True
     except Exception as e:
-        logger.exception(f"Re-init failed for BH1750 '{sensor_id}': {e}")
+        logger.exception("Re-init failed for BH1750 '%s': %s", sensor_id, e)
         return False
 
 
+# =============================
+# MODE
+# =============================
+
+def _remember(sensor_id: str, sensor: BH1750):
+    settings = _settings_for(sensor_id)
+    settings["mode"] = sensor.mode
+    settings["mtreg"] = sensor.mtreg
+
+
+def set_mode(sensor_id: str, mode: str) -> bool:
+    """
+    Switch a sensor's measurement mode at runtime. The choice is kept for
+    later re-inits (until restart; BH1750_MODE applies again at boot).
+    """
+    if sensor_id not in LIGHT_SENSORS:
+        logger.error("Unknown sensor_id '%s'", sensor_id)
+        return False
+    if mode not in MODES:
+        logger.error("Unknown BH1750 mode '%s' (expected one of %s)", mode, ", ".join(MODES))
+        return False
+
+    _settings_for(sensor_id)["mode"] = mode
+    sensor = _sensors.get(sensor_id)
+    if sensor is not None:
+        try:
+            sensor.configure(mode=mode)
+        except Exception as e:
+            logger.warning("BH1750 '%s' mode change failed: %s — applied at next re-init", sensor_id, e)
+            return False
+    logger.info("BH1750 '%s' mode set to %s", sensor_id, mode)
+    return True
+
 # =============================
 # Read all light (for API)
 # =============================
 
 def read_all_light():
     """Returns a list of sensor payloads for all configured light sensors."""
-    return [
-        {"type": "light", "id": sensor_id, "value": read_light(sensor_id)}
-        for sensor_id in LIGHT_SENSORS
-    ]
+    if not _initialized:
+        init()
+    return [breaker.payload("light", sensor_id, read_light(sensor_id)) for sensor_id in LIGHT_SENSORS]
+
+
+async def read_all_light_async():
+    """read_all_light() for the asyncio runtime."""
+    if not _initialized:
+        init()
+    return [breaker.payload("light", sensor_id, await read_light_async(sensor_id)) for sensor_id in LIGHT_SENSORS]
 
 
 # =============================
@@ -144,27 +257,53 @@ def read_all_light():
 def read_light(sensor_id: str) -> float | None:
     """
     Read light level in lux. Returns float lux or None on failure.
-    Automatically attempts one re-init if the read fails.
+    Automatically attempts one re-init if the read fails. While the
+    sensor's circuit breaker is open it is not touched at all.
+    """
+    guard = breaker.get("light", sensor_id)
+    if not guard.allow():
+        return None
+    result = steps.run(_read_light(sensor_id))
+    guard.record(result)
+    return result
+
+
+async def read_light_async(sensor_id: str) -> float | None:
     """
+    read_light() for the asyncio runtime: the conversion time is awaited
+    instead of slept, and a re-init after a failure runs in the executor.
+    """
+    guard = breaker.get("light", sensor_id)
+    if not guard.allow():
+        return None
+    result = await steps.run_async(_read_light(sensor_id))
+    guard.record(result)
+    return result
+
+
+def _read_light(sensor_id: str):
+    """One read with a re-init and retry on failure; yields the conversion waits."""
     sensor = _sensors.get(sensor_id)
     if sensor is None:
-        logger.warning(f"BH1750 '{sensor_id}' not initialised — attempting re-init")
-        if not reinit_sensor(sensor_id):
+        logger.warning("BH1750 '%s' not initialised — attempting re-init", sensor_id)
+        if not (yield steps.Blocking(reinit_sensor, sensor_id)):
             return None
         sensor = _sensors[sensor_id]
- 
+
     try:
-        result = round(float(sensor.lux), 1)
-        logger.info(f"{sensor_id} @ 0x{_addresses[sensor_id]:02X}: {result} lux")
+        with _READ_SECONDS.time(type="light", sensor=sensor_id):
+            result = round(float((yield from sensor.lux_steps())), 1)
+        _remember(sensor_id, sensor)
+        logger.debug("%s @ %s: %s lux (MTreg %d)", sensor_id, _addresses[sensor_id], result, sensor.mtreg)
         return result
     except Exception as e:
-        logger.warning(f"Read failed for BH1750 '{sensor_id}': {e} — attempting re-init")
-        if reinit_sensor(sensor_id):
+        logger.warning("Read failed for BH1750 '%s': %s — attempting re-init", sensor_id, e)
+        # Re-probing sleeps through test reads, so the asyncio runtime runs it off the loop
+        if (yield steps.Blocking(reinit_sensor, sensor_id)):
             try:
-                result = round(float(_sensors[sensor_id].lux), 1)
-                logger.info(f"{sensor_id} (recovered): {result} lux")
+                result = round(float((yield from _sensors[sensor_id].lux_steps())), 1)
+                logger.info("%s (recovered): %s lux", sensor_id, result)
                 return result
             except Exception as e2:
-                logger.exception(f"BH1750 '{sensor_id}' still failing after re-init: {e2}")
+                logger.exception("BH1750 '%s' still failing after re-init: %s", sensor_id, e2)
         return None
- 
\ No newline at end of file
@@ -1,13 +1,16 @@
 import logging
 import time
-import board
-import busio
-import digitalio
-from adafruit_ads1x15.ads1115 import ADS1115, P0, P1, P2, P3
-from adafruit_ads1x15.analog_in import AnalogIn
+from functools import partial
+from sensors import breaker, steps, topology
+from sensors.ads1115 import ADS1115
+from sensors.topology import Route
+import metrics
 
 logger = logging.getLogger("moisture")
 
+_READ_SECONDS = metrics.histogram("sensor_read_seconds", "Time to read one sensor", ("type", "sensor"))
+_REINITS = metrics.counter("sensor_reinit_total", "Driver re-initialisations after a failure", ("driver",))
+
 # =============================
 # GPIO Power Pin Setup
 # =============================
@@ -17,94 +20,359 @@ logger = logging.getLogger("moisture")
 #power_pin.value = False  # Start with sensor OFF
 
 # =============================
-# I2C & ADC setup (ONE TIME)
+# ADC setup
 # =============================
-i2c = busio.I2C(board.SCL, board.SDA)
+# The I2C bus itself is owned by sensors.bus and shared with the BH1750s.
+# ADCs are driven at register level (sensors.ads1115) and may sit behind
+# TCA9548A multiplexers (sensors.topology). Driver modules (board,
+# digitalio) are imported on first use so importing this module touches
+# no hardware.
 
-# Map channel numbers to ADS1115 pin constants
-CHANNEL_MAP = {0: P0, 1: P1, 2: P2, 3: P3}
+# ADC settings
+ADS_GAIN = 1            # +/-4.096 V full scale
+ADS_DATA_RATE = 860     # samples/s (8-860); higher = shorter conversion
+ADS_DEFAULT_ADDRESS = 0x48
+SETTLE_SECONDS = 0.2    # probe power-up settle time
+BATCH_SCAN = True       # power all probes together and share one settle
+OVERSAMPLE = 1          # readings averaged per probe (1 = single shot)
 
 # =============================
 # Probe configuration
-# Each probe has its own power GPIO pin and ADC channel
+# Each probe has a power GPIO pin (board pin name) and an ADC channel.
+# Optional keys for more than four probes:
+#   "adc":         ADS1115 address (0x48-0x4B, default 0x48)
+#   "mux", "mux_channel": TCA9548A address and branch in front of the ADC,
+#                  only needed when the same ADC address sits on several
+#                  branches (otherwise found by topology discovery)
+# Probes may share a power pin (e.g. one MOSFET per ADC).
 # =============================
 SOIL_PROBES = {
-    "soil-sensor-001": {"channel": 0, "power_pin": board.D27, "dry": 2.48, "wet": 1.00},
-    "soil-sensor-002": {"channel": 1, "power_pin": board.D26, "dry": 2.48, "wet": 1.00},
-    # "soil-sensor-003": {"channel": 2, "power_pin": board.D23, "dry": 2.48, "wet": 1.00},
-    # "soil-sensor-004": {"channel": 3, "power_pin": board.D24, "dry": 2.48, "wet": 1.00},
+    "soil-sensor-001": {"channel": 0, "power_pin": "D27", "dry": 2.48, "wet": 1.00},
+    "soil-sensor-002": {"channel": 1, "power_pin": "D26", "dry": 2.48, "wet": 1.00},
+    # "soil-sensor-003": {"channel": 2, "power_pin": "D23", "dry": 2.48, "wet": 1.00},
+    # "soil-sensor-004": {"channel": 3, "power_pin": "D24", "dry": 2.48, "wet": 1.00},
+    # "soil-sensor-005": {"channel": 0, "power_pin": "D25", "adc": 0x49, "dry": 2.48, "wet": 1.00},
+    # "soil-sensor-009": {"channel": 0, "power_pin": "D5", "adc": 0x48, "mux": 0x70, "mux_channel": 1,
+    #                     "dry": 2.48, "wet": 1.00},
 }
 
 # =============================
 # Initialise power pins
 # =============================
-_power_pins = {}
-for probe_id, cfg in SOIL_PROBES.items():
+_power_pins = {}  # probe_id -> DigitalInOut
+_pins_by_name = {}  # board pin name -> DigitalInOut, shared between probes
+_initialized = False
+
+def init():
+    """
+    Configure the power pin of every probe in SOIL_PROBES (all OFF).
+    Called at startup, or lazily by the first read.
+    """
+    global _initialized
+    import board
+    import digitalio
+
+    _initialized = True
+    for probe_id, cfg in SOIL_PROBES.items():
+        if probe_id in _power_pins:
+            continue
+        try:
+            pin = _pins_by_name.get(cfg["power_pin"])
+            if pin is None:
+                pin = digitalio.DigitalInOut(getattr(board, cfg["power_pin"]))
+                pin.direction = digitalio.Direction.OUTPUT
+                pin.value = False  # Start OFF
+                _pins_by_name[cfg["power_pin"]] = pin
+            _power_pins[probe_id] = pin
+            logger.info(f"Initialised power pin for {probe_id}")
+        except Exception as e:
+            logger.error("Failed to init power pin for %s: %s", probe_id, e)
+
+# =============================
+# Reconfigure (registry reload)
+# =============================
+
+def _wiring(cfg: dict) -> tuple:
+    return cfg["power_pin"], cfg.get("adc", ADS_DEFAULT_ADDRESS), cfg.get("mux"), cfg.get("mux_channel")
+
+
+def configure(probes: dict):
+    """
+    Replace SOIL_PROBES with `probes`, touching only the difference: removed
+    probes drop their route and power pin (the pin is switched off and
+    released once no other probe shares it), rewired probes are set up
+    again, and channel or calibration changes apply from the next read.
+    Returns (added, removed, changed) probe ids.
+    """
+    added = [p for p in probes if p not in SOIL_PROBES]
+    removed = [p for p in SOIL_PROBES if p not in probes]
+    changed = [p for p in probes if p in SOIL_PROBES and probes[p] != SOIL_PROBES[p]]
+
+    for probe_id in removed + [p for p in changed if _wiring(probes[p]) != _wiring(SOIL_PROBES[p])]:
+        _power_pins.pop(probe_id, None)
+        _routes.pop(probe_id, None)
+    for probe_id in removed:
+        breaker.forget("moisture", probe_id)
+
+    SOIL_PROBES.clear()
+    SOIL_PROBES.update(probes)
+
+    in_use = {cfg["power_pin"] for cfg in SOIL_PROBES.values()}
+    for name in [n for n in _pins_by_name if n not in in_use]:
+        pin = _pins_by_name.pop(name)
+        try:
+            pin.value = False
+            pin.deinit()
+        except Exception as e:
+            logger.warning("Failed to release power pin %s: %s", name, e)
+    for route in [r for r in _adcs if r not in _routes.values()]:
+        del _adcs[route]
+
+    if _initialized:
+        init()
+    return added, removed, changed
+
+# =============================
+# ADCs (created once per route, reused)
+# =============================
+_adcs = {}  # Route -> ADS1115
+_routes = {}  # probe_id -> Route
+
+
+def _route(probe_id: str) -> Route:
+    """Where a probe's ADC sits, resolved against the discovered topology once."""
+    route = _routes.get(probe_id)
+    if route is None:
+        cfg = SOIL_PROBES[probe_id]
+        address = cfg.get("adc", ADS_DEFAULT_ADDRESS)
+        route = (topology.get().find(address, cfg.get("mux"), cfg.get("mux_channel"))
+                 or Route(address, cfg.get("mux"), cfg.get("mux_channel")))
+        _routes[probe_id] = route
+    return route
+
+
+def _adc(route: Route) -> ADS1115:
+    adc = _adcs.get(route)
+    if adc is None:
+        adc = ADS1115(partial(topology.get().transaction, route), address=route.address,
+                      gain=ADS_GAIN, data_rate=ADS_DATA_RATE)
+        _adcs[route] = adc
+        logger.info("ADS1115 %s initialised (gain=%s, data_rate=%s)", route, ADS_GAIN, ADS_DATA_RATE)
+    return adc
+
+
+def _reset_adc(route: Route):
+    """Drop a cached ADC so the next read rebuilds it (after an I2C error)."""
+    _adcs.pop(route, None)
+    _REINITS.inc(driver="ads1115")
+
+# =============================
+# CONVERSION ROUNDS
+# =============================
+# A conversion takes ~1.2 ms at 860 SPS, during which the bus is idle. Each
+# round starts one conversion on every ADC (grouped by mux branch), waits a
+# single conversion time, then fetches all results, so a scan needs as many
+# rounds as the busiest ADC has probes, not one per probe. The generators
+# below yield the seconds to wait for sensors.steps to sleep or await.
+
+def _conversions(probe_ids: list, voltages: dict):
+    """Fill voltages[probe_id] with the mean of OVERSAMPLE conversions."""
+    samples = max(1, OVERSAMPLE)
+    queues = {}  # Route -> [probe_id, ...] in channel order
+    for probe_id in sorted(probe_ids, key=lambda p: SOIL_PROBES[p]["channel"]):
+        queues.setdefault(_route(probe_id), []).append(probe_id)
+    routes = sorted(queues, key=lambda r: (r.branch, r.address))
+    sums = {probe_id: 0.0 for probe_id in probe_ids}
+    started_at = {}
+    failed = set()
+
+    rounds = max((len(q) for q in queues.values()), default=0) * samples
+    for i in range(rounds):
+        batch = []
+        for route in routes:
+            queue = queues[route]
+            if i // samples >= len(queue):
+                continue
+            probe_id = queue[i // samples]
+            if probe_id in failed:
+                continue
+            try:
+                adc = _adc(route)
+                started_at.setdefault(probe_id, time.monotonic())
+                adc.start(SOIL_PROBES[probe_id]["channel"])
+                batch.append((route, probe_id, adc))
+            except Exception as e:
+                failed.add(probe_id)
+                _failed(route, probe_id, e)
+
+        if not batch:
+            continue
+        yield max(adc.conversion_time for _, _, adc in batch)
+
+        # Reverse order: the last branch selected is fetched first
+        for route, probe_id, adc in reversed(batch):
+            try:
+                sums[probe_id] += adc.fetch()
+            except Exception as e:
+                failed.add(probe_id)
+                _failed(route, probe_id, e)
+                continue
+            if i % samples == samples - 1:
+                voltages[probe_id] = sums[probe_id] / samples
+                _READ_SECONDS.observe(time.monotonic() - started_at[probe_id], type="moisture", sensor=probe_id)
+                logger.debug("RAW: %s V=%.3f (n=%d, adc %s)", probe_id, voltages[probe_id], samples, route)
+
+
+def _failed(route: Route, probe_id: str, error: Exception):
+    _reset_adc(route)
+    logger.error("Error reading %s (ADS1115 %s): %s", probe_id, route, error)
+
+
+def _powered(pins: list, probe_ids: list, voltages: dict):
+    """Power the probes, yield the settle time, run the conversion rounds, power off."""
     try:
-        pin = digitalio.DigitalInOut(cfg["power_pin"])
-        pin.direction = digitalio.Direction.OUTPUT
-        pin.value = False  # Start OFF
-        _power_pins[probe_id] = pin
-        logger.info(f"Initialised power pin for {probe_id}")
-    except Exception as e:
-        logger.error(f"Failed to init power pin for {probe_id}: {e}")
+        for pin in pins:
+            pin.value = True
+        yield SETTLE_SECONDS
+        yield from _conversions(probe_ids, voltages)
+    finally:
+        for pin in pins:
+            pin.value = False
+
+
+def _to_percent(probe_id: str, voltage: float) -> float:
+    cfg = SOIL_PROBES[probe_id]
+
+    # Clamp and convert
+    voltage = min(max(voltage, cfg["wet"]), cfg["dry"])
+    percent = ((cfg["dry"] - voltage) / (cfg["dry"] - cfg["wet"])) * 100
+    percent = round(percent, 1)
+
+    logger.debug(
+        "%s: %s%% (V=%.3f, dry=%s, wet=%s)", probe_id, percent, voltage, cfg["dry"], cfg["wet"]
+    )
+    return percent
 
 # =============================
 # Read all probes (for API)
 # =============================
 def read_all_moisture():
     """Returns a list of sensor payloads for all configured probes."""
-    return [
-        {"type": "moisture", "id": probe_id, "value": read_moisture(probe_id)}
-        for probe_id in SOIL_PROBES
-    ]
+    if BATCH_SCAN:
+        values = scan_moisture()
+    else:
+        values = {probe_id: read_moisture(probe_id) for probe_id in SOIL_PROBES}
+    return _payloads(values)
+
+
+async def read_all_moisture_async():
+    """read_all_moisture() for the asyncio runtime: settle times are awaited."""
+    if BATCH_SCAN:
+        values = await scan_moisture_async()
+    else:
+        values = {probe_id: await read_moisture_async(probe_id) for probe_id in SOIL_PROBES}
+    return _payloads(values)
+
+
+def _payloads(values: dict) -> list:
+    return [breaker.payload("moisture", probe_id, values.get(probe_id)) for probe_id in SOIL_PROBES]
 
 # =============================
 # Public API
 # =============================
-def read_moisture(probe_id: str):
+def scan_moisture() -> dict:
     """
-    Powers on the sensor, waits 200ms, reads moisture, powers off.
-    Returns moisture percentage or None on error.
+    Batched scan: powers every configured probe at once, waits one shared
+    settle period, then reads all ADCs in parallel rounds and powers off.
+    Probes whose circuit breaker is open are left out.
+    Returns {probe_id: percent or None}.
     """
-    try:
-        if probe_id not in SOIL_PROBES:
-            logger.warning(f"Unknown soil probe: {probe_id}")
-            return None
+    values, pins = _scan_pins()
+    if pins:
+        voltages = {}
+        steps.run(_powered(_unique(pins.values()), list(pins), voltages))
+        _scan_values(pins, voltages, values)
+    return values
 
-        cfg = SOIL_PROBES[probe_id]
-        pin = _power_pins.get(probe_id)
 
+async def scan_moisture_async() -> dict:
+    """scan_moisture() with the settle period and conversions awaited."""
+    values, pins = _scan_pins()
+    if pins:
+        voltages = {}
+        await steps.run_async(_powered(_unique(pins.values()), list(pins), voltages))
+        _scan_values(pins, voltages, values)
+    return values
+
+
+def _scan_pins():
+    """Empty result dict and the power pins of every probe due a read."""
+    if not _initialized:
+        init()
+
+    values = {probe_id: None for probe_id in SOIL_PROBES}
+    pins = {}
+    for probe_id in SOIL_PROBES:
+        pin = _power_pins.get(probe_id)
         if pin is None:
-            logger.error(f"No power pin available for {probe_id}")
-            return None
-
-        # Power on the sensor
-        pin.value = True
-        time.sleep(0.2) 
-
-        # Re-init ADC and channel after power cycle
-        ads = ADS1115(i2c)
-        ads.gain = 1
-        channel = AnalogIn(ads, CHANNEL_MAP[cfg["channel"]])
-        voltage = channel.voltage
-        logger.info(f"RAW: {channel.value}, V={voltage:.3f}")
-
-        # --- Power OFF ---
-        pin.value = False
-
-        # Clamp and convert
-        voltage = min(max(voltage, cfg["wet"]), cfg["dry"])
-        percent = ((cfg["dry"] - voltage) / (cfg["dry"] - cfg["wet"])) * 100
-        percent = round(percent, 1)
-
-        logger.info(
-            f"{probe_id}: {percent}% (V={voltage:.3f}, dry={cfg['dry']}, wet={cfg['wet']})"
-        )
-
-        return percent
-
-    except Exception as e:
-        pin.value = False
-        logger.error(f"Error reading {probe_id}: {e}")
-        return None
\ No newline at end of file
+            logger.error("No power pin available for %s", probe_id)
+        elif breaker.get("moisture", probe_id).allow():
+            pins[probe_id] = pin
+    return values, pins
+
+
+def _unique(pins) -> list:
+    return list({id(pin): pin for pin in pins}.values())
+
+
+def _scan_values(pins: dict, voltages: dict, values: dict):
+    for probe_id in pins:
+        values[probe_id] = _probe_value(probe_id, voltages)
+
+
+def read_moisture(probe_id: str):
+    """
+    Powers on the sensor, waits for it to settle, reads moisture, powers off.
+    Returns moisture percentage or None on error (or while the probe's
+    circuit breaker is open).
+    """
+    pin = _probe_pin(probe_id)
+    if pin is None:
+        return None
+
+    voltages = {}
+    steps.run(_powered([pin], [probe_id], voltages))
+    return _probe_value(probe_id, voltages)
+
+
+async def read_moisture_async(probe_id: str):
+    """read_moisture() with the settle time awaited."""
+    pin = _probe_pin(probe_id)
+    if pin is None:
+        return None
+
+    voltages = {}
+    await steps.run_async(_powered([pin], [probe_id], voltages))
+    return _probe_value(probe_id, voltages)
+
+
+def _probe_value(probe_id: str, voltages: dict):
+    voltage = voltages.get(probe_id)
+    value = None if voltage is None else _to_percent(probe_id, voltage)
+    breaker.get("moisture", probe_id).record(value)
+    return value
+
+
+def _probe_pin(probe_id: str):
+    if not _initialized:
+        init()
+
+    if probe_id not in SOIL_PROBES:
+        logger.warning("Unknown soil probe: %s", probe_id)
+        return None
+
+    pin = _power_pins.get(probe_id)
+    if pin is None:
+        logger.error("No power pin available for %s", probe_id)
+        return None
+    return pin if breaker.get("moisture", probe_id).allow() else None
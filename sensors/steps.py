@@ -0,0 +1,66 @@
+import time
+import asyncio
+
+# =============================
+# STEP RUNNERS
+# =============================
+# Drivers that wait on hardware (conversion times, settle times, polling)
+# write the read as a generator that yields the seconds to wait and returns
+# the result. run() sleeps the waits for the threads runtime, run_async()
+# awaits them for the asyncio runtime, so one body serves both.
+#
+# A step that blocks in the kernel or on the bus for longer than a transfer
+# (a w1_slave read, a driver re-probe) is yielded as Blocking(fn, *args)
+# instead: run() calls it inline, run_async() in the loop's default
+# executor, and its result (or exception) is sent back into the generator.
+
+class Blocking:
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __call__(self):
+        return self.fn(*self.args)
+
+
+def run(steps):
+    resume, value = steps.send, None
+    try:
+        while True:
+            try:
+                step = resume(value)
+            except StopIteration as done:
+                return done.value
+            resume, value = steps.send, None
+            if isinstance(step, Blocking):
+                try:
+                    value = step()
+                except Exception as e:
+                    resume, value = steps.throw, e
+            else:
+                time.sleep(step)
+    finally:
+        steps.close()
+
+
+async def run_async(steps):
+    loop = asyncio.get_running_loop()
+    resume, value = steps.send, None
+    try:
+        while True:
+            try:
+                step = resume(value)
+            except StopIteration as done:
+                return done.value
+            resume, value = steps.send, None
+            if isinstance(step, Blocking):
+                try:
+                    value = await loop.run_in_executor(None, step)
+                except Exception as e:
+                    resume, value = steps.throw, e
+            else:
+                await asyncio.sleep(step)
+    finally:
+        steps.close()
@@ -2,10 +2,14 @@ import glob
 import time
 import os
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+from sensors import breaker, steps
+import metrics
 
 logger = logging.getLogger("temperature")
 
+_READ_SECONDS = metrics.histogram("sensor_read_seconds", "Time to read one sensor", ("type", "sensor"))
+
 # =============================
 # GLOBAL STATE
 # =============================
@@ -14,17 +18,35 @@ BASE_DIR = "/sys/bus/w1/devices/"
 SENSORS: Dict[str, str] = {}
 _initialized = False
 
+# Bulk conversion via w1_bus_master*/therm_bulk_read (Linux >= 5.10).
+# One write starts a simultaneous conversion on every probe of that master,
+# so a full read costs one conversion time regardless of probe count.
+USE_BULK_READ = True
+BULK_CONVERSION_TIMEOUT = 1.0   # seconds (12-bit conversion is 750 ms)
+BULK_POLL_INTERVAL = 0.05       # seconds
+
+# A master whose bulk conversion fails breaker.FAILURE_THRESHOLD times in a
+# row falls back to per-probe reads; bulk mode is retried after the
+# breaker's backoff instead of staying off until the next init().
+_bulk_masters: Dict[str, List[str]] = {}  # therm_bulk_read path -> [probe_id]
+_bulk_guards: Dict[str, breaker.CircuitBreaker] = {}  # therm_bulk_read path -> breaker
+
 # =============================
 # Init / Detect (call once)
 # =============================
 
-def init():
+def init(base_dir: Optional[str] = None):
     """
     Scan system for DS18B20 devices and cache them.
     Call ONCE at startup from main.py.
+    base_dir overrides the sysfs root (e.g. a fake tree for testing).
     """
-    global _initialized
+    global _initialized, BASE_DIR
+    if base_dir is not None:
+        BASE_DIR = base_dir
     SENSORS.clear()
+    _bulk_masters.clear()
+    _bulk_guards.clear()
 
     devices = glob.glob(os.path.join(BASE_DIR, "28-*"))
 
@@ -39,18 +61,154 @@ def init():
         SENSORS[probe_id] = device_file
         logger.info(f"🌡️ Detected DS18B20: {probe_id} -> {device}")
 
+    if USE_BULK_READ:
+        _detect_bulk_masters()
+
     logger.info(f"🌡️ Temperature sensors ready: {len(SENSORS)}")
     _initialized = True
+
+
+def rescan() -> tuple:
+    """
+    Pick up DS18B20s plugged in or removed since init(). Probes still
+    present keep their ids; new ones take the lowest free number.
+    Returns (added, removed) probe ids.
+    """
+    files = {os.path.join(device, "w1_slave") for device in glob.glob(os.path.join(BASE_DIR, "28-*"))}
+    removed = [probe_id for probe_id, device_file in SENSORS.items() if device_file not in files]
+    for probe_id in removed:
+        del SENSORS[probe_id]
+        breaker.forget("temperature", probe_id)
+
+    added = []
+    for device_file in sorted(files - set(SENSORS.values())):
+        idx = 1
+        while f"temp-sensor-{idx:03d}" in SENSORS:
+            idx += 1
+        probe_id = f"temp-sensor-{idx:03d}"
+        SENSORS[probe_id] = device_file
+        added.append(probe_id)
+        logger.info(f"🌡️ Detected DS18B20: {probe_id} -> {os.path.dirname(device_file)}")
+
+    if added or removed:
+        _bulk_masters.clear()
+        if USE_BULK_READ:
+            _detect_bulk_masters()
+    return added, removed
+
+
+def _detect_bulk_masters():
+    """Group detected probes by the bus master that can bulk-convert them."""
+    for master in sorted(glob.glob(os.path.join(BASE_DIR, "w1_bus_master*"))):
+        bulk_file = os.path.join(master, "therm_bulk_read")
+        if not os.path.exists(bulk_file):
+            continue
+
+        probes = [
+            probe_id for probe_id, device_file in SENSORS.items()
+            if os.path.exists(os.path.join(master, os.path.basename(os.path.dirname(device_file))))
+        ]
+        if probes:
+            _bulk_masters[bulk_file] = probes
+            if bulk_file not in _bulk_guards:
+                _bulk_guards[bulk_file] = breaker.CircuitBreaker("temperature_bulk", os.path.basename(master))
+            logger.info(f"🌡️ Bulk conversion available on {os.path.basename(master)} ({len(probes)} probes)")
+
+    if not _bulk_masters:
+        logger.info("🌡️ therm_bulk_read not available — using per-probe reads")
+
+# =============================
+# Bulk conversion
+# =============================
+
+def _bulk_convert(bulk_file: str):
+    """
+    Trigger a simultaneous conversion on every probe of one bus master and
+    poll until the kernel reports it finished, yielding the poll interval
+    (see sensors.steps). Returns False if bulk reads are not usable
+    (missing file, permissions, timeout).
+    """
+    try:
+        _bulk_trigger(bulk_file)
+
+        deadline = time.monotonic() + BULK_CONVERSION_TIMEOUT
+        while True:
+            if _bulk_done(bulk_file):
+                return True
+            if time.monotonic() >= deadline:
+                logger.warning("Bulk conversion timed out on %s", bulk_file)
+                return False
+            yield BULK_POLL_INTERVAL
+    except OSError as e:
+        logger.warning("Bulk conversion unavailable (%s): %s", bulk_file, e)
+        return False
+
+
+def _bulk_trigger(bulk_file: str):
+    with open(bulk_file, "w") as f:
+        f.write("trigger\n")
+
+
+def _bulk_done(bulk_file: str) -> bool:
+    with open(bulk_file, "r") as f:
+        state = f.read().strip()
+    # -1 = conversion still in progress on at least one probe
+    return state != "-1"
+
 # =============================
 # Read all temperatures (for API)
 # =============================
 
 def read_all_temperatures():
-    """Returns a list of sensor payloads for all detected DS18B20 probes."""
-    return [
-        {"type": "temperature", "id": probe_id, "value": read_temperature(probe_id)}
-        for probe_id in SENSORS
-    ]
+    """
+    Returns a list of sensor payloads for all detected DS18B20 probes.
+    Probes behind a bulk-capable bus master are converted together and read
+    in one pass; the rest fall back to the per-probe path. Probes whose
+    circuit breaker is open are skipped.
+    """
+    return steps.run(_read_all())
+
+
+async def read_all_temperatures_async():
+    """
+    read_all_temperatures() for the asyncio runtime. The bulk conversion
+    is awaited; the per-probe fallback path reads w1_slave, which blocks in
+    the kernel for the conversion, so bulk reads matter more here.
+    """
+    return await steps.run_async(_read_all())
+
+
+def _read_all():
+    due = _due()
+    values = {}
+
+    for bulk_file, probe_ids in list(_bulk_masters.items()):
+        if not any(probe_id in due for probe_id in probe_ids):
+            continue
+        guard = _bulk_guards[bulk_file]
+        if not guard.allow():
+            continue
+        converted = yield from _bulk_convert(bulk_file)
+        # Timeout / older kernel / no permission: per-probe reads this cycle
+        guard.record(True if converted else None)
+        if not converted:
+            continue
+        values.update((yield steps.Blocking(_read_devices, [p for p in probe_ids if p in due])))
+
+    for probe_id in due:
+        if probe_id not in values:
+            values[probe_id] = yield from _read_probe(probe_id)
+    return _payloads(due, values)
+
+
+def _due() -> List[str]:
+    return [probe_id for probe_id in SENSORS if breaker.get("temperature", probe_id).allow()]
+
+
+def _payloads(due: List[str], values: dict) -> list:
+    for probe_id in due:
+        breaker.get("temperature", probe_id).record(values.get(probe_id))
+    return [breaker.payload("temperature", probe_id, values.get(probe_id)) for probe_id in SENSORS]
 
 # =============================
 # Read temperature
@@ -61,6 +219,27 @@ def read_temperature(probe_id: Optional[str] = None) -> Optional[float]:
     Read temperature from a detected DS18B20.
     If probe_id is None, read first detected sensor.
     """
+    return steps.run(_read_probe(probe_id))
+
+
+async def read_temperature_async(probe_id: Optional[str] = None) -> Optional[float]:
+    """read_temperature() with the conversion time awaited."""
+    return await steps.run_async(_read_probe(probe_id))
+
+
+def _read_probe(probe_id: Optional[str]):
+    probe_id = _resolve_probe(probe_id)
+    if probe_id is None:
+        return None
+
+    # Give sensor time
+    yield 0.75
+    # A w1_slave read blocks in the kernel (for the whole conversion unless
+    # a bulk conversion ran), so the asyncio runtime does it off the loop
+    return (yield steps.Blocking(_read_device, probe_id))
+
+
+def _resolve_probe(probe_id: Optional[str]) -> Optional[str]:
     if not _initialized:
         logger.error("Temperature sensors not initialized. Call temperature.init() first.")
         return None
@@ -73,31 +252,42 @@ def read_temperature(probe_id: Optional[str] = None) -> Optional[float]:
 
     device_file = SENSORS.get(probe_id)
     if not device_file or not os.path.exists(device_file):
-        logger.warning(f"DS18B20 device missing for {probe_id}")
+        logger.warning("DS18B20 device missing for %s", probe_id)
         return None
+    return probe_id
 
-    try:
-        # Give sensor time
-        time.sleep(0.75)
 
-        with open(device_file, "r") as f:
-            lines = f.readlines()
+def _read_devices(probe_ids: List[str]) -> Dict[str, Optional[float]]:
+    return {probe_id: _read_device(probe_id) for probe_id in probe_ids}
+
+
+def _read_device(probe_id: str) -> Optional[float]:
+    """Read and parse one w1_slave file (conversion already done)."""
+    device_file = SENSORS.get(probe_id)
+    if not device_file or not os.path.exists(device_file):
+        logger.warning("DS18B20 device missing for %s", probe_id)
+        return None
+
+    try:
+        with _READ_SECONDS.time(type="temperature", sensor=probe_id):
+            with open(device_file, "r") as f:
+                lines = f.readlines()
 
         if not lines[0].strip().endswith("YES"):
-            logger.warning(f"DS18B20 CRC check failed for {probe_id}")
+            logger.warning("DS18B20 CRC check failed for %s", probe_id)
             return None
 
         pos = lines[1].find("t=")
         if pos == -1:
-            logger.warning(f"Invalid DS18B20 data for {probe_id}")
+            logger.warning("Invalid DS18B20 data for %s", probe_id)
             return None
 
         temp_c = float(lines[1][pos + 2:]) / 1000.0
         result = round(temp_c, 1)
 
-        logger.info(f"{probe_id}: {result}°C")
+        logger.debug("%s: %s°C", probe_id, result)
         return result
 
     except Exception as e:
-        logger.error(f"Error reading temp probe {probe_id}: {e}")
+        logger.error("Error reading temp probe %s: %s", probe_id, e)
         return None
\ No newline at end of file
@@ -0,0 +1,210 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sensors.bus import SharedBus, i2c_bus, read_bytes, write_bytes
+import metrics
+
+logger = logging.getLogger("topology")
+
+_SWITCHES = metrics.counter("i2c_mux_switches_total", "TCA9548A channel selections written", ("mux",))
+
+# =============================
+# CONFIG
+# =============================
+# TCA9548A-style multiplexers answer at 0x70-0x77 and fan one bus out to
+# eight branches. A device behind a mux is only reachable while its branch
+# is selected, which is what lets several ADS1115s or BH1750s share an
+# address.
+MUX_ADDRESSES = list(range(0x70, 0x78))
+MUX_CHANNELS = 8
+
+# =============================
+# ROUTES
+# =============================
+
+@dataclass(frozen=True)
+class Route:
+    """Where a device sits: its address, and the mux branch in front of it (if any)."""
+    address: int
+    mux: Optional[int] = None
+    channel: Optional[int] = None
+
+    def __str__(self):
+        if self.mux is None:
+            return f"0x{self.address:02X}"
+        return f"0x{self.mux:02X}.{self.channel}/0x{self.address:02X}"
+
+    @property
+    def branch(self):
+        """Sort key that groups devices on the same mux branch (root first)."""
+        return (-1, -1) if self.mux is None else (self.mux, self.channel)
+
+
+class Topology:
+    """
+    Devices found on one I2C bus, including behind multiplexers, and the
+    current mux selection. Branches are only switched when a transaction
+    needs a different one, so reads grouped by branch cost one selection
+    per group.
+    """
+
+    def __init__(self, bus: SharedBus, routes: List[Route], muxes: List[int]):
+        self.bus = bus
+        self.routes = sorted(routes, key=lambda r: (r.branch, r.address))
+        self.muxes = muxes
+        self._selected: Dict[int, int] = {mux: 0 for mux in muxes}   # mux -> channel mask
+        self.switches = 0
+
+    def find(self, address: int, mux: Optional[int] = None, channel: Optional[int] = None) -> Optional[Route]:
+        """
+        Route for a device address. Without mux/channel the address must be
+        unambiguous (on the root bus, or on exactly one branch); otherwise
+        None is returned and the config has to name the branch.
+        """
+        if mux is not None:
+            route = Route(address, mux, channel)
+            return route if route in self.routes else None
+        matches = [r for r in self.routes if r.address == address]
+        root = [r for r in matches if r.mux is None]
+        if root:
+            return root[0]
+        if len(matches) > 1:
+            # Picking one would read whichever sensor happens to sort first
+            logger.error("0x%02X found on %d mux branches (%s) — set mux/mux_channel in the config",
+                         address, len(matches), ", ".join(str(r) for r in matches))
+            return None
+        return matches[0] if matches else None
+
+    def summary(self) -> str:
+        branches: Dict[str, List[str]] = {}
+        for route in self.routes:
+            key = "root" if route.mux is None else f"0x{route.mux:02X}.{route.channel}"
+            branches.setdefault(key, []).append(f"0x{route.address:02X}")
+        return "; ".join(f"{key}: {' '.join(addrs)}" for key, addrs in branches.items()) or "nothing found"
+
+    # =============================
+    # SELECTION
+    # =============================
+
+    def _set(self, i2c, mux: int, mask: int):
+        if self._selected.get(mux) == mask:
+            return
+        write_bytes(i2c, mux, bytes([mask]))
+        self._selected[mux] = mask
+        self.switches += 1
+        _SWITCHES.inc(mux=f"0x{mux:02X}")
+
+    def select(self, i2c, route: Route):
+        """Make `route` reachable (call inside a bus transaction)."""
+        if route.mux is None:
+            # Root device: only close branches holding the same address
+            for other in self.routes:
+                if other.mux is not None and other.address == route.address:
+                    if self._selected.get(other.mux, 0) & (1 << other.channel):
+                        self._set(i2c, other.mux, 0)
+            return
+        for mux, mask in self._selected.items():
+            if mux != route.mux and mask:
+                self._set(i2c, mux, 0)
+        self._set(i2c, route.mux, 1 << route.channel)
+
+    def forget_selection(self):
+        """After a bus error the mux state is unknown; rewrite it on next use."""
+        for mux in self._selected:
+            self._selected[mux] = -1
+
+    @contextmanager
+    def transaction(self, route: Route):
+        """
+        Bus transaction with the route's branch selected:
+
+            with topology.get().transaction(route) as i2c:
+                ...
+        """
+        with self.bus.transaction() as i2c:
+            try:
+                self.select(i2c, route)
+                yield i2c
+            except Exception:
+                self.forget_selection()
+                raise
+
+# =============================
+# DISCOVERY
+# =============================
+
+def _scan(i2c) -> List[int]:
+    while not i2c.try_lock():
+        time.sleep(0.001)
+    try:
+        return list(i2c.scan())
+    finally:
+        i2c.unlock()
+
+
+def _is_mux(i2c, address: int) -> bool:
+    """A TCA9548A reads back the channel mask last written to it."""
+    try:
+        for mask in (0x01, 0x00):
+            write_bytes(i2c, address, bytes([mask]))
+            if read_bytes(i2c, address, 1)[0] != mask:
+                return False
+        return True
+    except OSError:
+        return False
+
+
+def discover(bus: Optional[SharedBus] = None) -> Topology:
+    """Scan the bus and every branch of every mux found on it."""
+    bus = bus or i2c_bus()
+    routes: List[Route] = []
+    muxes: List[int] = []
+
+    with bus.transaction() as i2c:
+        # Branches may still be open from before a restart, so the first scan
+        # can include devices behind a mux; _is_mux() leaves every mux it
+        # confirms deselected, and only the rescan after that is the root bus
+        muxes = [a for a in _scan(i2c) if a in MUX_ADDRESSES and _is_mux(i2c, a)]
+        for mux in muxes:
+            write_bytes(i2c, mux, b"\x00")
+        root = set(_scan(i2c))
+        routes += [Route(a) for a in sorted(root) if a not in muxes]
+
+        for mux in muxes:
+            for channel in range(MUX_CHANNELS):
+                write_bytes(i2c, mux, bytes([1 << channel]))
+                behind = set(_scan(i2c)) - root
+                routes += [Route(a, mux, channel) for a in sorted(behind)]
+            write_bytes(i2c, mux, b"\x00")
+
+    topology = Topology(bus, routes, muxes)
+    logger.info(f"I2C topology ({bus.name}, {len(muxes)} mux): {topology.summary()}")
+    return topology
+
+
+_topology: Optional[Topology] = None
+_lock = threading.Lock()
+
+
+def get() -> Topology:
+    """The main bus topology, discovered on first use (drivers probe in parallel at startup)."""
+    global _topology
+    with _lock:
+        if _topology is None:
+            try:
+                _topology = discover()
+            except Exception as e:
+                logger.error("I2C topology discovery failed: %s — assuming devices on the root bus", e)
+                _topology = Topology(i2c_bus(), [], [])
+        return _topology
+
+
+def reset():
+    """Forget the topology so the next get() rescans (e.g. after rewiring)."""
+    global _topology
+    with _lock:
+        _topology = None
@@ -0,0 +1,214 @@
+"""
+Simulated hardware backend.
+
+install() registers stand-ins for the Pi-only modules the drivers import
+(board, busio, digitalio, RPi.GPIO) and points the DS18B20 driver at a
+fake /sys/bus/w1/devices tree, so the whole node runs on a normal Linux
+box. Call it before importing anything from sensors/ or pump/:
+
+    from sim import backend
+    world = backend.install()
+    world.i2c[0x23].lux = 12000      # drive the simulated devices
+"""
+import os
+import sys
+import types
+import logging
+from typing import Dict, List, Optional
+
+from sim.devices import Faults, SimADS1115, SimBH1750, SimDevice, SimGPIO, SimTCA9548A, SimW1Bus
+
+logger = logging.getLogger("sim")
+
+# =============================
+# WORLD
+# =============================
+
+class SimWorld:
+    """
+    All simulated devices, reachable by the fake driver modules. Devices
+    behind a SimTCA9548A in `i2c` answer while their branch is selected.
+    """
+
+    def __init__(self, i2c: Dict[int, SimDevice], w1: SimW1Bus, gpio: Optional[SimGPIO] = None):
+        self.i2c = i2c
+        self.w1 = w1
+        self.gpio = gpio or SimGPIO()
+
+    def reachable(self) -> Dict[int, List[SimDevice]]:
+        found: Dict[int, List[SimDevice]] = {}
+        for address, device in self.i2c.items():
+            if device.present:
+                found.setdefault(address, []).append(device)
+                if isinstance(device, SimTCA9548A):
+                    for addr, behind in device.reachable().items():
+                        found.setdefault(addr, []).extend(behind)
+        return found
+
+    def i2c_device(self, address: int) -> SimDevice:
+        devices = self.reachable().get(address)
+        if not devices:
+            raise OSError(121, f"No I2C device at address: 0x{address:02x}")
+        if len(devices) > 1:
+            # Two devices answering at once corrupt each other's replies
+            raise OSError(5, f"Address collision at 0x{address:02x} ({len(devices)} devices selected)")
+        return devices[0]
+
+
+def faults_from_env() -> Faults:
+    return Faults(
+        latency=float(os.getenv("SIM_LATENCY", "0")),
+        jitter=float(os.getenv("SIM_JITTER", "0")),
+        noise=float(os.getenv("SIM_NOISE", "0")),
+        failure_rate=float(os.getenv("SIM_FAILURE_RATE", "0")),
+    )
+
+
+def default_world(temperature_probes: int = 3, light_sensors: int = 1,
+                  faults: Optional[Faults] = None) -> SimWorld:
+    """One ADS1115 (4 channels), BH1750(s) at 0x23 / 0x5C and DS18B20s on w1."""
+    faults = faults or faults_from_env()
+    i2c: Dict[int, SimDevice] = {
+        0x48: SimADS1115({0: 1.80, 1: 2.10, 2: 1.40, 3: 2.30}, faults=faults),
+    }
+    for address in (0x23, 0x5C)[:light_sensors]:
+        i2c[address] = SimBH1750(lux=450.0, faults=faults)
+
+    w1 = SimW1Bus([18.0 + i * 0.5 for i in range(temperature_probes)], faults=faults)
+    return SimWorld(i2c, w1)
+
+# =============================
+# FAKE MODULES
+# =============================
+
+def _board_module() -> types.ModuleType:
+    board = types.ModuleType("board")
+    for n in range(28):
+        setattr(board, f"D{n}", n)
+    board.SDA = 2
+    board.SCL = 3
+    return board
+
+
+def _busio_module(world: SimWorld) -> types.ModuleType:
+    busio = types.ModuleType("busio")
+
+    class I2C:
+        def __init__(self, scl=None, sda=None, frequency=100000):
+            self.world = world
+            self._locked = False
+
+        def try_lock(self):
+            if self._locked:
+                return False
+            self._locked = True
+            return True
+
+        def unlock(self):
+            self._locked = False
+
+        def scan(self):
+            return sorted(world.reachable())
+
+        def writeto(self, address, buffer, *, start=0, end=None):
+            world.i2c_device(address).handle_write(bytes(buffer[start:end]))
+
+        def readfrom_into(self, address, buffer, *, start=0, end=None):
+            end = len(buffer) if end is None else end
+            data = world.i2c_device(address).handle_read(end - start)
+            buffer[start:end] = data
+
+        def writeto_then_readfrom(self, address, out_buffer, in_buffer, *,
+                                  out_start=0, out_end=None, in_start=0, in_end=None):
+            self.writeto(address, out_buffer, start=out_start, end=out_end)
+            self.readfrom_into(address, in_buffer, start=in_start, end=in_end)
+
+        def deinit(self):
+            pass
+
+    busio.I2C = I2C
+    return busio
+
+
+def _digitalio_module(world: SimWorld) -> types.ModuleType:
+    digitalio = types.ModuleType("digitalio")
+
+    class Direction:
+        INPUT = "input"
+        OUTPUT = "output"
+
+    class DigitalInOut:
+        def __init__(self, pin):
+            self.pin = pin
+            self.direction = Direction.INPUT
+
+        @property
+        def value(self):
+            return world.gpio.get(self.pin)
+
+        @value.setter
+        def value(self, value):
+            world.gpio.set(self.pin, value)
+
+        def deinit(self):
+            pass
+
+    digitalio.Direction = Direction
+    digitalio.DigitalInOut = DigitalInOut
+    return digitalio
+
+
+def _gpio_modules(world: SimWorld) -> Dict[str, types.ModuleType]:
+    rpi = types.ModuleType("RPi")
+    rpi.__path__ = []
+    gpio = types.ModuleType("RPi.GPIO")
+    gpio.BCM, gpio.BOARD = 11, 10
+    gpio.OUT, gpio.IN = 0, 1
+    gpio.HIGH, gpio.LOW = 1, 0
+    gpio.setmode = lambda mode: None
+    gpio.setwarnings = lambda flag: None
+    gpio.setup = lambda pin, direction, initial=None: None
+    gpio.output = lambda pin, value: world.gpio.set(pin, value)
+    gpio.input = lambda pin: int(world.gpio.get(pin))
+    gpio.cleanup = lambda *pins: None
+    rpi.GPIO = gpio
+    return {"RPi": rpi, "RPi.GPIO": gpio}
+
+# =============================
+# INSTALL
+# =============================
+
+_world: Optional[SimWorld] = None
+
+
+def install(world: Optional[SimWorld] = None) -> SimWorld:
+    """
+    Register the simulated modules in sys.modules (once per process) and
+    return the world driving them.
+    """
+    global _world
+    if _world is not None:
+        return _world
+
+    _world = world or default_world()
+
+    modules = {
+        "board": _board_module(),
+        "busio": _busio_module(_world),
+        "digitalio": _digitalio_module(_world),
+    }
+    modules.update(_gpio_modules(_world))
+    sys.modules.update(modules)
+
+    from sensors import temperature
+    temperature.BASE_DIR = _world.w1.base_dir
+
+    logger.info(
+        f"Simulated hardware installed: I2C {[hex(a) for a in _world.i2c]}, "
+        f"{len(_world.w1.temperatures)} DS18B20 in {_world.w1.base_dir}"
+    )
+    return _world
+
+
+def world() -> Optional[SimWorld]:
+    return _world
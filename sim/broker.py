@@ -0,0 +1,138 @@
+"""
+Minimal MQTT 3.1.1 broker for running the node without mosquitto.
+
+Accepts any client, acknowledges QoS 1 publishes, answers pings and
+forwards messages to matching subscribers (+ and # wildcards, no retained
+messages or sessions). Enough to exercise both runtimes end to end and to
+send commands to a simulated node:
+
+    python -m sim.broker --port 1883
+    mosquitto_pub -t 'cmd/SA-PI-UNKNOWN/read-now' -m '{}'
+"""
+import argparse
+import asyncio
+import logging
+import struct
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger("sim.broker")
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 12, 13, 14
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+def _packet(kind: int, flags: int, body: bytes) -> bytes:
+    length = len(body)
+    header = bytearray([(kind << 4) | flags])
+    while True:
+        byte, length = length % 128, length // 128
+        header.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes(header) + body
+
+
+def _string(data: bytes, pos: int) -> Tuple[str, int]:
+    (size,) = struct.unpack_from("!H", data, pos)
+    return data[pos + 2:pos + 2 + size].decode(), pos + 2 + size
+
+
+class Broker:
+    def __init__(self):
+        self.clients: Dict[asyncio.StreamWriter, List[str]] = {}
+        self.messages = 0
+        self._mid = 0
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 1883):
+        server = await asyncio.start_server(self._client, host, port)
+        logger.info(f"Sim broker listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _read_packet(self, reader: asyncio.StreamReader):
+        first = (await reader.readexactly(1))[0]
+        length, shift = 0, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return first >> 4, first & 0x0F, await reader.readexactly(length)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients[writer] = []
+        client_id = "?"
+        try:
+            while True:
+                kind, flags, body = await self._read_packet(reader)
+                if kind == CONNECT:
+                    # protocol name, level, flags, keepalive, then the client id
+                    _, pos = _string(body, 0)
+                    client_id, _ = _string(body, pos + 4)
+                    writer.write(_packet(CONNACK, 0, b"\x00\x00"))
+                    logger.info(f"Client connected: {client_id}")
+                elif kind == PUBLISH:
+                    self._publish(writer, flags, body)
+                elif kind == SUBSCRIBE:
+                    pos, granted = 2, bytearray()
+                    while pos < len(body):
+                        pattern, pos = _string(body, pos)
+                        granted.append(min(body[pos], 1))
+                        pos += 1
+                        self.clients[writer].append(pattern)
+                    writer.write(_packet(SUBACK, 0, body[:2] + bytes(granted)))
+                elif kind == PINGREQ:
+                    writer.write(_packet(PINGRESP, 0, b""))
+                elif kind == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.pop(writer, None)
+            writer.close()
+            logger.info(f"Client gone: {client_id}")
+
+    def _publish(self, sender: asyncio.StreamWriter, flags: int, body: bytes):
+        qos = (flags >> 1) & 0x03
+        topic, pos = _string(body, 0)
+        if qos:
+            sender.write(_packet(PUBACK, 0, body[pos:pos + 2]))
+            pos += 2
+        payload = body[pos:]
+        self.messages += 1
+
+        for writer, patterns in self.clients.items():
+            if any(topic_matches(p, topic) for p in patterns):
+                # Forwarded at QoS 0: no retry state to keep
+                encoded = topic.encode()
+                writer.write(_packet(PUBLISH, 0, struct.pack("!H", len(encoded)) + encoded + payload))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(Broker().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
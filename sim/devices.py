@@ -0,0 +1,286 @@
+import os
+import time
+import random
+import shutil
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("sim")
+
+# =============================
+# FAULT MODEL
+# =============================
+
+@dataclass
+class Faults:
+    """
+    Per-device behaviour knobs.
+    latency:      seconds added to every bus transaction
+    jitter:       extra uniform random latency (0..jitter seconds)
+    noise:        gaussian sigma added to every reading (device units)
+    failure_rate: probability (0..1) that a transaction raises OSError
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    noise: float = 0.0
+    failure_rate: float = 0.0
+
+
+class SimDevice:
+    """Base class: applies latency and failure injection to each transaction."""
+
+    def __init__(self, faults: Optional[Faults] = None):
+        self.faults = faults or Faults()
+        self.transactions = 0
+        self.failures = 0
+        self.present = True
+
+    def _io(self):
+        self.transactions += 1
+        delay = self.faults.latency
+        if self.faults.jitter:
+            delay += random.uniform(0, self.faults.jitter)
+        if delay:
+            time.sleep(delay)
+        if not self.present or random.random() < self.faults.failure_rate:
+            self.failures += 1
+            raise OSError(121, "Remote I/O error")
+
+    def _noisy(self, value: float) -> float:
+        if self.faults.noise:
+            return value + random.gauss(0, self.faults.noise)
+        return value
+
+    # Raw bus access (busio.I2C.writeto / readfrom_into)
+    def handle_write(self, data: bytes):
+        self._io()
+
+    def handle_read(self, length: int) -> bytes:
+        self._io()
+        return bytes(length)
+
+# =============================
+# BH1750
+# =============================
+
+class SimBH1750(SimDevice):
+    """
+    BH1750 ambient light sensor. Understands the opcode set (power, reset,
+    continuous / one-time modes, measurement-time register) at byte level.
+    """
+
+    MODE_TIMES = {  # opcode -> (typical conversion s at MTreg 69, lux per count divisor)
+        0x10: (0.120, 1.2), 0x11: (0.120, 2.4), 0x13: (0.016, 1.2),
+        0x20: (0.120, 1.2), 0x21: (0.120, 2.4), 0x23: (0.016, 1.2),
+    }
+
+    def __init__(self, lux: float = 400.0, faults: Optional[Faults] = None):
+        super().__init__(faults)
+        self.lux = lux
+        self.mode = 0x10
+        self.mtreg = 69
+        self.powered = True
+        self._mt_high = 69 >> 5
+        self._ready_at = 0.0
+        self._last_counts = 0
+
+    def handle_write(self, data: bytes):
+        self._io()
+        for op in data:
+            if op == 0x00:
+                self.powered = False
+            elif op == 0x01:
+                self.powered = True
+            elif op in self.MODE_TIMES:
+                self.mode = op
+                self.powered = True
+                self._ready_at = time.monotonic() + self.conversion_time()
+            elif op & 0xF8 == 0x40:
+                self._mt_high = op & 0x07
+            elif op & 0xE0 == 0x60:
+                self.mtreg = (self._mt_high << 5) | (op & 0x1F)
+
+    def handle_read(self, length: int) -> bytes:
+        self._io()
+        # Reading before the conversion finishes returns the previous result
+        if time.monotonic() >= self._ready_at:
+            divisor = self.MODE_TIMES.get(self.mode, (0, 1.2))[1]
+            counts = self._noisy(self.lux) * divisor * self.mtreg / 69
+            self._last_counts = int(max(0, min(counts, 0xFFFF)))
+        return self._last_counts.to_bytes(2, "big")[:length]
+
+    def conversion_time(self) -> float:
+        base = self.MODE_TIMES.get(self.mode, (0.120, 1.2))[0]
+        return base * self.mtreg / 69
+
+# =============================
+# ADS1115
+# =============================
+
+class SimADS1115(SimDevice):
+    """
+    Four-channel ADC; channels hold a nominal voltage each. Register level:
+    writing the config register with OS set starts a single-shot
+    conversion, and the conversion register holds the result once the
+    data-rate dependent conversion time has passed.
+    """
+
+    DATA_RATES = (8, 16, 32, 64, 128, 250, 475, 860)
+    FULL_SCALE = (6.144, 4.096, 2.048, 1.024, 0.512, 0.256, 0.256, 0.256)
+
+    def __init__(self, voltages: Optional[Dict[int, float]] = None, faults: Optional[Faults] = None):
+        super().__init__(faults)
+        self.voltages = {ch: 1.8 for ch in range(4)}
+        self.voltages.update(voltages or {})
+        self.conversions = 0
+        self.pointer = 0
+        self.config = 0x8583  # power-on default
+        self._ready_at = 0.0
+        self._pending = 0
+        self._result = 0
+
+    def handle_write(self, data: bytes):
+        self._io()
+        if not data:
+            return
+        self.pointer = data[0] & 0x03
+        if self.pointer == 0x01 and len(data) >= 3:
+            self.config = (data[1] << 8) | data[2]
+            if self.config & 0x8000:
+                self._start()
+
+    def _start(self):
+        channel = ((self.config >> 12) & 0x07) - 4   # single-ended AIN0-3 only
+        full_scale = self.FULL_SCALE[(self.config >> 9) & 0x07]
+        rate = self.DATA_RATES[(self.config >> 5) & 0x07]
+        volts = self._noisy(self.voltages.get(channel, 0.0))
+        self._pending = int(max(-32768, min(volts / full_scale * 32768, 32767)))
+        self._ready_at = time.monotonic() + 1.0 / rate
+        self.conversions += 1
+
+    def handle_read(self, length: int) -> bytes:
+        self._io()
+        busy = time.monotonic() < self._ready_at
+        if not busy:
+            self._result = self._pending
+        if self.pointer == 0x01:
+            value = self.config & 0x7FFF if busy else self.config | 0x8000
+        else:
+            # Reading before the conversion finishes returns the previous result
+            value = self._result & 0xFFFF
+        return value.to_bytes(2, "big")[:length]
+
+# =============================
+# TCA9548A
+# =============================
+
+class SimTCA9548A(SimDevice):
+    """
+    Eight-branch I2C multiplexer. channels maps branch -> {address: device};
+    the control register (one byte, read back as written) selects branches.
+    """
+
+    def __init__(self, channels: Optional[Dict[int, Dict[int, SimDevice]]] = None,
+                 faults: Optional[Faults] = None):
+        super().__init__(faults)
+        self.channels = {ch: {} for ch in range(8)}
+        self.channels.update(channels or {})
+        self.mask = 0
+        self.selections = 0
+
+    def handle_write(self, data: bytes):
+        self._io()
+        if data:
+            self.mask = data[-1]
+            self.selections += 1
+
+    def handle_read(self, length: int) -> bytes:
+        self._io()
+        return bytes([self.mask])[:length]
+
+    def reachable(self) -> Dict[int, List[SimDevice]]:
+        """Devices on the selected branches, by address."""
+        found: Dict[int, List[SimDevice]] = {}
+        for ch, devices in self.channels.items():
+            if self.mask & (1 << ch):
+                for address, device in devices.items():
+                    if device.present:
+                        found.setdefault(address, []).append(device)
+        return found
+
+# =============================
+# 1-WIRE (fake sysfs tree)
+# =============================
+
+class SimW1Bus:
+    """
+    A fake /sys/bus/w1/devices tree with DS18B20 probes and one bus master.
+    Call refresh() to write new readings (noise and CRC failures applied).
+    """
+
+    def __init__(self, temperatures: List[float], bulk_read: bool = True,
+                 faults: Optional[Faults] = None, root: Optional[str] = None):
+        self.faults = faults or Faults()
+        self.root = root or tempfile.mkdtemp(prefix="sim-w1-")
+        self.base_dir = os.path.join(self.root, "devices")
+        self.master = os.path.join(self.base_dir, "w1_bus_master1")
+        self.temperatures = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.master, exist_ok=True)
+        if bulk_read:
+            with open(os.path.join(self.master, "therm_bulk_read"), "w") as f:
+                f.write("0\n")
+
+        for i, temp in enumerate(temperatures):
+            self.add_probe(f"28-{0x3c01d0750000 + i:012x}", temp)
+
+    def add_probe(self, rom: str, temperature: float):
+        os.makedirs(os.path.join(self.base_dir, rom), exist_ok=True)
+        os.makedirs(os.path.join(self.master, rom), exist_ok=True)
+        self.temperatures[rom] = temperature
+        self._write(rom)
+
+    def remove_probe(self, rom: str):
+        self.temperatures.pop(rom, None)
+        shutil.rmtree(os.path.join(self.base_dir, rom), ignore_errors=True)
+        shutil.rmtree(os.path.join(self.master, rom), ignore_errors=True)
+
+    def _write(self, rom: str):
+        temp = self.temperatures[rom]
+        if self.faults.noise:
+            temp += random.gauss(0, self.faults.noise)
+        crc = "NO" if random.random() < self.faults.failure_rate else "YES"
+        raw = int(round(temp * 1000))
+        with open(os.path.join(self.base_dir, rom, "w1_slave"), "w") as f:
+            f.write(f"50 01 4b 46 7f ff 0c 10 1c : crc=1c {crc}\n")
+            f.write(f"50 01 4b 46 7f ff 0c 10 1c t={raw}\n")
+
+    def refresh(self):
+        with self._lock:
+            for rom in self.temperatures:
+                self._write(rom)
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+# =============================
+# GPIO
+# =============================
+
+class SimGPIO:
+    """Pin state shared by the fake RPi.GPIO and digitalio modules."""
+
+    def __init__(self):
+        self.pins: Dict[int, bool] = {}
+        self.writes = 0
+
+    def set(self, pin: int, value: bool):
+        self.pins[pin] = bool(value)
+        self.writes += 1
+
+    def get(self, pin: int) -> bool:
+        return self.pins.get(pin, False)
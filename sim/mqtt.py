@@ -0,0 +1,62 @@
+import time
+import threading
+
+import paho.mqtt.client as mqtt
+
+
+class LoopbackInfo:
+    """Stands in for paho's MQTTMessageInfo: delivered as soon as it is sent."""
+
+    def __init__(self, mid: int):
+        self.mid = mid
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+
+    def is_published(self):
+        return True
+
+    def wait_for_publish(self, timeout=None):
+        return None
+
+
+class LoopbackClient:
+    """
+    Minimal paho Client replacement that accepts every publish immediately
+    and counts messages and bytes. Used to measure the node's own publish
+    path without a broker. on_publish fires after `ack_delay` seconds
+    (immediately, from inside publish(), when 0).
+    """
+
+    def __init__(self, *args, ack_delay: float = 0.0, **kwargs):
+        self.on_publish = None
+        self.ack_delay = ack_delay
+        self.messages = 0
+        self.bytes = 0
+        self.topics = {}
+        self._mid = 0
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        with self._lock:
+            self._mid += 1
+            self.messages += 1
+            self.bytes += len(payload or b"")
+            self.topics[topic] = self.topics.get(topic, 0) + 1
+            mid = self._mid
+        if self.on_publish is not None:
+            if self.ack_delay > 0:
+                threading.Timer(self.ack_delay, self.on_publish, (self, None, mid)).start()
+            else:
+                self.on_publish(self, None, mid)
+        return LoopbackInfo(mid)
+
+    # Connection management is a no-op
+    def connect(self, *args, **kwargs): return 0
+    def connect_async(self, *args, **kwargs): return 0
+    def disconnect(self, *args, **kwargs): return 0
+    def loop_start(self): return 0
+    def loop_stop(self, *args, **kwargs): return 0
+    def subscribe(self, *args, **kwargs): return (0, 0)
+    def username_pw_set(self, *args, **kwargs): pass
+    def reconnect_delay_set(self, *args, **kwargs): pass
+    def max_inflight_messages_set(self, *args, **kwargs): pass
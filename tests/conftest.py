@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The node runs from the repository root (flat modules, no package), so the
+# tests import it the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
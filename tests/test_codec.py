@@ -0,0 +1,59 @@
+import pytest
+
+import codec
+
+SAMPLES = [
+    (1760000000.25, [
+        {"type": "temperature", "id": "temp-sensor-001", "value": 18.2},
+        {"type": "moisture", "id": "soil-sensor-001", "value": 65.0},
+    ]),
+    (1760000030.0, [
+        {"type": "temperature", "id": "temp-sensor-001", "value": None, "status": "stale", "last": 18.2, "age": 30},
+        {"type": "light", "id": "light-sensor-001", "value": 450},
+    ]),
+]
+
+
+@pytest.mark.parametrize("fmt", ["msgpack", "cbor"])
+def test_compact_round_trip(fmt):
+    if not codec.available(fmt):
+        pytest.skip(f"{fmt} encoder not installed")
+
+    readings = codec.decode(codec.encode_compact("SA-PI-TEST", SAMPLES, fmt), fmt)
+
+    assert [r["timestamp"] for r in readings] == [1760000000.25, 1760000030.0]
+    assert all(r["device_uid"] == "SA-PI-TEST" for r in readings)
+    assert [r["sensors"] for r in readings] == [sensors for _, sensors in SAMPLES]
+
+
+def test_envelope_keys_each_sensor_once():
+    envelope = codec.build_envelope("SA-PI-TEST", SAMPLES)
+    assert envelope["v"] == codec.ENVELOPE_VERSION
+    assert envelope["k"] == [["temperature", "temp-sensor-001"], ["moisture", "soil-sensor-001"],
+                             ["light", "light-sensor-001"]]
+    assert envelope["s"][0][1] == {0: 18.2, 1: 65.0}
+    # A sensor with extra fields is sent as a map
+    assert envelope["s"][1][1][0] == {"value": None, "status": "stale", "last": 18.2, "age": 30}
+
+
+def test_json_round_trip():
+    sensors = SAMPLES[0][1]
+    readings = codec.decode(codec.encode_json("SA-PI-TEST", sensors, timestamp=1760000000.9), "json")
+    assert readings == [{"device_uid": "SA-PI-TEST", "timestamp": 1760000000, "sensors": sensors}]
+
+
+@pytest.mark.parametrize("fmt", ["msgpack", "cbor"])
+def test_unknown_envelope_version_is_rejected(fmt, monkeypatch):
+    if not codec.available(fmt):
+        pytest.skip(f"{fmt} encoder not installed")
+    monkeypatch.setattr(codec, "ENVELOPE_VERSION", 2)
+    data = codec.encode_compact("SA-PI-TEST", SAMPLES, fmt)
+    monkeypatch.setattr(codec, "ENVELOPE_VERSION", 1)
+    with pytest.raises(ValueError):
+        codec.decode(data, fmt)
+
+
+def test_unknown_format():
+    assert not codec.available("xml")
+    with pytest.raises(ValueError):
+        codec.encode_compact("SA-PI-TEST", SAMPLES, "xml")
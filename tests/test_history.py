@@ -0,0 +1,83 @@
+import pytest
+
+from history import HistoryStore
+
+NOW = 1760000400   # on an hour boundary, so rollup buckets start inside the range
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"), max_points=100)
+    for i in range(10):
+        store.record([
+            {"type": "moisture", "id": "soil-sensor-001", "value": 40.0 + i},
+            {"type": "temperature", "id": "probe-1", "value": 18.0},
+            {"type": "moisture", "id": "probe-1", "value": 55.0},
+            {"type": "light", "id": "light-sensor-001", "value": None},
+        ], ts=NOW + i * 30)
+    yield store
+    store.close()
+
+
+def query(store, **request):
+    request.setdefault("request_id", "r1")
+    return store.query(request)
+
+
+@pytest.mark.parametrize("request_fields, message", [
+    ({"start": "yesterday"}, "start must be a unix timestamp"),
+    ({"end": True}, "end must be a unix timestamp"),
+    ({"start": -5}, "start must be a unix timestamp"),
+    ({"end": float("inf")}, "end must be a unix timestamp"),
+    ({"start": NOW + 100, "end": NOW}, "start is after end"),
+    ({"sensors": {"id": "soil-sensor-001"}}, "sensors must be a list of sensor ids"),
+    ({"sensors": ["soil-sensor-001", 7]}, "sensors must be a list of sensor ids"),
+])
+def test_malformed_requests_get_an_error_reply(store, request_fields, message):
+    response = query(store, **request_fields)
+    assert response == {"request_id": "r1", "error": response["error"]}
+    assert message in response["error"]
+
+
+def test_raw_query_returns_the_points_in_range(store):
+    response = query(store, sensors="soil-sensor-001", start=NOW, end=NOW + 120, resolution="raw")
+
+    assert (response["start"], response["end"]) == (NOW, NOW + 120)
+    [series] = response["series"]
+    assert series["type"] == "moisture" and series["fields"] == ["ts", "value"]
+    assert series["points"] == [[NOW + i * 30, 40.0 + i] for i in range(5)]
+
+
+def test_an_id_used_by_two_types_returns_both_series(store):
+    response = query(store, sensors=["probe-1"], start=NOW, end=NOW + 300, resolution="raw")
+    assert sorted((s["type"], s["points"][0][1]) for s in response["series"]) == [
+        ("moisture", 55.0), ("temperature", 18.0)]
+
+
+def test_unknown_sensor_and_bad_resolution_are_reported_per_series(store):
+    response = query(store, sensors=["nope"], start=NOW, end=NOW + 300)
+    assert response["series"] == [{"id": "nope", "error": "unknown sensor"}]
+
+    response = query(store, sensors=["soil-sensor-001"], start=NOW, end=NOW + 300, resolution="fortnightly")
+    assert "unknown resolution" in response["series"][0]["error"]
+
+
+def test_step_resolution_downsamples(store):
+    response = query(store, sensors=["soil-sensor-001"], start=NOW, end=NOW + 300, resolution=120)
+    [series] = response["series"]
+    assert series["fields"] == ["ts", "min", "max", "mean", "count"]
+    assert sum(p[4] for p in series["points"]) == 10
+    assert min(p[1] for p in series["points"]) == 40.0 and max(p[2] for p in series["points"]) == 49.0
+
+
+def test_paging_sets_next(store):
+    store.max_points = 4
+    response = query(store, sensors=["soil-sensor-001"], start=NOW, end=NOW + 300, resolution="raw")
+    [series] = response["series"]
+    assert len(series["points"]) == 4
+    assert series["next"] == NOW + 4 * 30
+
+
+def test_failed_reads_are_not_recorded(store):
+    response = query(store, start=NOW, end=NOW + 300)
+    assert "light-sensor-001" not in {s["id"] for s in response["series"]}
@@ -0,0 +1,79 @@
+from report_filter import Deadband, ReportFilter
+
+
+def reading(value, sensor_type="temperature", sensor_id="temp-sensor-001"):
+    return {"type": sensor_type, "id": sensor_id, "value": value}
+
+
+def sent(report, value, now, **kwargs):
+    return bool(report.filter([reading(value, **kwargs)], now=now))
+
+
+def test_deadband_parsing():
+    assert repr(Deadband("0.5")) == "0.5"
+    assert repr(Deadband(" 5% ")) == "5.0%"
+    assert Deadband("0.5").exceeded(20.0, 20.6)
+    assert not Deadband("0.5").exceeded(20.0, 20.5)
+    assert Deadband("5%").exceeded(40.0, 42.5)
+    assert not Deadband("5%").exceeded(40.0, 41.9)
+
+
+def test_absolute_deadband_compares_against_last_sent_value():
+    report = ReportFilter({"temperature": "0.5"}, heartbeat=900)
+    assert sent(report, 20.0, now=0)
+    assert not sent(report, 20.3, now=30)
+    # Slow creep: 20.6 is within 0.5 of the last read but not of the last sent
+    assert sent(report, 20.6, now=60)
+    assert not sent(report, 20.9, now=90)
+
+
+def test_percent_deadband_is_relative():
+    report = ReportFilter({"moisture": "5%"}, heartbeat=900)
+    kwargs = {"sensor_type": "moisture", "sensor_id": "soil-sensor-001"}
+    assert sent(report, 40.0, now=0, **kwargs)
+    assert not sent(report, 41.5, now=30, **kwargs)
+    assert sent(report, 42.5, now=60, **kwargs)
+
+
+def test_failures_and_recoveries_always_go_out():
+    report = ReportFilter({"temperature": "0.5"}, heartbeat=900)
+    assert sent(report, 20.0, now=0)
+    assert sent(report, None, now=30)
+    assert not sent(report, None, now=60)
+    assert sent(report, 20.0, now=90)
+
+
+def test_heartbeat_resends_an_unchanged_value():
+    report = ReportFilter({"temperature": "0.5"}, heartbeat=300)
+    assert sent(report, 20.0, now=0)
+    assert not sent(report, 20.0, now=299)
+    assert sent(report, 20.0, now=300)
+    # The heartbeat counts from the resend
+    assert not sent(report, 20.0, now=400)
+
+
+def test_types_without_a_deadband_report_any_change():
+    report = ReportFilter({}, heartbeat=900)
+    assert sent(report, 450, now=0, sensor_type="light", sensor_id="light-sensor-001")
+    assert not sent(report, 450, now=30, sensor_type="light", sensor_id="light-sensor-001")
+    assert sent(report, 451, now=60, sensor_type="light", sensor_id="light-sensor-001")
+
+
+def test_sensors_are_filtered_independently_and_counted():
+    report = ReportFilter({"temperature": "0.5"}, heartbeat=900)
+    report.filter([reading(20.0), reading(18.0, sensor_id="temp-sensor-002")], now=0)
+
+    selected = report.filter([reading(20.1), reading(19.0, sensor_id="temp-sensor-002")], now=30)
+    assert [s["id"] for s in selected] == ["temp-sensor-002"]
+    assert (report.passed, report.suppressed) == (3, 1)
+
+
+def test_snapshot_and_reset():
+    report = ReportFilter({"temperature": "0.5"}, heartbeat=900)
+    sensors = [reading(20.0)]
+    assert report.snapshot(sensors, now=0) is sensors
+    # A read-now answer counts as sent
+    assert not sent(report, 20.2, now=30)
+
+    report.reset()
+    assert sent(report, 20.2, now=60)
@@ -0,0 +1,91 @@
+import pytest
+
+from scheduler import Scheduler
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def names(tasks):
+    return [t.name for t in tasks]
+
+
+def test_deadlines_follow_the_grid_not_the_run_time():
+    clock = Clock()
+    schedule = Scheduler(clock)
+    task = schedule.add("sample", 10)
+
+    assert names(schedule.pop_due()) == ["sample"]
+    clock.now = 1010.4   # started late
+    assert names(schedule.pop_due()) == ["sample"]
+    assert task.deadline == 1020.0
+    assert schedule.time_to_next() == pytest.approx(9.6)
+
+    clock.now = 1019.9
+    assert schedule.pop_due() == []
+
+
+def test_overrun_skips_missed_ticks_and_stays_aligned():
+    clock = Clock()
+    schedule = Scheduler(clock)
+    task = schedule.add("sample", 10)
+    schedule.pop_due()
+
+    clock.now = 1045.0   # ticks at 1010 (late), 1020, 1030 and 1040 overdue
+    assert names(schedule.pop_due()) == ["sample"]
+    assert task.missed == 3
+    assert task.deadline == 1050.0
+    assert schedule.missed == 3
+
+
+def test_tasks_run_at_their_own_rates_and_phases():
+    clock = Clock()
+    schedule = Scheduler(clock)
+    schedule.add("sample", 10)
+    schedule.add("publish", 30, phase=5)
+
+    seen = []
+    for t in range(0, 61):
+        clock.now = 1000.0 + t
+        seen += [(t, name) for name in names(schedule.pop_due())]
+
+    assert [t for t, name in seen if name == "sample"] == [0, 10, 20, 30, 40, 50, 60]
+    assert [t for t, name in seen if name == "publish"] == [5, 35]
+
+
+def test_restore_continues_on_the_saved_grid(monkeypatch):
+    clock = Clock()
+    schedule = Scheduler(clock)
+    schedule.add("sample", 10)
+    schedule.add("publish", 300)
+    schedule.pop_due()
+    monkeypatch.setattr("scheduler.time.time", lambda: 5000.0)
+    saved = schedule.snapshot()   # wall time of each next deadline
+    assert saved == {"sample": 5010.0, "publish": 5300.0}
+
+    # Restarted 4 s later with a different monotonic clock
+    restarted = Scheduler(Clock(50.0))
+    restarted.add("sample", 10)
+    restarted.add("publish", 300)
+    monkeypatch.setattr("scheduler.time.time", lambda: 5004.0)
+    restarted.restore(saved)
+
+    assert {t.name: t.deadline for t in restarted.tasks} == {"sample": 56.0, "publish": 346.0}
+
+
+def test_restore_never_pushes_a_task_out_by_more_than_a_period(monkeypatch):
+    restarted = Scheduler(Clock(50.0))
+    task = restarted.add("sample", 10)
+    monkeypatch.setattr("scheduler.time.time", lambda: 5000.0)
+    restarted.restore({"sample": 9000.0})
+    assert task.deadline == 60.0
+
+
+def test_period_must_be_positive():
+    with pytest.raises(ValueError):
+        Scheduler(Clock()).add("broken", 0)
@@ -0,0 +1,181 @@
+import threading
+import time
+
+import pytest
+
+from pump.sequencer import Sequencer
+
+ZONES = {
+    "main": {"gpio": 17, "current": 1.0},
+    "bed-2": {"gpio": 22, "current": 1.0},
+    "bed-3": {"gpio": 23, "current": 2.0},
+}
+
+
+def zones(runs):
+    return [r.zone for r in runs]
+
+
+def test_runs_queue_by_priority_then_fifo():
+    seq = Sequencer(ZONES)
+    seq.submit("main", 10, now=0)
+    seq.submit("bed-2", 10, now=0)
+    seq.submit("bed-3", 10, now=0, priority=5)
+
+    started, _ = seq.step(0)
+    assert zones(started) == ["bed-3"]
+    assert [r["zone"] for r in seq.state(0)["queued"]] == ["main", "bed-2"]
+
+    started, finished = seq.step(10)
+    assert zones(finished) == ["bed-3"] and zones(started) == ["main"]
+    started, finished = seq.step(20)
+    assert zones(finished) == ["main"] and zones(started) == ["bed-2"]
+    assert seq.next_wakeup() == 30
+
+
+def test_repeated_request_merges_into_the_queued_run():
+    seq = Sequencer(ZONES)
+    seq.submit("main", 10, now=0)
+    first, _ = seq.submit("bed-2", 10, now=0)
+    request, outcome = seq.submit("bed-2", 30, now=1, priority=3)
+
+    assert outcome == "merged" and request is first
+    assert (request.seconds, request.priority) == (30, 3)
+    assert len(seq.queue) == 2
+
+
+def test_request_for_a_running_zone_extends_it_up_to_max_run():
+    seq = Sequencer(ZONES, max_run=60)
+    seq.submit("main", 20, now=0)
+    seq.step(0)
+
+    request, outcome = seq.submit("main", 30, now=10)
+    assert outcome == "extended" and request.ends_at == 40
+
+    # Never past max_run from when the run started
+    request, _ = seq.submit("main", 60, now=30)
+    assert request.ends_at == 60 and request.seconds == 60
+
+
+def test_seconds_are_capped_at_max_run():
+    seq = Sequencer(ZONES, max_run=60)
+    request, _ = seq.submit("main", 600, now=0)
+    assert request.seconds == 60
+
+
+def test_concurrency_and_current_limits():
+    seq = Sequencer(ZONES, max_concurrent=3, max_current=2.0)
+    seq.submit("bed-3", 10, now=0)
+    seq.submit("main", 10, now=0)
+    seq.submit("bed-2", 10, now=0)
+
+    # bed-3 alone draws the whole 2 A
+    started, _ = seq.step(0)
+    assert zones(started) == ["bed-3"]
+    # then the two 1 A zones fit together
+    started, _ = seq.step(10)
+    assert sorted(zones(started)) == ["bed-2", "main"]
+
+
+def test_head_of_queue_is_not_skipped():
+    seq = Sequencer(ZONES, max_concurrent=2, max_current=2.0)
+    seq.submit("main", 10, now=0)
+    seq.step(0)
+    seq.submit("bed-3", 10, now=1)
+    seq.submit("bed-2", 10, now=1)
+
+    # bed-2 would fit next to main, but bed-3 is first in line
+    started, _ = seq.step(1)
+    assert started == []
+    started, _ = seq.step(10)
+    assert zones(started) == ["bed-3"]
+
+
+def test_zones_that_can_never_run_are_refused():
+    seq = Sequencer(ZONES, max_current=1.5)
+    with pytest.raises(ValueError):
+        seq.submit("bed-3", 10, now=0)
+    with pytest.raises(KeyError):
+        seq.submit("nowhere", 10, now=0)
+    assert not seq.busy()
+
+
+def test_cancel_one_zone_or_all():
+    seq = Sequencer(ZONES)
+    seq.submit("main", 10, now=0)
+    seq.step(0)
+    seq.submit("bed-2", 10, now=0)
+    seq.submit("bed-3", 10, now=0)
+
+    assert seq.cancel("bed-2") == []
+    assert not seq.busy("bed-2") and seq.busy("bed-3")
+
+    assert zones(seq.cancel()) == ["main"]
+    assert not seq.busy()
+
+# =============================
+# PUMP EVENTS
+# =============================
+
+@pytest.fixture
+def pump():
+    from sim import backend
+    world = backend.install()
+    from pump import pump_control
+
+    events = []
+    arrived = threading.Condition()
+
+    def listener(event):
+        with arrived:
+            events.append(event)
+            arrived.notify_all()
+
+    def wait_for(predicate, timeout=2.0):
+        with arrived:
+            assert arrived.wait_for(lambda: predicate(events), timeout), events
+
+    pump_control.set_listener(listener)
+    pump_control.init()
+    yield pump_control, world, events, wait_for
+    pump_control.cleanup()
+    pump_control.set_listener(None)
+
+
+def names(events):
+    return [e["event"] for e in events]
+
+
+def test_pump_events_for_queue_start_and_cancel(pump):
+    pump_control, world, events, wait_for = pump
+    gpio = pump_control.PUMP_ZONES["main"]["gpio"]
+
+    assert pump_control.pump_run_for(30, "main")
+    wait_for(lambda ev: "started" in names(ev))
+    assert world.gpio.get(gpio)
+    assert pump_control.started_at("main") is not None
+
+    # A second request for the running zone extends it
+    assert pump_control.pump_run_for(40, "main")
+    wait_for(lambda ev: "extended" in names(ev))
+
+    pump_control.stop_run("main")
+    wait_for(lambda ev: any(e["event"] == "completed" for e in ev))
+    completed = [e for e in events if e["event"] == "completed"]
+    assert completed[0]["reason"] == "cancelled" and completed[0]["zone"] == "main"
+    assert names(events)[:3] == ["queued", "started", "queue"]
+    assert not world.gpio.get(gpio)
+    assert not pump_control.is_running("main")
+
+
+def test_pump_run_completes_by_itself(pump):
+    pump_control, world, events, wait_for = pump
+
+    started = time.monotonic()
+    assert pump_control.pump_run_for(0.2, "main")
+    wait_for(lambda ev: any(e["event"] == "completed" for e in ev))
+
+    assert time.monotonic() - started >= 0.2
+    completed = [e for e in events if e["event"] == "completed"]
+    assert completed[0]["reason"] == "done"
+    assert not world.gpio.get(pump_control.PUMP_ZONES["main"]["gpio"])
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from sensors import breaker, steps, temperature
+from sim.devices import SimW1Bus
+
+TEMPERATURES = [18.0, 19.5, 21.25]
+
+
+@pytest.fixture
+def w1(tmp_path, monkeypatch):
+    """A fake sysfs tree with three probes on one bulk-capable master; waits are recorded, not slept."""
+    breaker._breakers.clear()
+    bus = SimW1Bus(TEMPERATURES, root=str(tmp_path))
+    waits = []
+    monkeypatch.setattr(steps, "time", SimpleNamespace(sleep=waits.append))
+    bus.waits = waits
+    yield bus
+    breaker._breakers.clear()
+
+
+def values(payloads):
+    return sorted(p["value"] for p in payloads)
+
+
+def test_bulk_read_converts_all_probes_at_once(w1):
+    temperature.init(base_dir=w1.base_dir)
+    assert list(temperature._bulk_masters.values()) == [sorted(temperature.SENSORS)]
+
+    assert values(temperature.read_all_temperatures()) == [18.0, 19.5, 21.2]
+    # No per-probe 0.75 s conversion wait
+    assert 0.75 not in w1.waits
+    with open(next(iter(temperature._bulk_masters))) as f:
+        assert f.read() == "trigger\n"
+
+
+def test_without_bulk_read_each_probe_waits_for_its_conversion(tmp_path, w1):
+    bus = SimW1Bus(TEMPERATURES, bulk_read=False, root=str(tmp_path / "plain"))
+    temperature.init(base_dir=bus.base_dir)
+    assert temperature._bulk_masters == {}
+
+    assert values(temperature.read_all_temperatures()) == [18.0, 19.5, 21.2]
+    assert w1.waits == [0.75] * len(TEMPERATURES)
+
+
+def test_bulk_timeout_falls_back_then_pauses_bulk_mode(w1, monkeypatch):
+    temperature.init(base_dir=w1.base_dir)
+    triggers = []
+    monkeypatch.setattr(temperature, "_bulk_trigger", triggers.append)
+    monkeypatch.setattr(temperature, "_bulk_done", lambda bulk_file: False)
+    monkeypatch.setattr(temperature, "BULK_CONVERSION_TIMEOUT", 0.0)
+
+    for _ in range(breaker.FAILURE_THRESHOLD):
+        # Every cycle still reports all probes through the per-probe path
+        assert values(temperature.read_all_temperatures()) == [18.0, 19.5, 21.2]
+    assert len(triggers) == breaker.FAILURE_THRESHOLD
+
+    # Bulk mode is now paused: no trigger, but the master is not forgotten
+    temperature.read_all_temperatures()
+    assert len(triggers) == breaker.FAILURE_THRESHOLD
+    assert len(temperature._bulk_masters) == 1
+
+    # Once the backoff has run out bulk mode is tried again, and a success closes it
+    guard = next(iter(temperature._bulk_guards.values()))
+    guard.retry_at = 0.0
+    monkeypatch.setattr(temperature, "_bulk_done", lambda bulk_file: True)
+    w1.waits.clear()
+    assert values(temperature.read_all_temperatures()) == [18.0, 19.5, 21.2]
+    assert len(triggers) == breaker.FAILURE_THRESHOLD + 1
+    assert guard.state == breaker.CLOSED
+    assert w1.waits == []
+
+
+def test_missing_bulk_file_falls_back_to_per_probe_reads(w1):
+    temperature.init(base_dir=w1.base_dir)
+    bulk_file = next(iter(temperature._bulk_masters))
+    # A directory where the file was: opening it for writing raises OSError
+    os.remove(bulk_file)
+    os.mkdir(bulk_file)
+
+    assert values(temperature.read_all_temperatures()) == [18.0, 19.5, 21.2]
+    assert w1.waits == [0.75] * len(TEMPERATURES)
+
+
+def test_crc_failure_reports_the_probe_as_failed(w1):
+    temperature.init(base_dir=w1.base_dir)
+    probe_id = sorted(temperature.SENSORS)[0]
+    with open(temperature.SENSORS[probe_id]) as f:
+        lines = f.readlines()
+    with open(temperature.SENSORS[probe_id], "w") as f:
+        f.write(lines[0].replace("YES", "NO") + lines[1])
+
+    readings = {p["id"]: p for p in temperature.read_all_temperatures()}
+    assert readings[probe_id]["value"] is None
+    assert readings[probe_id]["status"] == "stale"
+    assert sum(p["value"] is not None for p in readings.values()) == len(TEMPERATURES) - 1
+
+
+def test_rescan_keeps_ids_and_picks_up_new_probes(w1):
+    temperature.init(base_dir=w1.base_dir)
+    before = dict(temperature.SENSORS)
+
+    w1.add_probe("28-0000000000ff", 25.0)
+    added, removed = temperature.rescan()
+
+    assert added == ["temp-sensor-004"] and removed == []
+    assert {k: v for k, v in temperature.SENSORS.items() if k in before} == before
+    assert values(temperature.read_all_temperatures()) == [18.0, 19.5, 21.2, 25.0]
+
+
+def test_asyncio_reads_w1_slave_off_the_event_loop(tmp_path, monkeypatch):
+    breaker._breakers.clear()
+    bus = SimW1Bus(TEMPERATURES, bulk_read=False, root=str(tmp_path))
+    temperature.init(base_dir=bus.base_dir)
+
+    async def no_wait(delay):
+        pass
+
+    readers = []
+    read_device = temperature._read_device
+
+    def recording(probe_id):
+        readers.append(threading.current_thread())
+        return read_device(probe_id)
+
+    monkeypatch.setattr(asyncio, "sleep", no_wait)
+    monkeypatch.setattr(temperature, "_read_device", recording)
+    payloads = asyncio.run(temperature.read_all_temperatures_async())
+
+    assert values(payloads) == [18.0, 19.5, 21.2]
+    assert len(readers) == len(TEMPERATURES)
+    assert threading.main_thread() not in readers
+    breaker._breakers.clear()
@@ -0,0 +1,57 @@
+"""
+Windowed aggregation benchmark.
+
+Measures the cost of feeding samples into WindowAggregator and of turning
+each window into min/max/mean/median/count, plus buffer memory per sensor.
+Run it on the target (e.g. a Pi Zero) to get representative numbers:
+
+    python -m tools.bench_aggregate --sensors 8 --window 60 --outlier-k 3.5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sampling import WindowAggregator  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=6)
+    parser.add_argument("--window", type=int, default=30, help="samples per publish window")
+    parser.add_argument("--windows", type=int, default=200, help="windows to run")
+    parser.add_argument("--outlier-k", type=float, default=0.0)
+    args = parser.parse_args()
+
+    aggregator = WindowAggregator(capacity=args.window, outlier_k=args.outlier_k)
+    cycles = [
+        [{"type": "moisture", "id": f"soil-sensor-{i:03d}", "value": random.gauss(50, 2)}
+         for i in range(args.sensors)]
+        for _ in range(args.window)
+    ]
+
+    add_time = 0.0
+    flush_time = 0.0
+    for _ in range(args.windows):
+        start = time.perf_counter()
+        for sensors in cycles:
+            aggregator.add(sensors)
+        add_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        aggregator.flush()
+        flush_time += time.perf_counter() - start
+
+    samples = args.windows * args.window * args.sensors
+    print(f"{args.sensors} sensors x {args.window} samples/window, outlier_k={args.outlier_k}")
+    print(f"add:     {add_time / samples * 1e6:8.2f} µs/sample")
+    print(f"flush:   {flush_time / args.windows * 1e3:8.3f} ms/window "
+          f"({flush_time / args.windows / args.sensors * 1e6:.1f} µs/sensor)")
+    print(f"buffers: {aggregator.nbytes // args.sensors} bytes/sensor, {aggregator.nbytes} total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+End-to-end cycle benchmark on the simulated hardware backend.
+
+For 1..N probes per sensor family it measures acquisition cycle latency,
+payload build (encode) time, publish throughput through the node's own
+publish path, and memory. No Pi, sensors or broker needed:
+
+    python -m tools.bench_cycle --max-probes 4 --cycles 5 --latency 0.002
+"""
+import argparse
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["HARDWARE_BACKEND"] = "sim"
+os.environ.setdefault("JOURNAL_ENABLED", "0")
+
+from sim import backend  # noqa: E402
+from sim.devices import Faults, SimBH1750, SimW1Bus  # noqa: E402
+from sim.mqtt import LoopbackClient  # noqa: E402
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def configure(world, n: int, faults: Faults):
+    """Reconfigure drivers and simulated devices for n probes per family."""
+    from sensors import light, moisture, temperature
+
+    # DS18B20: exactly n probes on the fake w1 bus
+    roms = sorted(world.w1.temperatures)
+    for rom in roms[n:]:
+        world.w1.remove_probe(rom)
+    for i in range(len(roms), n):
+        world.w1.add_probe(f"28-{0x3c01d0750000 + i:012x}", 18.0 + i * 0.5)
+    temperature.init()
+
+    # Soil: up to the ADS1115's four channels
+    moisture.SOIL_PROBES.clear()
+    for i in range(min(n, 4)):
+        moisture.SOIL_PROBES[f"soil-sensor-{i + 1:03d}"] = {
+            "channel": i, "power_pin": f"D{20 + i}", "dry": 2.48, "wet": 1.00
+        }
+    moisture.init()
+
+    # Light: up to the BH1750's two addresses
+    light.LIGHT_SENSORS.clear()
+    for i, address in enumerate((0x23, 0x5C)[:min(n, 2)]):
+        world.i2c.setdefault(address, SimBH1750(lux=450.0, faults=faults))
+        light.LIGHT_SENSORS[f"light-sensor-{i + 1:03d}"] = address
+    light.init()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-probes", type=int, default=4, help="probes per family, 1..N")
+    parser.add_argument("--cycles", type=int, default=5, help="acquisition cycles per step")
+    parser.add_argument("--latency", type=float, default=0.001, help="simulated seconds per bus transaction")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--no-bulk", action="store_true", help="simulate a kernel without therm_bulk_read")
+    parser.add_argument("--publish-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    faults = Faults(latency=args.latency, jitter=args.jitter, noise=args.noise, failure_rate=args.failure_rate)
+    world = backend.default_world(temperature_probes=0, light_sensors=1, faults=faults)
+    world.w1 = SimW1Bus([], bulk_read=not args.no_bulk, faults=faults)
+    backend.install(world)
+
+    import main as node_main
+    import codec
+    from mqtt_client import MQTTNode
+    logging.getLogger().setLevel(logging.WARNING)
+
+    node = MQTTNode()
+    node.client = LoopbackClient()
+    node.client.on_publish = node.pipeline.on_publish
+    node.pipeline.client = node.client
+    node.pipeline.set_connected(True)
+    node.pipeline.start()
+    node._connected = True
+
+    print(f"{'probes':>6} {'sensors':>7} {'cycle ms':>9} {'p95 ms':>8} {'w1':>7} {'ads':>7} {'bh':>7} "
+          f"{'json µs':>8} {'pub/s':>8} {'alloc KB':>9} {'RSS KB':>7}")
+
+    try:
+        for n in range(1, args.max_probes + 1):
+            configure(world, n, faults)
+
+            tracemalloc.start()
+            cycle_times = []
+            bus_times = {}
+            sensors = []
+            for _ in range(args.cycles):
+                world.w1.refresh()
+                start = time.perf_counter()
+                sensors = node_main.build_sensor_payload()
+                cycle_times.append(time.perf_counter() - start)
+                for bus, seconds in node_main.acquisition.last_timing.buses.items():
+                    bus_times.setdefault(bus, []).append(seconds)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            for _ in range(1000):
+                codec.encode_json("SA-PI-BENCH", sensors)
+            encode_us = (time.perf_counter() - start) / 1000 * 1e6
+
+            sent = node.client.messages
+            start = time.perf_counter()
+            while time.perf_counter() - start < args.publish_seconds:
+                if node.backpressure:
+                    time.sleep(0)
+                    continue
+                node.publish_sensors(sensors)
+            rate = (node.client.messages - sent) / (time.perf_counter() - start)
+
+            def bus_ms(name):
+                return statistics.mean(bus_times.get(name, [0])) * 1000
+
+            print(f"{n:>6} {len(sensors):>7} {statistics.mean(cycle_times) * 1000:>9.1f} "
+                  f"{percentile(cycle_times, 95) * 1000:>8.1f} {bus_ms('w1'):>7.1f} "
+                  f"{bus_ms('ads1115'):>7.1f} {bus_ms('bh1750'):>7.1f} {encode_us:>8.1f} "
+                  f"{rate:>8.0f} {peak / 1024:>9.1f} {rss_kb():>7}")
+    finally:
+        world.w1.cleanup()
+
+
+if __name__ == "__main__":
+    main()
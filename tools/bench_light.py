@@ -0,0 +1,69 @@
+"""
+BH1750 mode benchmark on the simulated hardware backend.
+
+For each measurement mode, with and without auto-ranging, reads the light
+sensor at a few light levels (deep shade to direct sun) and reports read
+latency, the MTreg it settles on and the error against the simulated lux:
+
+    python -m tools.bench_light --reads 20 --latency 0.0005
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["HARDWARE_BACKEND"] = "sim"
+
+from sim import backend  # noqa: E402
+from sim.devices import Faults  # noqa: E402
+
+LEVELS = {"shade": 3.0, "indoor": 450.0, "overcast": 8000.0, "sun": 90000.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=10, help="reads per mode and light level")
+    parser.add_argument("--latency", type=float, default=0.0005, help="simulated I2C transaction latency (s)")
+    parser.add_argument("--modes", default="one_time_high,one_time_low,continuous_high,continuous_low")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    world = backend.install(backend.default_world(faults=Faults(latency=args.latency)))
+
+    from sensors import light
+
+    sensor_id = next(iter(light.LIGHT_SENSORS))
+    device = world.i2c[light.LIGHT_SENSORS[sensor_id]]
+
+    print(f"{'mode':<16} {'range':<5} {'level':<9} {'ms/read':>8} {'p95 ms':>8} {'MTreg':>6} {'err %':>7}")
+    for mode in args.modes.split(","):
+        for auto_range in (False, True):
+            light.BH1750_MODE = mode
+            light.BH1750_AUTO_RANGE = auto_range
+            light._settings.clear()
+            light._sensors.clear()
+            light.init()
+
+            for level, lux in LEVELS.items():
+                device.lux = lux
+                light.read_light(sensor_id)   # let auto-ranging settle
+                light.read_light(sensor_id)
+                times, errors = [], []
+                for _ in range(args.reads):
+                    start = time.perf_counter()
+                    value = light.read_light(sensor_id)
+                    times.append(time.perf_counter() - start)
+                    errors.append(abs(value - lux) / lux * 100 if value is not None else 100.0)
+                times.sort()
+                p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+                print(f"{mode:<16} {'auto' if auto_range else 'off':<5} {level:<9} "
+                      f"{statistics.mean(times) * 1e3:8.1f} {p95 * 1e3:8.1f} "
+                      f"{light._sensors[sensor_id].mtreg:6d} {statistics.mean(errors):7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Payload size / encode-time benchmark.
+
+Compares the original JSON message against the compact msgpack and CBOR
+envelopes, for single readings and for batches of several sample sets.
+
+    python -m tools.bench_payload --sensors 8 --batch 10
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec  # noqa: E402
+
+DEVICE_UID = "SA-PI-00000000ABCDEF12"
+
+
+def make_sensors(count: int) -> list:
+    kinds = [("temperature", "temp-sensor"), ("moisture", "soil-sensor"), ("light", "light-sensor")]
+    sensors = []
+    for i in range(count):
+        sensor_type, prefix = kinds[i % len(kinds)]
+        sensors.append({
+            "type": sensor_type,
+            "id": f"{prefix}-{i // len(kinds) + 1:03d}",
+            "value": round(random.uniform(0, 100), 1),
+        })
+    return sensors
+
+
+def time_it(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6  # µs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=6, help="sensors per reading")
+    parser.add_argument("--batch", type=int, default=10, help="sample sets per batch message")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    now = time.time()
+    samples = [(now + i * 30, make_sensors(args.sensors)) for i in range(args.batch)]
+    single = samples[:1]
+
+    json_single = codec.encode_json(DEVICE_UID, single[0][1])
+    json_us = time_it(lambda: codec.encode_json(DEVICE_UID, single[0][1]), args.repeat)
+    json_batch_bytes = sum(len(codec.encode_json(DEVICE_UID, s, ts)) for ts, s in samples)
+
+    print(f"{args.sensors} sensors, batch of {args.batch}")
+    print(f"{'format':<10}{'single B':>10}{'µs':>9}{'batch B':>10}{'µs':>9}{'B/sample':>10}{'vs json':>9}")
+    print(f"{'json':<10}{len(json_single):>10}{json_us:>9.1f}"
+          f"{json_batch_bytes:>10}{json_us * args.batch:>9.1f}"
+          f"{json_batch_bytes / args.batch:>10.1f}{'100%':>9}")
+
+    for fmt in ("msgpack", "cbor"):
+        if not codec.available(fmt):
+            print(f"{fmt:<10}  (not installed)")
+            continue
+        one = codec.encode_compact(DEVICE_UID, single, fmt)
+        one_us = time_it(lambda: codec.encode_compact(DEVICE_UID, single, fmt), args.repeat)
+        many = codec.encode_compact(DEVICE_UID, samples, fmt)
+        many_us = time_it(lambda: codec.encode_compact(DEVICE_UID, samples, fmt), max(1, args.repeat // args.batch))
+        assert codec.decode(many, fmt)[-1]["sensors"] == samples[-1][1]
+        print(f"{fmt:<10}{len(one):>10}{one_us:>9.1f}{len(many):>10}{many_us:>9.1f}"
+              f"{len(many) / args.batch:>10.1f}{len(many) / json_batch_bytes:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Threaded vs asyncio runtime benchmark.
+
+Starts the sim broker, then runs the node (HARDWARE_BACKEND=sim) once per
+runtime as a child process and samples it from /proc after a warm-up:
+resident memory, thread count, context switches per second (wake-ups,
+summed over all threads) and CPU time. Linux only:
+
+    python -m tools.bench_runtime --seconds 30 --sample-interval 1
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sim.broker import Broker  # noqa: E402
+
+
+def proc_stats(pid: int) -> dict:
+    """RSS (kB), thread count, total context switches and CPU seconds of a process."""
+    stats = {"rss_kb": 0, "threads": 0, "switches": 0, "cpu": 0.0}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                stats["rss_kb"] = int(line.split()[1])
+            elif line.startswith("Threads:"):
+                stats["threads"] = int(line.split()[1])
+
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{tid}/status") as f:
+                for line in f:
+                    # voluntary_ctxt_switches / nonvoluntary_ctxt_switches
+                    if "ctxt_switches" in line:
+                        stats["switches"] += int(line.split()[1])
+        except FileNotFoundError:
+            pass   # thread exited while we were looking
+
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    stats["cpu"] = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return stats
+
+
+def run_node(runtime: str, port: int, args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "HARDWARE_BACKEND": "sim",
+        "RUNTIME": runtime,
+        "MQTT_HOST": "127.0.0.1",
+        "MQTT_PORT": str(port),
+        "JOURNAL_ENABLED": "0",
+        "SAMPLE_INTERVAL": str(args.sample_interval),
+        "PUBLISH_INTERVAL": str(max(1, int(args.sample_interval))),
+        "LOG_LEVEL": "WARNING",
+    })
+    child = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")], env=env, cwd=ROOT,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(args.warmup)
+        before = proc_stats(child.pid)
+        peak_threads = before["threads"]
+        start = time.monotonic()
+        while time.monotonic() - start < args.seconds:
+            time.sleep(0.5)
+            peak_threads = max(peak_threads, proc_stats(child.pid)["threads"])
+        after = proc_stats(child.pid)
+        elapsed = time.monotonic() - start
+    finally:
+        child.send_signal(signal.SIGTERM)
+        try:
+            child.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            child.kill()
+
+    return {
+        "rss_kb": after["rss_kb"],
+        "threads": peak_threads,
+        "wakeups": (after["switches"] - before["switches"]) / elapsed,
+        "cpu_pct": (after["cpu"] - before["cpu"]) / elapsed * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20, help="measurement time per runtime")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--sample-interval", type=float, default=1, help="SAMPLE_INTERVAL for the node")
+    parser.add_argument("--port", type=int, default=18831)
+    args = parser.parse_args()
+
+    broker = Broker()
+    threading.Thread(target=lambda: asyncio.run(broker.serve("127.0.0.1", args.port)), daemon=True).start()
+    time.sleep(0.5)
+
+    print(f"{'runtime':<8} {'RSS kB':>8} {'threads':>8} {'wakeups/s':>10} {'CPU %':>6}")
+    for runtime in ("threads", "asyncio"):
+        result = run_node(runtime, args.port, args)
+        print(f"{runtime:<8} {result['rss_kb']:8d} {result['threads']:8d} "
+              f"{result['wakeups']:10.1f} {result['cpu_pct']:6.2f}")
+    print(f"broker received {broker.messages} messages")
+
+
+if __name__ == "__main__":
+    main()
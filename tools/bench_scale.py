@@ -0,0 +1,108 @@
+"""
+Soil probe scaling benchmark on the simulated hardware backend.
+
+Builds a bus with one TCA9548A and four ADS1115s (0x48-0x4B) per mux
+branch, configures N probes across them and times the conversion part of
+a scan two ways: one probe after another, and in parallel rounds (one
+conversion per ADC per round, as scan_moisture() does). The settle time is
+the same for both and is reported separately:
+
+    python -m tools.bench_scale --max-probes 48 --latency 0.0003
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["HARDWARE_BACKEND"] = "sim"
+
+from sim import backend  # noqa: E402
+from sim.devices import Faults, SimADS1115, SimTCA9548A  # noqa: E402
+
+MUX = 0x70
+ADC_ADDRESSES = (0x48, 0x49, 0x4A, 0x4B)
+
+
+def configure(world, n: int, faults: Faults):
+    """n probes, four per ADC, four ADCs per mux branch."""
+    from sensors import moisture, topology
+
+    adcs = (n + 3) // 4
+    channels = {}
+    for i in range(adcs):
+        branch, address = divmod(i, len(ADC_ADDRESSES))
+        channels.setdefault(branch, {})[ADC_ADDRESSES[address]] = SimADS1115(faults=faults)
+    world.i2c.clear()
+    world.i2c[MUX] = SimTCA9548A(channels, faults=faults)
+
+    moisture.SOIL_PROBES.clear()
+    for i in range(n):
+        adc, channel = divmod(i, 4)
+        branch, address = divmod(adc, len(ADC_ADDRESSES))
+        moisture.SOIL_PROBES[f"soil-sensor-{i + 1:03d}"] = {
+            "channel": channel, "power_pin": f"D{branch + 4}", "adc": ADC_ADDRESSES[address],
+            "mux": MUX, "mux_channel": branch, "dry": 2.48, "wet": 1.00,
+        }
+    moisture._routes.clear()
+    moisture._adcs.clear()
+    topology.reset()
+    moisture.init()
+    return topology.get()
+
+
+def timed(fn, cycles: int) -> float:
+    times = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-probes", type=int, default=48)
+    parser.add_argument("--step", type=int, default=4)
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0003, help="simulated seconds per bus transaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    faults = Faults(latency=args.latency)
+    world = backend.install(backend.default_world(temperature_probes=0, light_sensors=0, faults=faults))
+
+    from sensors import moisture, steps
+
+    print(f"settle {moisture.SETTLE_SECONDS * 1000:.0f} ms per scan (both modes)")
+    print(f"{'probes':>6} {'ADCs':>5} {'branches':>8} {'serial ms':>10} {'rounds ms':>10} "
+          f"{'ms/probe':>9} {'switches':>9} {'scan ms':>8}")
+
+    for n in range(args.step, args.max_probes + 1, args.step):
+        topo = configure(world, n, faults)
+        probes = list(moisture.SOIL_PROBES)
+        voltages = {}
+
+        def serial():
+            for probe_id in probes:
+                steps.run(moisture._conversions([probe_id], voltages))
+
+        def rounds():
+            steps.run(moisture._conversions(probes, voltages))
+
+        serial_s = timed(serial, args.cycles)
+        switches = topo.switches
+        rounds_s = timed(rounds, args.cycles)
+        switches = (topo.switches - switches) / args.cycles
+        scan_s = timed(moisture.scan_moisture, 1)
+
+        adcs = (n + 3) // 4
+        print(f"{n:>6} {adcs:>5} {(adcs + 3) // 4:>8} {serial_s * 1000:>10.1f} {rounds_s * 1000:>10.1f} "
+              f"{rounds_s * 1000 / n:>9.2f} {switches:>9.0f} {scan_s * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
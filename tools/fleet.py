@@ -0,0 +1,334 @@
+"""
+Virtual fleet load generator for broker and hub capacity tests.
+
+Runs N simulated nodes in this one process, all on one event loop: each is
+an AsyncMQTTNode with its own device uid (SA-FLEET-00001, ...) publishing
+simulated readings every --interval seconds (± --jitter) in the chosen
+payload format, and answering cmd/<uid>/read-now and pump/<uid> commands.
+A separate controller client sends those commands to random nodes at
+--command-rate per second and listens on sensors/# and pump/+/status the
+way the hub does. Every --report seconds, and at the end, it prints:
+
+  - nodes connected, readings published per second and messages delivered
+    to the controller per second (fewer with --batch)
+  - publish-to-PUBACK latency percentiles, over all nodes
+  - command round trips: read-now (command to the node's next reading,
+    so a scheduled publish can occasionally answer first) and pump
+    status (command to the pump/<uid>/status reply with its request_id)
+  - event-loop lag and the generator's CPU use; when either climbs, the
+    generator itself is the bottleneck, so split the fleet over several
+    processes (--first) rather than read the numbers as the broker's
+
+No hardware is touched. Against a local mosquitto:
+
+    python -m tools.fleet --nodes 1000 --interval 30 --jitter 5 --seconds 300
+    python -m tools.fleet --nodes 200 --format msgpack --batch 5 --sim-broker
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--first", type=int, default=1, help="number of the first node (to run a fleet as several processes)")
+    parser.add_argument("--prefix", default="SA-FLEET", help="device uid prefix")
+    parser.add_argument("--interval", type=float, default=30, help="seconds between readings per node")
+    parser.add_argument("--jitter", type=float, default=2, help="± seconds added to each interval")
+    parser.add_argument("--sensors", type=int, default=6, help="sensors per reading")
+    parser.add_argument("--format", default="json", choices=("json", "msgpack", "cbor"), help="PAYLOAD_FORMAT")
+    parser.add_argument("--batch", type=int, default=1, help="PAYLOAD_BATCH_SIZE (compact formats)")
+    parser.add_argument("--read-delay", type=float, default=0.05, help="simulated sensor read time for read-now")
+    parser.add_argument("--command-rate", type=float, default=2, help="controller commands per second (0 = none)")
+    parser.add_argument("--command-timeout", type=float, default=10)
+    parser.add_argument("--connect-rate", type=float, default=100, help="node connects per second while ramping up")
+    parser.add_argument("--seconds", type=float, default=60, help="run time after the ramp-up")
+    parser.add_argument("--report", type=float, default=10, help="seconds between reports")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--sim-broker", action="store_true", help="serve sim.broker on --port in this process "
+                        "(a functional check: it shares the CPU with the fleet)")
+    return parser.parse_args()
+
+
+args = parse_args()
+
+# The node modules read these at import
+os.environ.update({
+    "MQTT_HOST": args.host,
+    "MQTT_PORT": str(args.port),
+    "PAYLOAD_FORMAT": args.format,
+    "PAYLOAD_BATCH_SIZE": str(args.batch),
+    "JOURNAL_ENABLED": "0",
+    "HARDWARE_BACKEND": "sim",
+})
+
+import paho.mqtt.client as mqtt  # noqa: E402
+from mqtt_client import AsyncMQTTNode  # noqa: E402
+from publisher import AsyncPublishPipeline  # noqa: E402
+from sim.broker import Broker  # noqa: E402
+
+SENSOR_KINDS = (
+    ("temperature", "temp-sensor", 18.0, 0.2),
+    ("moisture", "soil-sensor", 55.0, 0.5),
+    ("light", "light-sensor", 400.0, 25.0),
+)
+
+# =============================
+# MEASUREMENTS
+# =============================
+
+class Window:
+    """Counts and latencies since the last report, plus running totals."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.totals: Dict[str, int] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.all_latencies: Dict[str, List[float]] = {}
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+            self.totals[name] = self.totals.get(name, 0) + n
+
+    def latency(self, name: str, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            self.all_latencies.setdefault(name, []).append(seconds)
+
+    def take(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            latencies, self.latencies = self.latencies, {}
+        return counts, latencies
+
+
+stats = Window()
+
+
+def percentiles(values: List[float]) -> str:
+    if not values:
+        return "-"
+    values = sorted(values)
+    pick = [values[min(len(values) - 1, int(len(values) * p))] for p in (0.5, 0.95, 0.99)]
+    return "/".join(f"{v * 1000:.0f}" for v in pick + [values[-1]]) + " ms"
+
+
+class FleetPipeline(AsyncPublishPipeline):
+    """The node's pipeline, also recording each publish-to-PUBACK time."""
+
+    def _ack(self, now: float, entry):
+        super()._ack(now, entry)
+        stats.latency("ack", now - entry[0])
+
+
+class FleetNode(AsyncMQTTNode):
+    pipeline_class = FleetPipeline
+
+# =============================
+# SIMULATED NODES
+# =============================
+
+class SimNode:
+    def __init__(self, number: int):
+        self.uid = f"{args.prefix}-{number:05d}"
+        self.sensors = []
+        for i in range(args.sensors):
+            sensor_type, prefix, base, step = SENSOR_KINDS[i % len(SENSOR_KINDS)]
+            self.sensors.append([sensor_type, f"{prefix}-{i // len(SENSOR_KINDS) + 1:03d}", base, step])
+        self.node = FleetNode(read_callback=self.read_now, pump_handler=self.pump, device_uid=self.uid)
+
+    def reading(self) -> list:
+        # A random walk per sensor, so compact batches see realistic deltas
+        for sensor in self.sensors:
+            sensor[2] += random.uniform(-sensor[3], sensor[3])
+        return [{"type": t, "id": i, "value": round(v, 1)} for t, i, v, _ in self.sensors]
+
+    async def read_now(self) -> list:
+        if args.read_delay:
+            await asyncio.sleep(args.read_delay)
+        return self.reading()
+
+    def pump(self, payload: dict):
+        self.node.publish_pump_event({
+            "ts": int(time.time()), "event": "queue", "request_id": payload.get("request_id"),
+            "active": [], "queued": [],
+        })
+
+    async def publish_loop(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(random.uniform(0, args.interval))   # spread the fleet over one interval
+        due = loop.time()
+        while True:
+            if self.node._connected:
+                self.node.publish_sensors(self.reading())
+                stats.count("published")
+            due += args.interval
+            await asyncio.sleep(max(0.0, due + random.uniform(-args.jitter, args.jitter) - loop.time()))
+
+# =============================
+# CONTROLLER
+# =============================
+
+class Controller:
+    """Hub stand-in: sends commands to random nodes and times the answers."""
+
+    def __init__(self, uids: List[str]):
+        self.uids = uids
+        self.sent = 0
+        self._reads: Dict[str, float] = {}    # uid -> sent_at
+        self._pumps: Dict[str, float] = {}    # request_id -> sent_at
+        self._lock = threading.Lock()
+
+        self.client = mqtt.Client(client_id=f"{args.prefix}-controller-{os.getpid()}")
+        self.client.on_connect = lambda client, userdata, flags, rc: client.subscribe(
+            [("sensors/#", 0), ("pump/+/status", 0)])
+        self.client.on_message = self.on_message
+        self.client.connect(args.host, args.port, keepalive=60)
+        self.client.loop_start()
+
+    def on_message(self, client, userdata, msg):
+        now = time.monotonic()
+        parts = msg.topic.split("/")
+        if parts[0] == "sensors":
+            stats.count("delivered")
+            with self._lock:
+                sent_at = self._reads.pop(parts[1], None)
+            if sent_at is not None:
+                stats.latency("read-now", now - sent_at)
+        elif parts[0] == "pump":
+            try:
+                request_id = json.loads(msg.payload).get("request_id")
+            except (ValueError, AttributeError):
+                return
+            with self._lock:
+                sent_at = self._pumps.pop(request_id, None)
+            if sent_at is not None:
+                stats.latency("pump", now - sent_at)
+
+    def send(self):
+        uid = random.choice(self.uids)
+        self.sent += 1
+        with self._lock:
+            if self.sent % 2 and uid not in self._reads:
+                self._reads[uid] = time.monotonic()
+                self.client.publish(f"cmd/{uid}/read-now", b"{}", qos=1)
+            else:
+                request_id = f"fleet-{self.sent}"
+                self._pumps[request_id] = time.monotonic()
+                self.client.publish(f"pump/{uid}", json.dumps({"action": "status", "request_id": request_id}), qos=1)
+
+    def expire(self):
+        """Drop commands unanswered after --command-timeout; returns how many."""
+        cutoff = time.monotonic() - args.command_timeout
+        with self._lock:
+            expired = 0
+            for pending in (self._reads, self._pumps):
+                for key in [k for k, sent_at in pending.items() if sent_at < cutoff]:
+                    del pending[key]
+                    expired += 1
+        if expired:
+            stats.count("timeouts", expired)
+        return expired
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(random.expovariate(args.command_rate))
+            self.send()
+
+    def close(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+# =============================
+# RUN
+# =============================
+
+async def loop_lag():
+    """Worst lateness of a 100 ms timer per report window (generator saturation)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(0.1)
+        stats.latency("loop", loop.time() - start - 0.1)
+
+
+def report(fleet: List[SimNode], controller: Controller, elapsed: float, cpu: float, title: str):
+    controller.expire()
+    counts, latencies = stats.take()
+    connected = sum(1 for sim in fleet if sim.node._connected)
+    lag = max(latencies.get("loop", [0.0]))
+    print(f"[{title}] {connected}/{len(fleet)} connected | "
+          f"readings {counts.get('published', 0) / elapsed:.1f}/s, "
+          f"delivered {counts.get('delivered', 0) / elapsed:.1f} msg/s | "
+          f"ack p50/p95/p99/max {percentiles(latencies.get('ack', []))} | "
+          f"read-now {percentiles(latencies.get('read-now', []))}, "
+          f"pump {percentiles(latencies.get('pump', []))}, "
+          f"{counts.get('timeouts', 0)} timed out | "
+          f"loop lag {lag * 1000:.0f} ms, CPU {cpu / elapsed * 100:.0f}%", flush=True)
+
+
+async def main():
+    if args.sim_broker:
+        broker = Broker()
+        threading.Thread(target=lambda: asyncio.run(broker.serve(args.host, args.port)), daemon=True).start()
+        await asyncio.sleep(0.5)
+
+    fleet = [SimNode(number) for number in range(args.first, args.first + args.nodes)]
+    controller = Controller([sim.uid for sim in fleet])
+    tasks = [asyncio.create_task(loop_lag())]
+
+    print(f"Connecting {len(fleet)} nodes to {args.host}:{args.port} at {args.connect_rate:g}/s", flush=True)
+    ramp_start = time.monotonic()
+    for sim in fleet:
+        sim.node.connect()
+        tasks.append(asyncio.create_task(sim.publish_loop()))
+        await asyncio.sleep(1 / args.connect_rate)
+    while sum(1 for sim in fleet if sim.node._connected) < len(fleet) and time.monotonic() - ramp_start < 60:
+        await asyncio.sleep(0.1)
+    print(f"Ramp-up took {time.monotonic() - ramp_start:.1f}s", flush=True)
+    stats.take()
+
+    if args.command_rate > 0:
+        tasks.append(asyncio.create_task(controller.run()))
+
+    start = last = time.monotonic()
+    cpu_last = time.process_time()
+    try:
+        while time.monotonic() - start < args.seconds:
+            await asyncio.sleep(min(args.report, args.seconds - (time.monotonic() - start)))
+            now, cpu = time.monotonic(), time.process_time()
+            report(fleet, controller, now - last, cpu - cpu_last, f"{now - start:5.0f}s")
+            last, cpu_last = now, cpu
+    finally:
+        for task in tasks:
+            task.cancel()
+        controller.close()
+        await asyncio.gather(*(sim.node.close_async() for sim in fleet), return_exceptions=True)
+
+    elapsed = time.monotonic() - start
+    print(f"Total over {elapsed:.0f}s: {stats.totals.get('published', 0)} readings, "
+          f"{stats.totals.get('delivered', 0)} messages delivered, "
+          f"commands {controller.sent} ({stats.totals.get('timeouts', 0)} timed out)")
+    for name in ("ack", "read-now", "pump"):
+        print(f"  {name:<8} p50/p95/p99/max {percentiles(stats.all_latencies.get(name, []))}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -6,12 +6,21 @@ cd /opt/smart_allotment_node || exit 1
 source venv/bin/activate
 
 # Pull latest code
+OLD_HEAD=$(git rev-parse HEAD)
 git pull origin main
 
+if [ "$(git rev-parse HEAD)" = "$OLD_HEAD" ]; then
+  echo "Already up to date — node left running"
+  exit 0
+fi
+
 # Install any new dependencies
-pip install -r requirements.txt
+if ! git diff --quiet "$OLD_HEAD" HEAD -- requirements.txt; then
+  pip install -r requirements.txt
+fi
 
-# Restart systemd service
+# Restart systemd service (pending readings and the schedule are carried over)
 sudo systemctl restart smart-allotment-node
 
-echo "Node updated and restarted successfully!"
\ No newline at end of file
+echo "Node updated and restarted successfully!"
+echo "Probe changes only need: sudo systemctl reload smart-allotment-node"
\ No newline at end of file